@@ -0,0 +1,111 @@
+"""
+Server-push delivery for chat events.
+
+Views publish an event once and every open event stream belonging to one of
+the recipients receives it. The broker is pluggable through the
+CHAT_EVENT_BROKER setting; the default LocalBroker fans out inside the
+current process, which covers a single ASGI worker and the test client.
+"""
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+# Events queued for a subscriber that stops reading are dropped past this size
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class LocalBroker:
+    """In-process fan-out of events to per-user subscriber queues"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, user_id):
+        """Register a queue for user_id on the running event loop and return it"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add((loop, queue))
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        """Remove a queue previously returned by subscribe()"""
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if not subscribers:
+                return
+            subscribers.difference_update({s for s in subscribers if s[1] is queue})
+            if not subscribers:
+                del self._subscribers[user_id]
+
+    def publish(self, user_ids, event):
+        """Deliver event to every subscriber of the given users (thread-safe)"""
+        with self._lock:
+            targets = [
+                subscriber
+                for user_id in set(user_ids)
+                for subscriber in self._subscribers.get(user_id, ())
+            ]
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(_deliver, queue, event)
+            except RuntimeError:
+                # Loop already closed - the stream is going away
+                pass
+
+    def subscriber_count(self, user_id):
+        """Number of open streams for a user"""
+        with self._lock:
+            return len(self._subscribers.get(user_id, ()))
+
+
+def _deliver(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        pass
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide broker configured by CHAT_EVENT_BROKER"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker_path = getattr(settings, 'CHAT_EVENT_BROKER', 'chat.events.LocalBroker')
+                _broker = import_string(broker_path)()
+    return _broker
+
+
+def publish(user_ids, event):
+    """Publish an event to users once the current transaction commits"""
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: get_broker().publish(user_ids, event))
+
+
+def format_sse(event):
+    """Serialize an event dict as a Server-Sent Events frame"""
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event)}\n\n"
+
+
+def serialize_message(message):
+    """JSON payload for a message, shared by the AJAX endpoints and pushed events"""
+    return {
+        'id': message.id,
+        'conversation_id': message.conversation_id,
+        'content': message.content,
+        'sender': message.sender.username,
+        'sender_id': message.sender_id,
+        'timestamp': message.timestamp.strftime('%H:%M'),
+        'full_timestamp': message.timestamp.isoformat(),
+    }
@@ -0,0 +1,37 @@
+"""
+Management command to delete MessageStatus rows made redundant by read watermarks.
+Only run this once CHAT_READ_TRACKING is 'watermark' everywhere.
+Usage: python manage.py collapse_message_statuses [--dry-run]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import OuterRef, Exists
+from chat.models import MessageStatus, ConversationUserStatus, uses_read_watermark
+
+
+class Command(BaseCommand):
+    help = 'Delete MessageStatus rows already covered by conversation read watermarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows would be deleted',
+        )
+
+    def handle(self, *args, **options):
+        if not uses_read_watermark():
+            raise CommandError("CHAT_READ_TRACKING is not 'watermark'; MessageStatus rows are still in use")
+        
+        covered = ConversationUserStatus.objects.filter(
+            conversation=OuterRef('message__conversation'),
+            user=OuterRef('user'),
+            last_read_message_id__gte=OuterRef('message_id'),
+        )
+        redundant = MessageStatus.objects.filter(Exists(covered))
+        
+        if options['dry_run']:
+            self.stdout.write(f"{redundant.count()} MessageStatus rows are covered by read watermarks")
+            return
+        
+        deleted, _ = redundant.delete()
+        self.stdout.write(self.style.SUCCESS(f"✓ Deleted {deleted} redundant MessageStatus rows"))
@@ -0,0 +1,36 @@
+"""
+Management command to rebuild the denormalized chat unread counters.
+Run this if the counters drift from the underlying MessageStatus rows.
+Usage: python manage.py rebuild_unread_counts [--user USERNAME]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import transaction
+from chat.models import ConversationUserStatus
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-conversation unread message counters from MessageStatus'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=str,
+            help='Only rebuild counters for this username',
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+        
+        with transaction.atomic():
+            rows = ConversationUserStatus.rebuild_unread_counts(user=user)
+        
+        scope = f"user {user.username}" if user else "all users"
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Rebuilt unread counters for {scope} ({rows} conversations with unread messages)"
+        ))
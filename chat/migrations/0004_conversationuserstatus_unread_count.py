@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:41
+
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def populate_unread_counts(apps, schema_editor):
+    """Seed the unread counters from existing MessageStatus rows"""
+    MessageStatus = apps.get_model('chat', 'MessageStatus')
+    ConversationUserStatus = apps.get_model('chat', 'ConversationUserStatus')
+    
+    unread = MessageStatus.objects.filter(is_read=False).exclude(
+        message__sender=F('user')
+    ).values('message__conversation', 'user').annotate(total=Count('id'))
+    
+    ConversationUserStatus.objects.bulk_create(
+        [
+            ConversationUserStatus(
+                conversation_id=row['message__conversation'],
+                user_id=row['user'],
+                unread_count=row['total'],
+            )
+            for row in unread
+        ],
+        update_conflicts=True,
+        unique_fields=['conversation', 'user'],
+        update_fields=['unread_count'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_conversationuserstatus'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationuserstatus',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_unread_counts, migrations.RunPython.noop),
+    ]
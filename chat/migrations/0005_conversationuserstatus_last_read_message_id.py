@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:05
+
+from django.db import migrations, models
+from django.db.models import F, Max, Min
+
+
+def populate_read_watermarks(apps, schema_editor):
+    """
+    Give every participant a watermark that keeps their unread state: just
+    before their first unread message, or the conversation's latest message
+    when nothing is unread. Messages that never got a MessageStatus row
+    (e.g. created with Message.objects.create) were never counted unread,
+    so they are treated as seen.
+    """
+    Conversation = apps.get_model('chat', 'Conversation')
+    Message = apps.get_model('chat', 'Message')
+    MessageStatus = apps.get_model('chat', 'MessageStatus')
+    ConversationUserStatus = apps.get_model('chat', 'ConversationUserStatus')
+    Participant = Conversation.participants.through
+    
+    latest = dict(Message.objects.values('conversation').annotate(
+        latest=Max('id')
+    ).values_list('conversation', 'latest'))
+    first_unread = {
+        (row['message__conversation'], row['user']): row['first_unread']
+        for row in MessageStatus.objects.filter(is_read=False).exclude(
+            message__sender=F('user')
+        ).values('message__conversation', 'user').annotate(first_unread=Min('message_id'))
+    }
+    
+    rows = []
+    for conversation_id, user_id in Participant.objects.values_list('conversation_id', 'user_id'):
+        if conversation_id not in latest:
+            continue
+        watermark = latest[conversation_id]
+        if (conversation_id, user_id) in first_unread:
+            watermark = first_unread[conversation_id, user_id] - 1
+        if watermark > 0:
+            rows.append(ConversationUserStatus(
+                conversation_id=conversation_id,
+                user_id=user_id,
+                last_read_message_id=watermark,
+            ))
+    
+    ConversationUserStatus.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['conversation', 'user'],
+        update_fields=['last_read_message_id'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_conversationuserstatus_unread_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationuserstatus',
+            name='last_read_message_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_read_watermarks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:45
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def populate_participant_pairs(apps, schema_editor):
+    """
+    Fill in the canonical (user_low, user_high) pair for existing 1-on-1
+    conversations. If duplicates exist for a pair, the most recently
+    updated conversation keeps the key and the others are left unkeyed.
+    """
+    Conversation = apps.get_model('chat', 'Conversation')
+    Participant = Conversation.participants.through
+    
+    direct_ids = Conversation.objects.annotate(
+        participant_count=Count('participants')
+    ).filter(participant_count=2).order_by('-updated_at', '-id').values_list('id', flat=True)
+    direct_ids = list(direct_ids)
+    
+    members = {}
+    for conversation_id, user_id in Participant.objects.filter(
+        conversation_id__in=direct_ids
+    ).values_list('conversation_id', 'user_id'):
+        members.setdefault(conversation_id, []).append(user_id)
+    
+    seen = set()
+    rows = []
+    for conversation_id in direct_ids:
+        pair = tuple(sorted(members[conversation_id]))
+        if pair in seen:
+            continue
+        seen.add(pair)
+        rows.append(Conversation(id=conversation_id, user_low_id=pair[0], user_high_id=pair[1]))
+    
+    Conversation.objects.bulk_update(rows, ['user_low', 'user_high'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    """Separate from 0006 and 0008 so the backfill is committed before the table is altered again"""
+
+    dependencies = [
+        ('chat', '0006_conversation_participant_pair'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_participant_pairs, migrations.RunPython.noop),
+    ]
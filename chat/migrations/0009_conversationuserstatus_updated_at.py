@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_conversation_unique_direct_conversation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationuserstatus',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='conversationuserstatus',
+            index=models.Index(fields=['user', 'updated_at'], name='chat_conver_user_id_4c79b5_idx'),
+        ),
+    ]
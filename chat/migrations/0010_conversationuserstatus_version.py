@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0009_conversationuserstatus_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationuserstatus',
+            name='version',
+            field=models.PositiveBigIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='conversationuserstatus',
+            index=models.Index(fields=['user', 'version'], name='chat_conver_user_id_0b065a_idx'),
+        ),
+    ]
@@ -1,23 +1,124 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q, Sum, Max, Count, OuterRef, Subquery, Exists
+from django.db.models.functions import Coalesce, Greatest
 from django.conf import settings
 from django.utils import timezone
 
 
+def uses_read_watermark():
+    """True when read state is tracked per conversation instead of per message"""
+    return getattr(settings, 'CHAT_READ_TRACKING', 'message_status') == 'watermark'
+
+
+class ConversationQuerySet(models.QuerySet):
+    def inbox_for(self, user, archived=False):
+        """
+        Conversations in user's inbox (or archive), annotated in the same
+        statement with the other participant, the latest message and the
+        user's unread count. Deleted conversations are left out.
+        """
+        status = ConversationUserStatus.objects.filter(
+            conversation=OuterRef('pk'),
+            user=user
+        )
+        other_participant = Conversation.participants.through.objects.filter(
+            conversation_id=OuterRef('pk')
+        ).exclude(user_id=user.id).order_by('user_id')
+        latest = Message.objects.filter(
+            conversation=OuterRef('pk')
+        ).order_by('-timestamp', '-id')
+        
+        archived_filter = Exists(status.filter(is_archived=True))
+        return self.filter(
+            participants=user
+        ).exclude(
+            Exists(status.filter(is_deleted=True))
+        ).filter(
+            archived_filter if archived else ~archived_filter
+        ).annotate(
+            other_user_id=Subquery(other_participant.values('user_id')[:1]),
+            latest_message_id=Subquery(latest.values('id')[:1]),
+            latest_message_sender_id=Subquery(latest.values('sender_id')[:1]),
+            latest_message_content=Subquery(latest.values('content')[:1]),
+            latest_message_timestamp=Subquery(latest.values('timestamp')[:1]),
+            unread_count=Coalesce(Subquery(status.values('unread_count')[:1]), 0),
+        )
+    
+    def changed_since(self, user, since):
+        """Conversations with new messages or a change to user's status after since"""
+        return self.filter(
+            Q(updated_at__gt=since) |
+            Exists(ConversationUserStatus.objects.filter(
+                conversation=OuterRef('pk'),
+                user=user,
+                updated_at__gt=since
+            ))
+        )
+    
+    def build_inbox(self, user, archived=False):
+        """
+        Evaluate inbox_for() and attach other_user / latest_message objects
+        for the templates. Costs two queries however many conversations the
+        user has.
+        """
+        from django.contrib.auth import get_user_model
+        
+        conversations = list(self.inbox_for(user, archived=archived))
+        users = get_user_model().objects.select_related('profile').in_bulk(
+            {conv.other_user_id for conv in conversations if conv.other_user_id}
+        )
+        for conv in conversations:
+            conv.other_user = users.get(conv.other_user_id)
+            conv.latest_message = None
+            if conv.latest_message_id:
+                conv.latest_message = Message(
+                    id=conv.latest_message_id,
+                    conversation_id=conv.id,
+                    sender_id=conv.latest_message_sender_id,
+                    content=conv.latest_message_content,
+                    timestamp=conv.latest_message_timestamp,
+                )
+        return conversations
+
+
 class Conversation(models.Model):
     """Represents a conversation between users"""
     participants = models.ManyToManyField(
         settings.AUTH_USER_MODEL, 
         related_name='conversations'
     )
+    # Canonical participant pair for 1-on-1 conversations (lower user id first)
+    user_low = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    user_high = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     
+    objects = ConversationQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-updated_at']
         indexes = [
             models.Index(fields=['-updated_at']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user_low', 'user_high'],
+                name='unique_direct_conversation'
+            ),
+        ]
     
     def __str__(self):
         return f"Conversation {self.id} - {self.participants.count()} participants"
@@ -29,6 +130,53 @@ class Conversation(models.Model):
     def get_latest_message(self):
         """Get the most recent message in this conversation"""
         return self.messages.order_by('-timestamp').first()
+    
+    def get_history(self, before=None, limit=50):
+        """
+        Page of messages older than the (timestamp, id) cursor `before`
+        (newest page when None), returned oldest first along with whether
+        older messages exist. Seeks on the (conversation, -timestamp) index,
+        so every page costs the same however far back it is.
+        """
+        messages = self.messages.select_related('sender').order_by('-timestamp', '-id')
+        if before is not None:
+            timestamp, message_id = before
+            messages = messages.filter(
+                Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=message_id)
+            )
+        page = list(messages[:limit + 1])
+        return page[:limit][::-1], len(page) > limit
+    
+    def mark_read_for_user(self, user, up_to_message_id=None):
+        """
+        Mark every message from other participants (optionally only up to
+        up_to_message_id) as read for user using set-based queries, so the
+        cost doesn't grow with the number of messages.
+        """
+        if up_to_message_id is None:
+            up_to_message_id = self.messages.aggregate(last=Max('id'))['last'] or 0
+        
+        if not uses_read_watermark():
+            messages = self.messages.exclude(sender=user).filter(id__lte=up_to_message_id)
+            now = timezone.now()
+            
+            # Flip existing unread statuses in a single UPDATE
+            MessageStatus.objects.filter(
+                message__in=messages,
+                user=user,
+                is_read=False
+            ).update(is_read=True, read_at=now)
+            
+            # Insert read statuses for messages that never got one (e.g. created outside send_message)
+            missing_ids = list(messages.exclude(statuses__user=user).values_list('id', flat=True))
+            if missing_ids:
+                MessageStatus.objects.bulk_create([
+                    MessageStatus(message_id=message_id, user=user, is_read=True, read_at=now)
+                    for message_id in missing_ids
+                ], ignore_conflicts=True, batch_size=500)
+        
+        # The watermark is kept in both modes so switching modes never loses read state
+        ConversationUserStatus.advance_watermark(self, user, up_to_message_id)
 
 
 class Message(models.Model):
@@ -68,6 +216,26 @@ class Message(models.Model):
     def __str__(self):
         return f"Message from {self.sender.username} in conversation {self.conversation.id}"
     
+    @property
+    def history_cursor(self):
+        """Opaque cursor for loading the messages before this one"""
+        return f"{self.timestamp.isoformat()}|{self.id}"
+    
+    @staticmethod
+    def parse_history_cursor(cursor):
+        """Turn a history_cursor back into a (timestamp, id) pair, or None if malformed"""
+        from django.utils.dateparse import parse_datetime
+        
+        timestamp, _, message_id = (cursor or '').rpartition('|')
+        try:
+            parsed = parse_datetime(timestamp)
+            message_id = int(message_id)
+        except (ValueError, TypeError):
+            return None
+        if parsed is None:
+            return None
+        return parsed, message_id
+    
     def mark_as_read(self, user):
         """Mark this message as read by a specific user (deprecated - use MessageStatus)"""
         if not self.is_read and self.sender != user:
@@ -93,6 +261,12 @@ class Message(models.Model):
         """Check if message is read by a specific user"""
         if self.sender == user:
             return True  # Own messages are considered "read"
+        if uses_read_watermark():
+            return ConversationUserStatus.objects.filter(
+                conversation_id=self.conversation_id,
+                user=user,
+                last_read_message_id__gte=self.id
+            ).exists()
         try:
             status = self.statuses.get(user=user)
             return status.is_read
@@ -149,13 +323,210 @@ class ConversationUserStatus(models.Model):
     is_deleted = models.BooleanField(default=False)
     archived_at = models.DateTimeField(null=True, blank=True)
     deleted_at = models.DateTimeField(null=True, blank=True)
+    unread_count = models.PositiveIntegerField(default=0)  # Denormalized from the read state
+    last_read_message_id = models.PositiveBigIntegerField(default=0)  # Read watermark
+    updated_at = models.DateTimeField(auto_now=True)  # Set explicitly in queryset update() calls
+    # Bumped by every write to the row, in the same statement (see version_for)
+    version = models.PositiveBigIntegerField(default=1)
     
     class Meta:
         unique_together = ['conversation', 'user']
         indexes = [
             models.Index(fields=['user', 'is_archived']),
             models.Index(fields=['user', 'is_deleted']),
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['user', 'version']),
         ]
     
     def __str__(self):
-        return f"{self.user.username} - Conversation {self.conversation.id} - Archived: {self.is_archived}, Deleted: {self.is_deleted}"
\ No newline at end of file
+        return f"{self.user.username} - Conversation {self.conversation.id} - Archived: {self.is_archived}, Deleted: {self.is_deleted}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version = F('version') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def increment_unread_for_participants(cls, conversation_ids, sender_id, amount=1):
+        """
+        Add amount to the unread counter of every participant except the
+        sender across many conversations, in a constant number of queries.
+        """
+        conversation_ids = set(conversation_ids)
+        if not conversation_ids:
+            return
+        Participant = Conversation.participants.through
+        membership = Participant.objects.filter(
+            conversation_id=OuterRef('conversation_id'),
+            user_id=OuterRef('user_id')
+        )
+        cls.objects.filter(
+            conversation_id__in=conversation_ids
+        ).exclude(user_id=sender_id).filter(
+            Exists(membership)
+        ).update(
+            unread_count=F('unread_count') + amount,
+            updated_at=timezone.now(),
+            version=F('version') + 1
+        )
+        
+        # Participants without a status row yet start at amount
+        missing = Participant.objects.filter(
+            conversation_id__in=conversation_ids
+        ).exclude(user_id=sender_id).exclude(
+            Exists(cls.objects.filter(
+                conversation_id=OuterRef('conversation_id'),
+                user_id=OuterRef('user_id')
+            ))
+        ).values_list('conversation_id', 'user_id')
+        cls.objects.bulk_create([
+            cls(conversation_id=conversation_id, user_id=user_id, unread_count=amount)
+            for conversation_id, user_id in missing
+        ], ignore_conflicts=True, batch_size=500)
+    
+    @classmethod
+    def touch(cls, conversation_ids, user_id):
+        """Mark the user's rows for these conversations as changed, creating missing rows"""
+        conversation_ids = set(conversation_ids)
+        updated = cls.objects.filter(
+            conversation_id__in=conversation_ids,
+            user_id=user_id
+        ).update(updated_at=timezone.now(), version=F('version') + 1)
+        if updated < len(conversation_ids):
+            existing = set(cls.objects.filter(
+                conversation_id__in=conversation_ids,
+                user_id=user_id
+            ).values_list('conversation_id', flat=True))
+            cls.objects.bulk_create([
+                cls(conversation_id=conversation_id, user_id=user_id)
+                for conversation_id in conversation_ids - existing
+            ], ignore_conflicts=True, batch_size=500)
+    
+    @classmethod
+    def version_for(cls, user):
+        """
+        Cheap token that changes whenever anything in the user's chat state
+        changes, read from the (user, version) index. Every write adds to the
+        row's version in the same UPDATE and new rows add a row, so the token
+        moves with each commit whatever order concurrent writes commit in
+        (unlike the latest updated_at, which an earlier-stamped write
+        committing later would not move).
+        """
+        state = cls.objects.filter(user=user).aggregate(
+            rows=Count('id'),
+            last_row=Max('id'),
+            versions=Sum('version')
+        )
+        return f"{user.id}-{state['rows']}-{state['last_row'] or 0}-{state['versions'] or 0}"
+    
+    @classmethod
+    def advance_watermark(cls, conversation, user, message_id):
+        """
+        Move the user's read watermark forward to message_id and recount the
+        messages from others past it in the same UPDATE, so a message sent
+        while the conversation is being read is never dropped from the counter.
+        """
+        unread_messages = Message.objects.filter(
+            conversation_id=conversation.id,
+            id__gt=message_id
+        ).exclude(sender_id=user.id)
+        unread = Coalesce(Subquery(
+            unread_messages.filter(
+                id__gt=OuterRef('last_read_message_id')
+            ).order_by().values('conversation').annotate(total=Count('id')).values('total')[:1]
+        ), 0)
+        # Rows already in that state are left alone so their version does not change
+        updated = cls.objects.filter(
+            conversation=conversation,
+            user=user
+        ).exclude(
+            last_read_message_id__gte=message_id,
+            unread_count=unread
+        ).update(
+            last_read_message_id=Greatest(F('last_read_message_id'), message_id),
+            unread_count=unread,
+            updated_at=timezone.now(),
+            version=F('version') + 1
+        )
+        if not updated:
+            cls.objects.get_or_create(
+                conversation=conversation,
+                user=user,
+                defaults={'last_read_message_id': message_id, 'unread_count': unread_messages.count()}
+            )
+    
+    @classmethod
+    def total_unread_for(cls, user):
+        """Total unread messages across all of a user's conversations"""
+        return cls.objects.filter(user=user).aggregate(
+            total=Sum('unread_count')
+        )['total'] or 0
+    
+    @classmethod
+    def rebuild_unread_counts(cls, user=None):
+        """Recompute counters from the read state; returns the number of rows written"""
+        if uses_read_watermark():
+            counts = cls._count_unread_from_watermarks(user)
+        else:
+            counts = cls._count_unread_from_statuses(user)
+        
+        counters = cls.objects.all()
+        if user is not None:
+            counters = counters.filter(user=user)
+        rows = [
+            cls(conversation_id=conversation_id, user_id=user_id, unread_count=total)
+            for (conversation_id, user_id), total in counts.items()
+        ]
+        with transaction.atomic():
+            counters.filter(unread_count__gt=0).update(unread_count=0, updated_at=timezone.now())
+            cls.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['conversation', 'user'],
+                update_fields=['unread_count', 'updated_at'],
+            )
+            # The upsert cannot add to the version, so every counter is bumped once here
+            counters.update(version=F('version') + 1)
+        return len(rows)
+    
+    @classmethod
+    def _count_unread_from_statuses(cls, user=None):
+        statuses = MessageStatus.objects.filter(is_read=False).exclude(
+            message__sender=F('user')
+        )
+        if user is not None:
+            statuses = statuses.filter(user=user)
+        return {
+            (row['message__conversation'], row['user']): row['total']
+            for row in statuses.values('message__conversation', 'user').annotate(
+                total=Count('id')
+            )
+        }
+    
+    @classmethod
+    def _count_unread_from_watermarks(cls, user=None):
+        # Every participant, with messages from others past their watermark
+        memberships = Conversation.participants.through.objects.all()
+        if user is not None:
+            memberships = memberships.filter(user=user)
+        watermark = cls.objects.filter(
+            conversation=OuterRef('conversation_id'),
+            user=OuterRef('user_id')
+        ).values('last_read_message_id')[:1]
+        unread = Message.objects.filter(
+            conversation=OuterRef('conversation_id'),
+            id__gt=OuterRef('watermark')
+        ).exclude(
+            sender=OuterRef('user_id')
+        ).order_by().values('conversation').annotate(total=Count('id')).values('total')[:1]
+        memberships = memberships.annotate(
+            watermark=Coalesce(Subquery(watermark), 0)
+        ).annotate(
+            total=Coalesce(Subquery(unread), 0)
+        ).filter(total__gt=0)
+        return {
+            (row['conversation_id'], row['user_id']): row['total']
+            for row in memberships.values('conversation_id', 'user_id', 'total')
+        }
@@ -0,0 +1,130 @@
+"""
+Sending chat messages.
+
+Every write path (the chat composer, trade notifications, admin broadcasts)
+goes through send_message so that messages, read-tracking rows, unread
+counters, conversation timestamps and pushed events stay consistent. Work is
+done with bulk queries, so the number of round trips does not grow with the
+number of conversations.
+"""
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import events
+from .models import Conversation, ConversationUserStatus, Message, MessageStatus, uses_read_watermark
+
+
+def send_message(conversations, sender, content, message_type='text'):
+    """
+    Send the same message from sender into one or many conversations.
+    Returns the created messages in the order the conversations were given.
+    """
+    if isinstance(conversations, Conversation):
+        conversations = [conversations]
+    conversations = list(conversations)
+    if not conversations:
+        return []
+    conversation_ids = [conversation.id for conversation in conversations]
+
+    with transaction.atomic():
+        # Everyone in the affected conversations, fetched once for statuses and events
+        participants = {}
+        for conversation_id, user_id in Conversation.participants.through.objects.filter(
+            conversation_id__in=conversation_ids
+        ).values_list('conversation_id', 'user_id'):
+            participants.setdefault(conversation_id, []).append(user_id)
+
+        sent = Message.objects.bulk_create([
+            Message(
+                conversation=conversation,
+                sender=sender,
+                content=content,
+                message_type=message_type
+            )
+            for conversation in conversations
+        ], batch_size=500)
+
+        Conversation.objects.filter(id__in=conversation_ids).update(updated_at=timezone.now())
+
+        # Per-message read tracking only; the watermark needs no per-message rows
+        if not uses_read_watermark():
+            MessageStatus.objects.bulk_create([
+                MessageStatus(message=message, user_id=user_id, is_read=False)
+                for message in sent
+                for user_id in participants.get(message.conversation_id, ())
+                if user_id != sender.id
+            ], ignore_conflicts=True, batch_size=500)
+
+        ConversationUserStatus.increment_unread_for_participants(conversation_ids, sender.id)
+        # The sender's own inbox changed too (latest message, ordering)
+        ConversationUserStatus.touch(conversation_ids, sender.id)
+
+        # Push to every participant's open streams (including the sender's other tabs)
+        for message in sent:
+            events.publish(
+                participants.get(message.conversation_id, ()),
+                {'type': 'message', 'message': events.serialize_message(message)}
+            )
+
+    return sent
+
+
+def get_direct_conversations(sender, recipients):
+    """
+    Map recipient id to the 1-on-1 conversation between sender and that
+    recipient, creating missing conversations in bulk. Conversations either
+    side had deleted are restored, as get_or_create_conversation does.
+    """
+    recipient_ids = {recipient.id for recipient in recipients} - {sender.id}
+    if not recipient_ids:
+        return {}
+
+    def lookup():
+        pairs = Conversation.objects.filter(
+            Q(user_low_id=sender.id, user_high_id__in=recipient_ids) |
+            Q(user_high_id=sender.id, user_low_id__in=recipient_ids)
+        )
+        return {
+            conversation.user_high_id if conversation.user_low_id == sender.id else conversation.user_low_id: conversation
+            for conversation in pairs
+        }
+
+    with transaction.atomic():
+        conversations = lookup()
+        missing = recipient_ids - conversations.keys()
+        if missing:
+            # The pair constraint turns concurrent creation into a no-op
+            Conversation.objects.bulk_create([
+                Conversation(
+                    user_low_id=min(sender.id, recipient_id),
+                    user_high_id=max(sender.id, recipient_id)
+                )
+                for recipient_id in missing
+            ], ignore_conflicts=True, batch_size=500)
+            conversations = lookup()
+            Conversation.participants.through.objects.bulk_create([
+                Conversation.participants.through(conversation_id=conversations[recipient_id].id, user_id=user_id)
+                for recipient_id in missing
+                for user_id in (sender.id, recipient_id)
+            ], ignore_conflicts=True, batch_size=500)
+
+        ConversationUserStatus.objects.filter(
+            conversation__in=conversations.values(),
+            is_deleted=True
+        ).update(
+            is_deleted=False,
+            deleted_at=None,
+            is_archived=False,
+            archived_at=None,
+            updated_at=timezone.now(),
+            version=F('version') + 1
+        )
+
+    return conversations
+
+
+def send_direct_message(sender, recipients, content, message_type='text'):
+    """Send content from sender to each recipient in their 1-on-1 conversation"""
+    conversations = get_direct_conversations(sender, recipients)
+    return send_message(list(conversations.values()), sender, content, message_type)
@@ -1,3 +1,310 @@
-from django.test import TestCase
+import asyncio
+import gc
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from . import events, services, views
+from .models import Conversation, ConversationUserStatus, Message
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'chat-tests'},
+    'hot': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'chat-tests-hot'},
+}
+
+
+class EventStreamTests(TestCase):
+    """The SSE endpoint only streams under ASGI with push enabled"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='pw')
+        self.client.force_login(self.user)
+
+    @override_settings(CHAT_PUSH_ENABLED=False)
+    def test_disabled_push_is_not_found(self):
+        response = self.client.get('/chat/api/events/')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(CHAT_PUSH_ENABLED=True)
+    def test_wsgi_request_is_not_found(self):
+        response = self.client.get('/chat/api/events/')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(CHAT_PUSH_ENABLED=True)
+    async def test_asgi_stream_subscribes_while_iterated(self):
+        request = AsyncRequestFactory().get('/chat/api/events/')
+
+        async def auser():
+            return self.user
+        request.auser = auser
+        broker = events.get_broker()
+        response = await views.event_stream(request)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        # Nothing is registered until the stream starts
+        self.assertEqual(broker.subscriber_count(self.user.id), 0)
+
+        stream = aiter(response)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        self.assertEqual(broker.subscriber_count(self.user.id), 1)
+        # As when ASGIHandler drops a finished response: the view's generator is finalized
+        await stream.aclose()
+        del stream, response
+        for _ in range(3):
+            gc.collect()
+            await asyncio.sleep(0.01)
+        self.assertEqual(broker.subscriber_count(self.user.id), 0)
+
+
+class MarkReadTests(TestCase):
+    """Reading a conversation resets the counter without losing newer messages"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='pw')
+        self.bob = User.objects.create_user(username='bob', password='pw')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.alice, self.bob)
+
+    def unread(self):
+        return ConversationUserStatus.objects.get(conversation=self.conversation, user=self.alice).unread_count
+
+    def test_mark_read_clears_counter(self):
+        for mode in ('message_status', 'watermark'):
+            with self.subTest(mode=mode), self.settings(CHAT_READ_TRACKING=mode):
+                services.send_message(self.conversation, self.bob, 'hi')
+                services.send_message(self.conversation, self.bob, 'there')
+                self.assertEqual(self.unread(), 2)
+                self.conversation.mark_read_for_user(self.alice)
+                self.assertEqual(self.unread(), 0)
+
+    def test_message_sent_after_read_position_stays_unread(self):
+        first = services.send_message(self.conversation, self.bob, 'hi')[0]
+        # Sent after the reader picked its read position, before the watermark moved
+        services.send_message(self.conversation, self.bob, 'late')
+        self.conversation.mark_read_for_user(self.alice, up_to_message_id=first.id)
+        self.assertEqual(self.unread(), 1)
+        self.conversation.mark_read_for_user(self.alice)
+        self.assertEqual(self.unread(), 0)
+
+
+class ConversationSyncTests(TestCase):
+    """Delta sync of the conversation list"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='pw', first_name='Alice')
+        self.bob = User.objects.create_user(username='bob', password='pw', first_name='Bob')
+        self.client.force_login(self.alice)
+
+    def test_new_conversation_arrives_with_rendered_item(self):
+        synced_at = self.client.get('/chat/api/conversations/update/').json()['synced_at']
+        conversation = Conversation.objects.create()
+        conversation.participants.add(self.alice, self.bob)
+        services.send_message(conversation, self.bob, 'hello')
+
+        data = self.client.get('/chat/api/conversations/update/', {'since': synced_at}).json()
+        self.assertEqual([conv['id'] for conv in data['conversations']], [conversation.id])
+        html = data['conversations'][0]['html']
+        self.assertIn(f'data-conversation-id="{conversation.id}"', html)
+        self.assertIn('Bob', html)
+        self.assertIn('hello', html)
+
+    def test_messages_page_renders_list_items(self):
+        conversation = Conversation.objects.create()
+        conversation.participants.add(self.alice, self.bob)
+        services.send_message(conversation, self.bob, 'hello')
+        response = self.client.get('/chat/messages/')
+        self.assertContains(response, f'data-conversation-id="{conversation.id}"')
+
+
+class DirectConversationTests(TestCase):
+    """1-on-1 conversations are keyed by the ordered (user_low, user_high) pair"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='pw')
+        self.bob = User.objects.create_user(username='bob', password='pw')
+        self.carol = User.objects.create_user(username='carol', password='pw')
+
+    def test_either_order_finds_the_same_conversation(self):
+        conversation = views.get_or_create_conversation(self.bob, self.alice)
+        self.assertEqual((conversation.user_low, conversation.user_high), (self.alice, self.bob))
+        self.assertEqual(views.get_or_create_conversation(self.alice, self.bob), conversation)
+        self.assertEqual(services.get_direct_conversations(self.bob, [self.alice]), {self.alice.id: conversation})
+        self.assertEqual(services.get_direct_conversations(self.alice, [self.bob]), {self.bob.id: conversation})
+        self.assertEqual(Conversation.objects.count(), 1)
+        self.assertEqual(set(conversation.participants.all()), {self.alice, self.bob})
+
+    def test_direct_messages_reuse_conversations(self):
+        services.send_direct_message(self.alice, [self.bob, self.carol], 'hi')
+        services.send_direct_message(self.carol, [self.alice], 'hello')
+        services.send_direct_message(self.bob, [self.alice, self.bob], 'hey')  # Never a conversation with oneself
+        self.assertEqual(Conversation.objects.count(), 2)
+        conversations = services.get_direct_conversations(self.alice, [self.bob, self.carol])
+        self.assertEqual(
+            list(Message.objects.filter(conversation=conversations[self.carol.id]).values_list('content', flat=True).order_by('id')),
+            ['hi', 'hello']
+        )
+        self.assertEqual(
+            list(Message.objects.filter(conversation=conversations[self.bob.id]).values_list('content', flat=True).order_by('id')),
+            ['hi', 'hey']
+        )
+
+    def test_pair_is_unique(self):
+        Conversation.objects.create(user_low=self.alice, user_high=self.bob)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Conversation.objects.create(user_low=self.alice, user_high=self.bob)
+        # Group conversations carry no pair
+        Conversation.objects.create()
+        Conversation.objects.create()
+        self.assertEqual(Conversation.objects.count(), 3)
+
+
+class ChatStateETagTests(TestCase):
+    """Polling answers 304 until the user's chat state changes"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='pw')
+        self.bob = User.objects.create_user(username='bob', password='pw')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.alice, self.bob)
+        self.client.force_login(self.alice)
+
+    def poll(self, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get('/chat/api/unread-count/', headers=headers)
+
+    def assertChanged(self, etag):
+        response = self.poll(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def test_unchanged_state_is_not_modified(self):
+        etag = self.poll()['ETag']
+        response = self.poll(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_send_and_read_change_etag(self):
+        etag = self.poll()['ETag']
+        services.send_message(self.conversation, self.bob, 'hi')
+        etag = self.assertChanged(etag)
+        self.assertEqual(self.poll().json()['unread_count'], 1)
+
+        self.conversation.mark_read_for_user(self.alice)
+        etag = self.assertChanged(etag)
+        self.assertEqual(self.poll().json()['unread_count'], 0)
+
+        # Reading again changes nothing
+        self.conversation.mark_read_for_user(self.alice)
+        self.assertEqual(self.poll(etag).status_code, 304)
+
+        # The sender's own inbox changes too
+        services.send_message(self.conversation, self.alice, 'hello')
+        self.assertChanged(etag)
+
+    def test_same_timestamp_writes_change_etag(self):
+        services.send_message(self.conversation, self.bob, 'hi')
+        etag = self.poll()['ETag']
+        # A write stamped no later than the last one, as when an older transaction commits last
+        ConversationUserStatus.increment_unread_for_participants([self.conversation.id], self.bob.id)
+        ConversationUserStatus.objects.filter(user=self.alice).update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertChanged(etag)
+
+    def test_archive_changes_etag(self):
+        services.send_message(self.conversation, self.bob, 'hi')
+        etag = self.poll()['ETag']
+        self.client.post(f'/chat/conversation/{self.conversation.id}/archive/')
+        etag = self.assertChanged(etag)
+        self.client.post(f'/chat/conversation/{self.conversation.id}/unarchive/')
+        self.assertChanged(etag)
+
+    def test_rebuild_changes_etag(self):
+        services.send_message(self.conversation, self.bob, 'hi')
+        etag = self.poll()['ETag']
+        ConversationUserStatus.objects.filter(user=self.alice).update(unread_count=5)
+        ConversationUserStatus.rebuild_unread_counts(user=self.alice)
+        self.assertChanged(etag)
+        self.assertEqual(self.poll().json()['unread_count'], 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class InboxQueryTests(TestCase):
+    """The inbox is built in a fixed number of queries"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='pw')
+        self.client.force_login(self.alice)
+
+    def add_conversations(self, count):
+        for _ in range(count):
+            other = User.objects.create_user(username=f'user{User.objects.count()}', password='pw')
+            conversation = views.get_or_create_conversation(self.alice, other)
+            services.send_message(conversation, other, 'hello')
+            services.send_message(conversation, self.alice, 'hi')
+
+    def test_query_count_does_not_grow(self):
+        self.client.get('/chat/messages/')  # Fill the cached sidebar
+        for total in (5, 10):
+            self.add_conversations(5)
+            with self.subTest(conversations=total), self.assertNumQueries(7):
+                response = self.client.get('/chat/messages/')
+            self.assertEqual(len(response.context['conversations']), total)
+
+
+class MessageHistoryTests(TestCase):
+    """Keyset history pages, newest first, with (timestamp, id) cursors"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='pw')
+        self.bob = User.objects.create_user(username='bob', password='pw')
+        self.conversation = views.get_or_create_conversation(self.alice, self.bob)
+        for position in range(7):
+            services.send_message(self.conversation, self.bob, f'message {position}')
+        # Several messages sharing a timestamp, as a bulk send produces
+        self.tied = timezone.now().replace(microsecond=500)
+        Message.objects.filter(content__in=['message 2', 'message 3', 'message 4']).update(timestamp=self.tied)
+        self.expected = list(self.conversation.messages.order_by('timestamp', 'id').values_list('id', flat=True))
+
+    def test_pages_cover_history_once(self):
+        for limit in (1, 2, 3, 7):
+            with self.subTest(limit=limit):
+                page, has_more = self.conversation.get_history(limit=limit)
+                seen = [message.id for message in page]
+                while has_more:
+                    before = Message.parse_history_cursor(page[0].history_cursor)
+                    page, has_more = self.conversation.get_history(before=before, limit=limit)
+                    seen = [message.id for message in page] + seen
+                self.assertEqual(seen, self.expected)
+
+    def test_parse_history_cursor(self):
+        message = Message.objects.get(content='message 3')
+        self.assertEqual(Message.parse_history_cursor(message.history_cursor), (self.tied, message.id))
+        for cursor in (None, '', 'bogus', f'{self.tied.isoformat()}|x', '2030-13-40T00:00:00|3', '|3'):
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(Message.parse_history_cursor(cursor))
+
+    def test_older_messages_endpoint(self):
+        self.client.force_login(self.alice)
+        url = f'/chat/api/conversation/{self.conversation.id}/older-messages/'
+        newest = Message.objects.get(id=self.expected[-1])
+        data = self.client.get(url, {'before': newest.history_cursor}).json()
+        self.assertEqual([message['id'] for message in data['messages']], self.expected[:-1])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(data['next_cursor'], Message.objects.get(id=self.expected[0]).history_cursor)
+
+        for before in ('bogus', ''):
+            with self.subTest(before=before):
+                response = self.client.get(url, {'before': before})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'success': False, 'error': 'Invalid cursor'})
+
+    def test_older_messages_of_other_conversations_not_found(self):
+        carol = User.objects.create_user(username='carol', password='pw')
+        self.client.force_login(carol)
+        newest = Message.objects.get(id=self.expected[-1])
+        response = self.client.get(
+            f'/chat/api/conversation/{self.conversation.id}/older-messages/', {'before': newest.history_cursor}
+        )
+        self.assertEqual(response.status_code, 404)
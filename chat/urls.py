@@ -11,6 +11,8 @@ urlpatterns = [
     path('conversation/<int:conversation_id>/unarchive/', views.unarchive_conversation, name='unarchive_conversation'),
     path('conversation/<int:conversation_id>/delete/', views.delete_conversation, name='delete_conversation'),
     path('api/conversation/<int:conversation_id>/new-messages/', views.get_new_messages, name='get_new_messages'),
+    path('api/conversation/<int:conversation_id>/older-messages/', views.get_older_messages, name='get_older_messages'),
     path('api/conversations/update/', views.get_conversations_update, name='get_conversations_update'),
     path('api/unread-count/', views.get_unread_count, name='get_unread_count'),
+    path('api/events/', views.event_stream, name='event_stream'),
 ]
@@ -1,11 +1,32 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db.models import Q, Max, Prefetch, Count, OuterRef, Subquery
-from django.core.paginator import Paginator
-from .models import Conversation, Message, MessageStatus, ConversationUserStatus
-from django.http import JsonResponse
+from django.db.models import F, Q, Max, Count, OuterRef, Subquery
+from .models import Conversation, Message, ConversationUserStatus
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.core.handlers.asgi import ASGIRequest
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.db import transaction
+from django.conf import settings
+from . import events, services
+import asyncio
+from datetime import timedelta
+
+MESSAGES_PAGE_SIZE = 50
+
+# Delta syncs re-read this far back so a write that committed just after the
+# previous sync's snapshot is not missed
+CONVERSATION_SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def chat_state_etag(request, *args, **kwargs):
+    """ETag for the polling endpoints: the user's chat state version"""
+    return ConversationUserStatus.version_for(request.user)
+
 
 @login_required
 def messages_page(request):
@@ -30,93 +51,49 @@ def messages_page(request):
     # Check if viewing archived conversations
     view_archived = request.GET.get('archived', 'false').lower() == 'true'
     
-    # Get all conversations for the current user with optimized queries
-    conversations = Conversation.objects.filter(
-        participants=request.user
-    ).prefetch_related(
-        'participants',
-        Prefetch(
-            'messages',
-            queryset=Message.objects.select_related('sender').order_by('-timestamp')[:1],
-            to_attr='latest_messages'
-        )
-    ).distinct()
-    
-    # Filter out deleted conversations
-    deleted_statuses = ConversationUserStatus.objects.filter(
-        user=request.user,
-        is_deleted=True
-    ).values_list('conversation_id', flat=True)
-    conversations = conversations.exclude(id__in=deleted_statuses)
-    
-    # Filter archived conversations based on view mode
-    if view_archived:
-        # Show only archived conversations
-        archived_statuses = ConversationUserStatus.objects.filter(
-            user=request.user,
-            is_archived=True
-        ).values_list('conversation_id', flat=True)
-        conversations = conversations.filter(id__in=archived_statuses)
-    else:
-        # Exclude archived conversations
-        archived_statuses = ConversationUserStatus.objects.filter(
-            user=request.user,
-            is_archived=True
-        ).values_list('conversation_id', flat=True)
-        conversations = conversations.exclude(id__in=archived_statuses)
-    
     # Get selected conversation
     conversation_id = request.GET.get('conversation')
     selected_conversation = None
     messages = []
-    page_obj = None
+    has_older_messages = False
     last_message_id = 0
     
     if conversation_id:
-        selected_conversation = conversations.filter(id=conversation_id).first()
+        selected_conversation = Conversation.objects.inbox_for(
+            request.user,
+            archived=view_archived
+        ).filter(id=conversation_id).first()
         if selected_conversation:
-            # Get messages with pagination
-            messages_queryset = selected_conversation.messages.select_related('sender').order_by('timestamp')
-            paginator = Paginator(messages_queryset, 50)  # 50 messages per page
-            page_number = request.GET.get('page', 1)
-            page_obj = paginator.get_page(page_number)
-            messages = list(page_obj.object_list)  # Convert to list for negative indexing
+            # Newest 50 messages; older ones load through get_older_messages
+            messages, has_older_messages = selected_conversation.get_history(limit=MESSAGES_PAGE_SIZE)
             
             # Get last message ID for polling
             if messages:
                 last_message_id = messages[-1].id
-            else:
-                # If no messages on this page, get the latest message ID from the conversation
-                latest_msg = selected_conversation.messages.order_by('-timestamp').first()
-                last_message_id = latest_msg.id if latest_msg else 0
             
             # Mark messages as read using MessageStatus
-            unread_messages = selected_conversation.messages.exclude(sender=request.user)
-            for message in unread_messages:
-                message.mark_as_read_for_user(request.user)
+            selected_conversation.mark_read_for_user(request.user)
     
-    # Add computed fields to each conversation (optimized)
-    for conv in conversations:
-        # Get unread count using MessageStatus
-        conv.unread_count = MessageStatus.objects.filter(
-            message__conversation=conv,
-            user=request.user,
-            is_read=False
-        ).exclude(
-            message__sender=request.user
-        ).count()
-        
-        conv.other_user = conv.get_other_participant(request.user)
-        conv.latest_message = conv.get_latest_message()
+    # Built after marking as read so the selected conversation shows no unread badge
+    conversations = Conversation.objects.build_inbox(request.user, archived=view_archived)
+    
+    other_user = None
+    if selected_conversation:
+        other_user = next(
+            (conv.other_user for conv in conversations if conv.id == selected_conversation.id),
+            None
+        )
     
     context = {
         'conversations': conversations,
         'selected_conversation': selected_conversation,
         'messages': messages,
-        'page_obj': page_obj,
+        'has_older_messages': has_older_messages,
+        'older_messages_cursor': messages[0].history_cursor if messages else '',
         'last_message_id': last_message_id,
-        'other_user': selected_conversation.get_other_participant(request.user) if selected_conversation else None,
+        'other_user': other_user,
         'view_archived': view_archived,
+        'push_enabled': settings.CHAT_PUSH_ENABLED,
     }
     return render(request, 'chat/messages.html', context)
 
@@ -142,36 +119,14 @@ def send_message(request, conversation_id):
         
         content = request.POST.get('content', '').strip()
         if content:
-            message = Message.objects.create(
-                conversation=conversation,
-                sender=request.user,
-                content=content
-            )
-            
-            # Update conversation timestamp
-            conversation.updated_at = timezone.now()
-            conversation.save(update_fields=['updated_at'])
-            
-            # Create MessageStatus for other participants (unread)
-            other_participants = conversation.participants.exclude(id=request.user.id)
-            for participant in other_participants:
-                MessageStatus.objects.get_or_create(
-                    message=message,
-                    user=participant,
-                    defaults={'is_read': False}
-                )
+            # Message, read tracking, unread counters and push in one transaction
+            message = services.send_message(conversation, request.user, content)[0]
+            message_data = events.serialize_message(message)
             
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({
                     'success': True,
-                    'message': {
-                        'id': message.id,
-                        'content': message.content,
-                        'sender': message.sender.username,
-                        'sender_id': message.sender.id,
-                        'timestamp': message.timestamp.strftime('%H:%M'),
-                        'full_timestamp': message.timestamp.isoformat(),
-                    }
+                    'message': message_data
                 })
         
         return redirect(f'/chat/messages/?conversation={conversation_id}')
@@ -180,40 +135,38 @@ def send_message(request, conversation_id):
 
 def get_or_create_conversation(user1, user2):
     """Get existing conversation or create new one between two users"""
-    # Optimized query to find existing conversation
-    conversation = Conversation.objects.filter(
-        participants=user1
-    ).filter(
-        participants=user2
-    ).prefetch_related('participants').first()
-    
-    if conversation:
-        # Check if conversation is deleted for either user and restore it
-        for user in [user1, user2]:
-            try:
-                status = ConversationUserStatus.objects.get(
-                    conversation=conversation,
-                    user=user
-                )
-                if status.is_deleted:
-                    # Restore the conversation by un-deleting it
-                    status.is_deleted = False
-                    status.deleted_at = None
-                    status.is_archived = False  # Also un-archive if it was archived
-                    status.archived_at = None
-                    status.save()
-            except ConversationUserStatus.DoesNotExist:
-                # No status record, conversation is not deleted
-                pass
-    else:
-        # Create new conversation
-        conversation = Conversation.objects.create()
-        conversation.participants.add(user1, user2)
+    # Single indexed lookup on the canonical pair; the unique constraint makes
+    # concurrent creation safe (get_or_create re-reads on IntegrityError)
+    user_low_id, user_high_id = sorted([user1.id, user2.id])
+    with transaction.atomic():
+        conversation, created = Conversation.objects.get_or_create(
+            user_low_id=user_low_id,
+            user_high_id=user_high_id,
+        )
+        if created:
+            conversation.participants.add(user1, user2)
+    
+    if not created:
+        # Restore the conversation for anyone who deleted it (also un-archive)
+        ConversationUserStatus.objects.filter(
+            conversation=conversation,
+            user__in=[user1, user2],
+            is_deleted=True
+        ).update(
+            is_deleted=False,
+            deleted_at=None,
+            is_archived=False,
+            archived_at=None,
+            updated_at=timezone.now(),
+            version=F('version') + 1
+        )
     
     return conversation
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=chat_state_etag)
 def get_new_messages(request, conversation_id):
     """AJAX endpoint to get new messages since last_message_id"""
     conversation = get_object_or_404(
@@ -229,22 +182,20 @@ def get_new_messages(request, conversation_id):
         last_message_id = 0
     
     # Get messages newer than last_message_id
-    new_messages = conversation.messages.filter(
+    new_messages = list(conversation.messages.filter(
         id__gt=last_message_id
-    ).select_related('sender').order_by('timestamp')
+    ).select_related('sender').order_by('timestamp'))
     
-    # Mark as read
-    for message in new_messages.exclude(sender=request.user):
-        message.mark_as_read_for_user(request.user)
+    # Mark as read up to the newest message being returned
+    if any(msg.sender_id != request.user.id for msg in new_messages):
+        conversation.mark_read_for_user(
+            request.user,
+            up_to_message_id=max(msg.id for msg in new_messages)
+        )
     
     messages_data = [{
-        'id': msg.id,
-        'content': msg.content,
-        'sender': msg.sender.username,
-        'sender_id': msg.sender.id,
-        'timestamp': msg.timestamp.strftime('%H:%M'),
-        'full_timestamp': msg.timestamp.isoformat(),
-        'is_sent': msg.sender.id == request.user.id,
+        **events.serialize_message(msg),
+        'is_sent': msg.sender_id == request.user.id,
     } for msg in new_messages]
     
     return JsonResponse({
@@ -255,46 +206,97 @@ def get_new_messages(request, conversation_id):
 
 
 @login_required
-def get_conversations_update(request):
-    """AJAX endpoint to get updated conversation list"""
-    conversations = Conversation.objects.filter(
+def get_older_messages(request, conversation_id):
+    """AJAX endpoint to load the page of history before a message cursor"""
+    conversation = get_object_or_404(
+        Conversation,
+        id=conversation_id,
         participants=request.user
-    ).prefetch_related('participants').distinct()
+    )
     
-    # Filter out deleted conversations
-    deleted_statuses = ConversationUserStatus.objects.filter(
-        user=request.user,
-        is_deleted=True
-    ).values_list('conversation_id', flat=True)
-    conversations = conversations.exclude(id__in=deleted_statuses)
+    before = Message.parse_history_cursor(request.GET.get('before'))
+    if before is None:
+        return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+    
+    older_messages, has_more = conversation.get_history(before=before, limit=MESSAGES_PAGE_SIZE)
     
-    # Check if viewing archived
+    return JsonResponse({
+        'success': True,
+        'messages': [{
+            **events.serialize_message(msg),
+            'is_sent': msg.sender_id == request.user.id,
+        } for msg in older_messages],
+        'has_more': has_more,
+        'next_cursor': older_messages[0].history_cursor if older_messages else None,
+    })
+
+
+@login_required
+async def event_stream(request):
+    """Server-Sent Events stream of chat events for the current user (ASGI only)"""
+    # Under WSGI the endless stream would hold a worker forever without sending anything
+    if not settings.CHAT_PUSH_ENABLED or not isinstance(request, ASGIRequest):
+        raise Http404('Chat push is not enabled')
+    user = await request.auser()
+    broker = events.get_broker()
+    keepalive = settings.CHAT_STREAM_KEEPALIVE_SECONDS
+    
+    async def stream():
+        # Subscribed on first iteration, so the finally below always unsubscribes
+        queue = broker.subscribe(user.id)
+        try:
+            # Ask the browser to wait a few seconds before reconnecting
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    # Comment frame keeps proxies from closing an idle connection
+                    yield ': keepalive\n\n'
+                    continue
+                yield events.format_sse(event)
+        finally:
+            broker.unsubscribe(user.id, queue)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=chat_state_etag)
+def get_conversations_update(request):
+    """
+    AJAX endpoint to get updated conversation list. With ?since=<synced_at of
+    a previous response> only the conversations that changed are returned,
+    plus the ids that left this list (archived, unarchived or deleted).
+    """
     view_archived = request.GET.get('archived', 'false').lower() == 'true'
-    if view_archived:
-        archived_statuses = ConversationUserStatus.objects.filter(
-            user=request.user,
-            is_archived=True
-        ).values_list('conversation_id', flat=True)
-        conversations = conversations.filter(id__in=archived_statuses)
-    else:
-        archived_statuses = ConversationUserStatus.objects.filter(
+    synced_at = timezone.now()
+    
+    conversations = Conversation.objects.all()
+    removed = []
+    since = request.GET.get('since')
+    if since:
+        since = parse_datetime(since)
+        if since is None:
+            return JsonResponse({'success': False, 'error': 'Invalid since'}, status=400)
+        since -= CONVERSATION_SYNC_OVERLAP
+        conversations = conversations.changed_since(request.user, since)
+        removed = list(ConversationUserStatus.objects.filter(
             user=request.user,
-            is_archived=True
-        ).values_list('conversation_id', flat=True)
-        conversations = conversations.exclude(id__in=archived_statuses)
+            updated_at__gt=since
+        ).filter(
+            Q(is_deleted=True) | Q(is_archived=not view_archived)
+        ).values_list('conversation_id', flat=True))
+    conversations = conversations.build_inbox(request.user, archived=view_archived)
     
     conversations_data = []
     for conv in conversations:
-        latest_msg = conv.get_latest_message()
-        unread_count = MessageStatus.objects.filter(
-            message__conversation=conv,
-            user=request.user,
-            is_read=False
-        ).exclude(
-            message__sender=request.user
-        ).count()
-        
-        other_user = conv.get_other_participant(request.user)
+        latest_msg = conv.latest_message
+        other_user = conv.other_user
         conversations_data.append({
             'id': conv.id,
             'other_user': {
@@ -303,28 +305,34 @@ def get_conversations_update(request):
                 'name': f"{other_user.first_name} {other_user.last_name}".strip() if other_user else '',
             },
             'latest_message': {
-                'content': latest_msg.content[:50] if latest_msg else '',
-                'timestamp': latest_msg.timestamp.isoformat() if latest_msg else None,
+                'id': latest_msg.id,
+                'content': latest_msg.content[:50],
+                'timestamp': latest_msg.timestamp.isoformat(),
+                'time': timezone.localtime(latest_msg.timestamp).strftime('%H:%M'),
             } if latest_msg else None,
-            'unread_count': unread_count,
+            'unread_count': conv.unread_count,
             'updated_at': conv.updated_at.isoformat(),
+            # Rendered list item, for conversations the page does not show yet
+            'html': render_to_string('chat/conversation_item.html', {
+                'conversation': conv,
+                'view_archived': view_archived,
+            }, request=request),
         })
     
     return JsonResponse({
         'success': True,
-        'conversations': conversations_data
+        'conversations': conversations_data,
+        'removed': removed,
+        'synced_at': synced_at.isoformat(),
     })
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=chat_state_etag)
 def get_unread_count(request):
     """AJAX endpoint to get total unread message count"""
-    unread_count = MessageStatus.objects.filter(
-        user=request.user,
-        is_read=False
-    ).exclude(
-        message__sender=request.user
-    ).count()
+    unread_count = ConversationUserStatus.total_unread_for(request.user)
     
     return JsonResponse({
         'success': True,
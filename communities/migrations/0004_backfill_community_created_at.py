@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:20
+
+import datetime
+
+from django.db import migrations
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+
+# Communities from before created_at was tracked and never saved since
+UNDATED = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def backfill_created_at(apps, schema_editor):
+    """Date undated communities by their last update, so created_at can become NOT NULL"""
+    Community = apps.get_model('communities', 'Community')
+    Community.objects.filter(created_at__isnull=True).update(
+        created_at=Coalesce('updated_at', Value(UNDATED))
+    )
+
+
+class Migration(migrations.Migration):
+    """Separate from 0005 so the backfill is committed before the table is altered"""
+
+    dependencies = [
+        ('communities', '0003_community_is_approved_communityrequest_post_comment'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+    ]
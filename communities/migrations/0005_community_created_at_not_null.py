@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communities', '0004_backfill_community_created_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='community',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AddIndex(
+            model_name='community',
+            index=models.Index(fields=['-created_at', '-id'], condition=models.Q(is_approved=True), name='communities_approved_new_idx'),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
 from django.conf import settings
+from django.db.models.signals import m2m_changed, pre_delete, post_save
+from django.dispatch import receiver
+from ripple.cache import namespace
 from skills.models import Skill
 
 
@@ -8,7 +11,7 @@ class Community(models.Model):
     skill = models.ForeignKey(Skill, on_delete=models.CASCADE)
     description = models.TextField(blank=True)
     members = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='communities', blank=True)
-    created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
     creator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='created_communities')
     is_approved = models.BooleanField(default=True)  # For admin approval system
@@ -16,6 +19,10 @@ class Community(models.Model):
     class Meta:
         verbose_name_plural = 'Communities'
         ordering = ['-created_at']
+        indexes = [
+            # Community list and feed, newest first with the cursor tie-breaker; partial, since only approved communities are listed
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_approved=True), name='communities_approved_new_idx'),
+        ]
 
     def __str__(self) -> str:
         return f"{self.name} ({self.skill.name})"
@@ -107,3 +114,28 @@ class Comment(models.Model):
     @property
     def score(self):
         return self.upvotes.count() - self.downvotes.count()
+
+
+@receiver(m2m_changed, sender=Community.members.through)
+def clear_member_sidebar_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep the cached sidebar communities/stats of joining and leaving users fresh"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # user.communities.add(...) - instance is the user
+        namespace('user_sidebar').delete(instance.pk)
+    elif action == 'pre_clear':
+        namespace('user_sidebar').delete(*instance.members.values_list('id', flat=True))
+    else:
+        namespace('user_sidebar').delete(*pk_set)
+
+
+@receiver(pre_delete, sender=Community)
+@receiver(post_save, sender=Community)
+def clear_community_sidebar_cache(sender, instance, **kwargs):
+    if instance.pk:
+        namespace('user_sidebar').delete(*instance.members.values_list('id', flat=True))
+
+
+# Cached community list totals change with communities and memberships ("My Communities")
+namespace('list_counts').invalidate_on(Community, Community.members.through)
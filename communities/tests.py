@@ -1,3 +1,66 @@
-from django.test import TestCase
+import unittest
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from skills.models import Skill
+
+from .models import Community
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'communities-tests'},
+    'hot': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'communities-tests-hot'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CommunitiesFeedTests(TestCase):
+    """The community list and its cursor feed, newest first"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='member', password='pw')
+        self.skill = Skill.objects.create(name='Python')
+        for position in range(30):
+            Community.objects.create(name=f'Community {position}', skill=self.skill, is_approved=position != 0)
+        # Half of them created at the same moment
+        Community.objects.filter(name__endswith='5').update(created_at=timezone.now())
+        self.expected = list(
+            Community.objects.filter(is_approved=True).order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+
+    def test_feed_continues_list_page(self):
+        response = self.client.get('/communities/')
+        first_page = [community.id for community in response.context['communities']]
+        self.assertEqual(first_page, self.expected[:24])
+
+        data = self.client.get('/communities/feed/', {'cursor': response.context['next_cursor']}).json()
+        self.assertEqual([community['id'] for community in data['communities']], self.expected[24:])
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(data['total'], 29)
+        self.assertEqual(data['html'].count('community-date'), 5)
+
+    def test_feed_pages_from_start(self):
+        data = self.client.get('/communities/feed/').json()
+        self.assertEqual([community['id'] for community in data['communities']], self.expected[:24])
+        data = self.client.get('/communities/feed/', {'cursor': data['next_cursor']}).json()
+        self.assertEqual([community['id'] for community in data['communities']], self.expected[24:])
+
+    def test_my_communities_filter(self):
+        joined = Community.objects.filter(is_approved=True).order_by('id')[:3]
+        self.user.communities.add(*joined)
+        self.client.force_login(self.user)
+        data = self.client.get('/communities/feed/', {'filter': 'my'}).json()
+        self.assertEqual({community['id'] for community in data['communities']}, {community.id for community in joined})
+
+    def test_bad_cursor(self):
+        response = self.client.get('/communities/feed/', {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'success': False, 'error': 'Invalid cursor'})
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'Plans are checked against SQLite')
+    def test_list_order_uses_index(self):
+        plan = Community.objects.filter(is_approved=True, created_at__lt=timezone.now()).order_by('-created_at', '-id')[:25].explain()
+        self.assertIn('USING INDEX communities_approved_new_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
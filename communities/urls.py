@@ -6,6 +6,7 @@ app_name = 'communities'
 urlpatterns = [
     # Community browsing
     path('', views.CommunitiesListView.as_view(), name='communities'),
+    path('feed/', views.CommunitiesFeedView.as_view(), name='communities_feed'),
     path('<int:pk>/', views.community_detail, name='community_detail'),
     
     # Join/Leave
@@ -6,6 +6,9 @@ from django.http import JsonResponse
 from django.db.models import Count, Q, Prefetch
 from django.utils import timezone
 from django.views.generic import ListView
+from django.template.loader import render_to_string
+from django.urls import reverse
+from ripple.pagination import CachedCountPaginator, KeysetPaginator, cached_count
 from .models import Community, CommunityRequest, Post, Comment
 from skills.models import Skill
 
@@ -15,6 +18,9 @@ class CommunitiesListView(ListView):
     template_name = 'communities/communities.html'
     context_object_name = 'communities'
     paginate_by = 24
+    paginator_class = CachedCountPaginator
+    # Newest first; the primary key breaks ties for cursor pages
+    sort_keys = [('created_at', True)]
     
     def get_queryset(self):
         skill_param = self.request.GET.get('skill', '')
@@ -40,8 +46,8 @@ class CommunitiesListView(ListView):
         if filter_type == 'my' and self.request.user.is_authenticated:
             communities = communities.filter(members=self.request.user)
         
-        # Order by newest first
-        communities = communities.order_by('-created_at')
+        # Order by newest first (communities_approved_new_idx)
+        communities = communities.order_by(*KeysetPaginator(communities, self.sort_keys, self.paginate_by).ordering())
         
         return communities
     
@@ -61,9 +67,48 @@ class CommunitiesListView(ListView):
         context['selected_skills'] = selected_skills
         context['filter_type'] = filter_type
         
+        # Where infinite scroll continues after this page
+        page_obj = context['page_obj']
+        if page_obj.has_next():
+            paginator = KeysetPaginator(self.object_list, self.sort_keys, self.paginate_by)
+            # list() fills the page's result cache, which the template then reuses
+            context['next_cursor'] = paginator.cursor_for(list(page_obj.object_list)[-1])
+        
         return context
 
 
+class CommunitiesFeedView(CommunitiesListView):
+    """Infinite-scroll JSON variant of the community list, paginated by cursor"""
+    
+    def get(self, request, *args, **kwargs):
+        paginator = KeysetPaginator(self.get_queryset(), self.sort_keys, self.paginate_by)
+        try:
+            communities, next_cursor = paginator.page(request.GET.get('cursor'))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+        
+        return JsonResponse({
+            'success': True,
+            'communities': [
+                {
+                    'id': c.id,
+                    'name': c.name,
+                    'skill': c.skill.name,
+                    'members': len(c.members.all()),
+                    'url': reverse('communities:community_detail', args=[c.pk]),
+                }
+                for c in communities
+            ],
+            # Rendered cards, so the page can append them as they are
+            'html': ''.join(
+                render_to_string('communities/community_card.html', {'c': c, 'delay': 0}, request=request)
+                for c in communities
+            ),
+            'next_cursor': next_cursor,
+            'total': cached_count(paginator.queryset),
+        })
+
+
 def community_detail(request, pk):
     """View community with posts"""
     community = get_object_or_404(
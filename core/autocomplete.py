@@ -0,0 +1,200 @@
+"""
+In-memory prefix index for search-box typeahead.
+
+Each worker keeps a sorted list of (key, kind, object_id, label, slug) entries,
+one per word of every skill name, published class title, community name and
+active username, and answers prefix lookups with bisect - no database
+access per keystroke. The index is loaded on first use. Saves that change an
+indexed field patch it in place once their transaction commits, and bump the
+'autocomplete' cache namespace version so the other workers reload. Lookups
+compare against the worker's copy of that version, which is refreshed from
+the shared cache at most every VERSION_REFRESH seconds (see ripple.cache),
+so keystrokes do not touch storage either.
+Usage: suggest('pyth') -> [{'kind': 'skill', 'id': 3, 'label': 'Python', 'url': '/skill/3/'}, ...]
+"""
+import bisect
+import re
+import threading
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.urls import reverse
+
+from ripple.cache import namespace
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+# Entries examined per lookup; bounds the cost of very short prefixes
+SCAN_LIMIT = 200
+
+autocomplete_cache = namespace('autocomplete')
+
+URL_NAMES = {
+    'skill': 'core:skill_detail',
+    'class': 'skills:class_detail',
+    'community': 'communities:community_detail',
+    'user': 'users:view_profile',
+}
+
+
+def normalize(text):
+    return ' '.join(WORD_RE.findall(text.lower()))
+
+
+def _entries_for(kind, object_id, label, slug):
+    """One entry for the whole label and one per following word"""
+    words = normalize(label).split()
+    return [
+        (' '.join(words[position:]), kind, object_id, label, slug)
+        for position in range(len(words))
+    ]
+
+
+def _load_entries():
+    from communities.models import Community
+    from skills.models import Skill, TeachingClass
+
+    entries = []
+    for object_id, name in Skill.objects.values_list('id', 'name'):
+        entries += _entries_for('skill', object_id, name, object_id)
+    for object_id, title, slug in TeachingClass.objects.filter(
+        is_published=True
+    ).values_list('id', 'title', 'slug'):
+        entries += _entries_for('class', object_id, title, slug)
+    for object_id, name in Community.objects.values_list('id', 'name'):
+        entries += _entries_for('community', object_id, name, object_id)
+    for object_id, username in User.objects.filter(is_active=True).values_list('id', 'username'):
+        entries += _entries_for('user', object_id, username, username)
+    entries.sort()
+    return entries
+
+
+class PrefixIndex:
+    """Sorted entry list with bisect lookups; writers hold a lock, readers do not"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = None
+        self._version = None
+
+    def _current_entries(self):
+        version = autocomplete_cache.version
+        entries = self._entries
+        if entries is None or version != self._version:
+            with self._lock:
+                entries = self._entries
+                if entries is None or version != self._version:
+                    entries = self._entries = _load_entries()
+                    self._version = version
+        return entries
+
+    def lookup(self, prefix, limit=8):
+        """Entries whose key starts with prefix: whole-label matches first, then shorter labels"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        entries = self._current_entries()
+        start = bisect.bisect_left(entries, (prefix,))
+        matches = {}
+        for entry in entries[start:start + SCAN_LIMIT]:
+            if not entry[0].startswith(prefix):
+                break
+            key, kind, object_id, label, slug = entry
+            whole_label = key == normalize(label)
+            best = matches.get((kind, object_id))
+            if best is None or (whole_label and not best[0]):
+                matches[(kind, object_id)] = (whole_label, label, slug)
+        ranked = sorted(
+            matches.items(),
+            key=lambda item: (not item[1][0], len(item[1][1]), item[1][1].lower())
+        )
+        return [(kind, object_id, label, slug) for (kind, object_id), (_, label, slug) in ranked[:limit]]
+
+    def replace(self, kind, object_id, label=None, slug=None):
+        """Swap the entries of one object in place (label None removes it)"""
+        with self._lock:
+            previous_version = autocomplete_cache.version
+            # Other workers reload on their next lookup
+            autocomplete_cache.invalidate()
+            if self._entries is None or previous_version != self._version:
+                # Not loaded, or already stale: the next lookup reloads everything
+                self._entries = None
+                return
+            entries = [entry for entry in self._entries if not (entry[1] == kind and entry[2] == object_id)]
+            if label:
+                for entry in _entries_for(kind, object_id, label, slug):
+                    bisect.insort(entries, entry)
+            # Publish the new list in one assignment so readers never see a partial update
+            self._entries = entries
+            self._version = autocomplete_cache.version
+
+
+index = PrefixIndex()
+
+
+def suggest(query, limit=8):
+    """Typeahead suggestions for query, ready for JSON"""
+    return [
+        {
+            'kind': kind,
+            'id': object_id,
+            'label': label,
+            'url': reverse(URL_NAMES[kind], args=[slug]),
+        }
+        for kind, object_id, label, slug in index.lookup(query, limit=limit)
+    ]
+
+
+# Model label -> (kind, fields the entry is built from)
+SOURCES = {
+    'skills.skill': ('skill', {'name'}),
+    'skills.teachingclass': ('class', {'title', 'slug', 'is_published'}),
+    'communities.community': ('community', {'name'}),
+    'auth.user': ('user', {'username', 'is_active'}),
+}
+
+
+def _indexed_values(instance, fields):
+    return {field: getattr(instance, field) for field in fields}
+
+
+def remember_object(instance, update_fields=None):
+    """Before a save: keep the stored indexed values, so update_object can skip unchanged saves"""
+    _, fields = SOURCES[instance._meta.label_lower]
+    if instance._state.adding or instance.pk is None:
+        return
+    if update_fields and not set(update_fields) & fields:
+        return
+    instance._autocomplete_previous = type(instance)._base_manager.filter(
+        pk=instance.pk
+    ).values(*sorted(fields)).first()
+
+
+def _replace_on_commit(instance, *args):
+    # Before the commit another worker could reload and keep the old rows under the new version
+    transaction.on_commit(partial(index.replace, *args), using=instance._state.db)
+
+
+def update_object(instance, update_fields=None):
+    """Reflect a saved model instance in the index once the save commits"""
+    kind, fields = SOURCES[instance._meta.label_lower]
+    if update_fields and not set(update_fields) & fields:
+        return
+    # Saves that leave every indexed field alone (counters, last_login) keep the index as is
+    previous = instance.__dict__.pop('_autocomplete_previous', None)
+    if previous is not None and previous == _indexed_values(instance, fields):
+        return
+    if kind == 'skill':
+        _replace_on_commit(instance, kind, instance.pk, instance.name, instance.pk)
+    elif kind == 'class':
+        _replace_on_commit(instance, kind, instance.pk, instance.title if instance.is_published else None, instance.slug)
+    elif kind == 'community':
+        _replace_on_commit(instance, kind, instance.pk, instance.name, instance.pk)
+    else:
+        _replace_on_commit(instance, kind, instance.pk, instance.username if instance.is_active else None, instance.username)
+
+
+def remove_object(instance):
+    """Drop a deleted model instance from the index once the delete commits"""
+    kind, _ = SOURCES[instance._meta.label_lower]
+    _replace_on_commit(instance, kind, instance.pk)
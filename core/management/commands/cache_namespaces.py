@@ -0,0 +1,63 @@
+"""
+Management command to inspect and flush the project's cache namespaces.
+Flushing a namespace bumps its version, which every worker sees at once.
+Usage: python manage.py cache_namespaces [--flush NAME ...] [--flush-all] [--clear-alias ALIAS]
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from ripple.cache import registered_namespaces
+
+
+class Command(BaseCommand):
+    help = 'List cache namespaces, or flush namespaces / whole cache aliases'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--flush',
+            nargs='+',
+            metavar='NAME',
+            help='Invalidate the given namespaces',
+        )
+        parser.add_argument(
+            '--flush-all',
+            action='store_true',
+            help='Invalidate every registered namespace',
+        )
+        parser.add_argument(
+            '--clear-alias',
+            metavar='ALIAS',
+            help='Clear an entire cache alias (e.g. default, hot); hot only affects this process',
+        )
+
+    def handle(self, *args, **options):
+        namespaces = registered_namespaces()
+
+        if options['clear_alias']:
+            alias = options['clear_alias']
+            if alias not in settings.CACHES:
+                raise CommandError(f"Unknown cache alias '{alias}' (configured: {', '.join(settings.CACHES)})")
+            caches[alias].clear()
+            self.stdout.write(self.style.SUCCESS(f"✓ Cleared cache alias '{alias}'"))
+            return
+
+        to_flush = []
+        if options['flush_all']:
+            to_flush = list(namespaces.values())
+        elif options['flush']:
+            unknown = [name for name in options['flush'] if name not in namespaces]
+            if unknown:
+                raise CommandError(f"Unknown cache namespace(s): {', '.join(unknown)}")
+            to_flush = [namespaces[name] for name in options['flush']]
+
+        if to_flush:
+            for ns in to_flush:
+                ns.invalidate()
+                self.stdout.write(self.style.SUCCESS(f"✓ Flushed '{ns.name}' (now version {ns.version})"))
+            return
+
+        self.stdout.write(f"{'NAMESPACE':<24} {'ALIAS':<10} {'TIMEOUT':>8}  VERSION")
+        for name, ns in sorted(namespaces.items()):
+            self.stdout.write(f"{name:<24} {ns.alias:<10} {ns.timeout:>8}  {ns.version}")
+        for alias, config in settings.CACHES.items():
+            self.stdout.write(f"\nAlias '{alias}': {config['BACKEND']} ({config.get('LOCATION', '')})")
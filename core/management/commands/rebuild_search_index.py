@@ -0,0 +1,18 @@
+"""
+Management command to regenerate all search documents.
+Run this after bulk imports or raw SQL changes that bypass model signals.
+Usage: python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search documents for classes, users, skills and communities'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = search.rebuild_index()
+        
+        self.stdout.write(self.style.SUCCESS(f"✓ Indexed {total} search documents"))
@@ -0,0 +1,151 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:57
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+
+POSTGRESQL_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE core_searchdocument ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX core_searchdocument_vector_idx ON core_searchdocument USING GIN (search_vector)",
+    "CREATE INDEX core_searchdocument_title_trgm_idx ON core_searchdocument USING GIN (title gin_trgm_ops)",
+]
+
+POSTGRESQL_TEARDOWN = [
+    "DROP INDEX IF EXISTS core_searchdocument_title_trgm_idx",
+    "DROP INDEX IF EXISTS core_searchdocument_vector_idx",
+    "ALTER TABLE core_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE core_searchdocument_fts USING fts5(
+        title, body,
+        content='core_searchdocument', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    "CREATE VIRTUAL TABLE core_searchdocument_vocab USING fts5vocab('core_searchdocument_fts', 'row')",
+    """
+    CREATE TRIGGER core_searchdocument_ai AFTER INSERT ON core_searchdocument BEGIN
+        INSERT INTO core_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER core_searchdocument_ad AFTER DELETE ON core_searchdocument BEGIN
+        INSERT INTO core_searchdocument_fts(core_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER core_searchdocument_au AFTER UPDATE ON core_searchdocument BEGIN
+        INSERT INTO core_searchdocument_fts(core_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO core_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+SQLITE_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS core_searchdocument_au",
+    "DROP TRIGGER IF EXISTS core_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS core_searchdocument_ai",
+    "DROP TABLE IF EXISTS core_searchdocument_vocab",
+    "DROP TABLE IF EXISTS core_searchdocument_fts",
+]
+
+
+def create_fulltext_index(apps, schema_editor):
+    """Database-specific full-text index; other databases fall back to icontains"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for statement in POSTGRESQL_SETUP:
+            schema_editor.execute(statement)
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(SQLITE_SETUP[0])
+        except OperationalError:
+            # SQLite built without FTS5
+            return
+        for statement in SQLITE_SETUP[1:]:
+            schema_editor.execute(statement)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRESQL_TEARDOWN, 'sqlite': SQLITE_TEARDOWN}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def populate_search_documents(apps, schema_editor):
+    SearchDocument = apps.get_model('core', 'SearchDocument')
+    TeachingClass = apps.get_model('skills', 'TeachingClass')
+    Skill = apps.get_model('skills', 'Skill')
+    Community = apps.get_model('communities', 'Community')
+    User = apps.get_model('auth', 'User')
+    
+    documents = []
+    for teaching_class in TeachingClass.objects.prefetch_related('topics'):
+        topics = [topic.name for topic in teaching_class.topics.all()]
+        documents.append(SearchDocument(
+            kind='class',
+            object_id=teaching_class.id,
+            title=teaching_class.title[:255],
+            body=' '.join([teaching_class.short_description, teaching_class.full_description, *topics]),
+            is_public=teaching_class.is_published,
+        ))
+    for user in User.objects.all():
+        documents.append(SearchDocument(
+            kind='user',
+            object_id=user.id,
+            title=user.username,
+            body=' '.join([user.first_name, user.last_name, user.email]),
+            is_public=user.is_active,
+        ))
+    for skill in Skill.objects.all():
+        documents.append(SearchDocument(kind='skill', object_id=skill.id, title=skill.name[:255]))
+    for community in Community.objects.all():
+        documents.append(SearchDocument(
+            kind='community',
+            object_id=community.id,
+            title=community.name[:255],
+            body=community.description,
+        ))
+    SearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('skills', '0010_classpopularity'),
+        ('communities', '0003_community_is_approved_communityrequest_post_comment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('class', 'Class'), ('user', 'User'), ('skill', 'Skill'), ('community', 'Community')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('is_public', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'is_public'], name='core_search_kind_baf45e_idx')],
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
 
 class Report(models.Model):
     """Model for user reports on any content"""
@@ -155,4 +157,102 @@ class UserWarning(models.Model):
         return f"Warning for {self.user.username} - {self.reason}"
     
 
-    
\ No newline at end of file
+    
+
+
+class SearchDocument(models.Model):
+    """
+    Denormalized search text for one searchable object (class, user, skill or
+    community). The database-specific full-text index over these rows is
+    created by migration 0002 and queried through core.search.
+    """
+    CLASS = 'class'
+    USER = 'user'
+    SKILL = 'skill'
+    COMMUNITY = 'community'
+    KIND_CHOICES = [
+        (CLASS, 'Class'),
+        (USER, 'User'),
+        (SKILL, 'Skill'),
+        (COMMUNITY, 'Community'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    is_public = models.BooleanField(default=True)  # Published class / active user
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['kind', 'object_id']
+        indexes = [
+            models.Index(fields=['kind', 'is_public']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}: {self.title}"
+
+
+# Keep search documents in sync with the objects they describe
+
+@receiver(post_save, sender='skills.TeachingClass')
+@receiver(post_save, sender='skills.Skill')
+@receiver(post_save, sender='communities.Community')
+@receiver(post_save, sender=User)
+def update_search_document(sender, instance, update_fields=None, **kwargs):
+    from core import search
+    # Skip saves that cannot change the document (e.g. last_login, rating aggregates)
+    if update_fields and not set(update_fields) & search.INDEXED_FIELDS:
+        return
+    search.index_object(instance)
+
+
+@receiver(post_delete, sender='skills.TeachingClass')
+@receiver(post_delete, sender='skills.Skill')
+@receiver(post_delete, sender='communities.Community')
+@receiver(post_delete, sender=User)
+def delete_search_document(sender, instance, **kwargs):
+    from core import search
+    search.remove_object(instance)
+
+
+@receiver(post_save, sender='skills.ClassTopic')
+@receiver(post_delete, sender='skills.ClassTopic')
+def update_class_topics_search_document(sender, instance, **kwargs):
+    """Topic names are part of the class document"""
+    from core import search
+    from skills.models import TeachingClass
+    teaching_class = TeachingClass.objects.filter(id=instance.teaching_class_id).first()
+    if teaching_class:
+        search.index_object(teaching_class)
+
+
+# Keep the typeahead prefix index in sync (this worker directly, others via its version)
+
+@receiver(pre_save, sender='skills.TeachingClass')
+@receiver(pre_save, sender='skills.Skill')
+@receiver(pre_save, sender='communities.Community')
+@receiver(pre_save, sender=User)
+def remember_autocomplete_entry(sender, instance, update_fields=None, raw=False, **kwargs):
+    from core import autocomplete
+    if not raw:
+        autocomplete.remember_object(instance, update_fields)
+
+
+@receiver(post_save, sender='skills.TeachingClass')
+@receiver(post_save, sender='skills.Skill')
+@receiver(post_save, sender='communities.Community')
+@receiver(post_save, sender=User)
+def update_autocomplete_entry(sender, instance, update_fields=None, **kwargs):
+    from core import autocomplete
+    autocomplete.update_object(instance, update_fields)
+
+
+@receiver(post_delete, sender='skills.TeachingClass')
+@receiver(post_delete, sender='skills.Skill')
+@receiver(post_delete, sender='communities.Community')
+@receiver(post_delete, sender=User)
+def delete_autocomplete_entry(sender, instance, **kwargs):
+    from core import autocomplete
+    autocomplete.remove_object(instance)
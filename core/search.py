@@ -0,0 +1,254 @@
+"""
+Full-text search over SearchDocument rows.
+
+Every searchable object (published class, user, skill, community) has one
+SearchDocument kept up to date by the receivers in core/models.py. The
+full-text index over those rows depends on the database:
+
+  PostgreSQL - stored tsvector column with a GIN index, plus a pg_trgm index
+               on the title for typo-tolerant matches
+  SQLite     - FTS5 table kept in sync by triggers; typos are corrected
+               against the index vocabulary (fts5vocab)
+  other      - plain icontains over the document table
+
+Queries match word prefixes, so results appear while a word is still being
+typed. Results are ranked per kind.
+Usage: search('pyth', kinds=['class', 'user']) -> {'class': [3, 8], 'user': [12]}
+"""
+import difflib
+import re
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q
+
+from .models import SearchDocument
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TERMS = 8
+# Terms shorter than this are not typo-corrected (too many false positives)
+MIN_TYPO_LENGTH = 4
+
+
+# Document builders: model label -> (kind, function returning document fields)
+
+def _class_document(teaching_class):
+    topics = [topic.name for topic in teaching_class.topics.all()]
+    return {
+        'title': teaching_class.title,
+        'body': ' '.join([teaching_class.short_description, teaching_class.full_description, *topics]),
+        'is_public': teaching_class.is_published,
+    }
+
+
+def _user_document(user):
+    return {
+        'title': user.username,
+        'body': ' '.join([user.first_name, user.last_name, user.email]),
+        'is_public': user.is_active,
+    }
+
+
+def _skill_document(skill):
+    return {
+        'title': skill.name,
+        'body': '',
+        'is_public': True,
+    }
+
+
+def _community_document(community):
+    return {
+        'title': community.name,
+        'body': community.description,
+        'is_public': True,
+    }
+
+
+# Model fields the documents are built from; saves touching none of them are ignored
+INDEXED_FIELDS = {
+    'title', 'short_description', 'full_description', 'is_published',
+    'username', 'first_name', 'last_name', 'email', 'is_active',
+    'name', 'description',
+}
+
+DOCUMENT_BUILDERS = {
+    'skills.teachingclass': (SearchDocument.CLASS, _class_document),
+    'auth.user': (SearchDocument.USER, _user_document),
+    'skills.skill': (SearchDocument.SKILL, _skill_document),
+    'communities.community': (SearchDocument.COMMUNITY, _community_document),
+}
+
+
+def index_object(obj):
+    """Create or refresh the search document of a model instance"""
+    kind, build = DOCUMENT_BUILDERS[obj._meta.label_lower]
+    document = build(obj)
+    document['title'] = document['title'][:255]
+    SearchDocument.objects.update_or_create(kind=kind, object_id=obj.pk, defaults=document)
+
+
+def remove_object(obj):
+    """Delete the search document of a model instance"""
+    kind, _ = DOCUMENT_BUILDERS[obj._meta.label_lower]
+    SearchDocument.objects.filter(kind=kind, object_id=obj.pk).delete()
+
+
+def rebuild_index(batch_size=500):
+    """Regenerate every search document from scratch; returns the number indexed"""
+    from communities.models import Community
+    from skills.models import Skill, TeachingClass
+
+    sources = [
+        TeachingClass.objects.prefetch_related('topics'),
+        User.objects.all(),
+        Skill.objects.all(),
+        Community.objects.all(),
+    ]
+    SearchDocument.objects.all().delete()
+    total = 0
+    for queryset in sources:
+        kind, build = DOCUMENT_BUILDERS[queryset.model._meta.label_lower]
+        documents = []
+        for obj in queryset.iterator(chunk_size=batch_size):
+            document = build(obj)
+            document['title'] = document['title'][:255]
+            documents.append(SearchDocument(kind=kind, object_id=obj.pk, **document))
+        SearchDocument.objects.bulk_create(documents, batch_size=batch_size)
+        total += len(documents)
+    return total
+
+
+# Querying
+
+def search(query, kinds=None, limit=10, public_only=True):
+    """Ranked object ids per kind for a free-text query"""
+    terms = [term.lower() for term in TERM_RE.findall(query or '')][:MAX_TERMS]
+    kinds = list(kinds or dict(SearchDocument.KIND_CHOICES))
+    results = {kind: [] for kind in kinds}
+    if not terms:
+        return results
+
+    if connection.vendor == 'postgresql':
+        rows = _search_postgresql(terms, query, kinds, limit, public_only)
+    elif connection.vendor == 'sqlite' and _sqlite_fts_available():
+        rows = _search_sqlite(terms, kinds, limit, public_only)
+    else:
+        rows = _search_fallback(terms, kinds, limit, public_only)
+
+    for kind, object_id in rows:
+        results[kind].append(object_id)
+    return results
+
+
+def search_ids(kind, query, limit=500, public_only=True):
+    """Ranked object ids of one kind"""
+    return search(query, kinds=[kind], limit=limit, public_only=public_only)[kind]
+
+
+def _search_postgresql(terms, query, kinds, limit, public_only):
+    sql = """
+        SELECT kind, object_id FROM (
+            SELECT kind, object_id,
+                   ROW_NUMBER() OVER (PARTITION BY kind ORDER BY rank DESC) AS position
+            FROM (
+                SELECT kind, object_id,
+                       ts_rank(search_vector, to_tsquery('english', %(tsquery)s))
+                       + similarity(title, %(query)s) AS rank
+                FROM core_searchdocument
+                WHERE kind = ANY(%(kinds)s)
+                  AND (is_public OR NOT %(public_only)s)
+                  AND (search_vector @@ to_tsquery('english', %(tsquery)s) OR title %% %(query)s)
+            ) matches
+        ) ranked
+        WHERE position <= %(limit)s
+        ORDER BY kind, position
+    """
+    params = {
+        'tsquery': ' & '.join(f'{term}:*' for term in terms),
+        'query': ' '.join(terms),
+        'kinds': kinds,
+        'public_only': public_only,
+        'limit': limit,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+_fts_available = None
+
+
+def _sqlite_fts_available():
+    global _fts_available
+    if _fts_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'core_searchdocument_fts'"
+            )
+            _fts_available = cursor.fetchone() is not None
+    return _fts_available
+
+
+def _sqlite_match_expression(cursor, terms):
+    """FTS5 MATCH expression: every term as a prefix, or a close spelling from the index"""
+    clauses = []
+    for term in terms:
+        alternatives = [f'"{term}"*']
+        if len(term) >= MIN_TYPO_LENGTH:
+            cursor.execute(
+                "SELECT 1 FROM core_searchdocument_vocab WHERE term >= %s AND term < %s LIMIT 1",
+                [term, term + '\uffff']
+            )
+            if cursor.fetchone() is None:
+                # Nothing starts with the term; look for near spellings sharing its first letter
+                cursor.execute(
+                    "SELECT term FROM core_searchdocument_vocab WHERE term >= %s AND term < %s LIMIT 5000",
+                    [term[0], chr(ord(term[0]) + 1)]
+                )
+                candidates = [row[0] for row in cursor.fetchall()]
+                alternatives += [f'"{match}"' for match in difflib.get_close_matches(term, candidates, n=3, cutoff=0.75)]
+        clauses.append('(' + ' OR '.join(alternatives) + ')')
+    return ' AND '.join(clauses)
+
+
+def _search_sqlite(terms, kinds, limit, public_only):
+    with connection.cursor() as cursor:
+        match = _sqlite_match_expression(cursor, terms)
+        placeholders = ', '.join(['%s'] * len(kinds))
+        sql = f"""
+            SELECT kind, object_id FROM (
+                SELECT d.kind, d.object_id,
+                       ROW_NUMBER() OVER (PARTITION BY d.kind ORDER BY m.rank) AS position
+                FROM (
+                    SELECT rowid, bm25(core_searchdocument_fts, 10.0, 1.0) AS rank
+                    FROM core_searchdocument_fts
+                    WHERE core_searchdocument_fts MATCH %s
+                ) m
+                JOIN core_searchdocument d ON d.id = m.rowid
+                WHERE d.kind IN ({placeholders})
+                  AND (d.is_public OR NOT %s)
+            )
+            WHERE position <= %s
+            ORDER BY kind, position
+        """
+        cursor.execute(sql, [match, *kinds, public_only, limit])
+        return cursor.fetchall()
+
+
+def _search_fallback(terms, kinds, limit, public_only):
+    documents = SearchDocument.objects.filter(kind__in=kinds)
+    if public_only:
+        documents = documents.filter(is_public=True)
+    for term in terms:
+        documents = documents.filter(Q(title__icontains=term) | Q(body__icontains=term))
+    rows = []
+    for kind in kinds:
+        rows += list(documents.filter(kind=kind).order_by('title').values_list('kind', 'object_id')[:limit])
+    return rows
+
+
+def ordered_by_ids(queryset, ids):
+    """Objects of queryset with the given ids, in that order"""
+    objects = queryset.in_bulk(ids)
+    return [objects[object_id] for object_id in ids if object_id in objects]
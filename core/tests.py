@@ -1,3 +1,334 @@
-from django.test import TestCase
+import base64
+import datetime
+import io
+import json
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ripple import cache as ripple_cache
+from ripple.pagination import KeysetPaginator
+from communities.models import Community
+from skills.models import ClassTopic, Skill, TeachingClass, Topic
+
+from . import autocomplete, search
+from .models import SearchDocument
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'core-tests'},
+    'hot': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'core-tests-hot'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AutocompleteInvalidationTests(TestCase):
+    """Only saves that change an indexed field reload the other workers' index"""
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user(username='pythonista', password='pw')
+        autocomplete.index.lookup('py')  # Load this worker's copy
+
+    def test_unrelated_save_keeps_version(self):
+        version = autocomplete.autocomplete_cache.version
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.user.first_name = 'Ada'
+            self.user.save()
+        self.assertEqual(callbacks, [])
+        self.assertEqual(autocomplete.autocomplete_cache.version, version)
+
+    def test_label_change_updates_index_after_commit(self):
+        version = autocomplete.autocomplete_cache.version
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.username = 'rustacean'
+            self.user.save()
+            # Nothing changes before the commit
+            self.assertEqual(autocomplete.autocomplete_cache.version, version)
+            self.assertEqual([s['label'] for s in autocomplete.suggest('pythonista')], ['pythonista'])
+        self.assertNotEqual(autocomplete.autocomplete_cache.version, version)
+        self.assertEqual([s['label'] for s in autocomplete.suggest('rust')], ['rustacean'])
+        self.assertEqual(autocomplete.suggest('pythonista'), [])
+
+    def test_deactivated_user_leaves_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(autocomplete.suggest('pythonista'), [])
+
+    def test_deleted_user_leaves_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertEqual(autocomplete.suggest('pythonista'), [])
+
+    def test_lookups_do_not_read_shared_cache(self):
+        autocomplete.index.lookup('py')
+        with mock.patch.object(caches['default'], 'get') as shared_get:
+            for prefix in ('p', 'py', 'pyt', 'pyth'):
+                autocomplete.suggest(prefix)
+        shared_get.assert_not_called()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CacheNamespaceTests(TestCase):
+    """Versioned namespaces: invalidation, per-process versions and the command"""
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['hot'].clear()
+        self.names = ripple_cache.CacheNamespace('test-names', alias='hot', timeout=60)
+
+    def test_invalidate_hides_old_values(self):
+        self.names.set('all', ['a'])
+        self.assertEqual(self.names.get_or_set('all', lambda: ['b']), ['a'])
+        self.names.invalidate()
+        self.assertIsNone(self.names.get('all'))
+        self.assertEqual(self.names.get_or_set('all', lambda: ['b']), ['b'])
+        self.names.delete('all')
+        self.assertIsNone(self.names.get('all'))
+
+    def test_version_is_read_from_shared_cache_once_per_refresh(self):
+        version = self.names.version
+        # Another worker bumps the shared version
+        caches['default'].incr(self.names.version_key)
+        with mock.patch.object(ripple_cache.caches['default'], 'get') as shared_get:
+            self.assertEqual(self.names.version, version)
+            self.names.get('all')
+        shared_get.assert_not_called()
+
+        with mock.patch('ripple.cache.time.monotonic', return_value=self.names._local_version[1] + self.names.version_refresh):
+            self.assertEqual(self.names.version, version + 1)
+
+    def test_model_changes_invalidate_after_commit(self):
+        topics = ripple_cache.CacheNamespace('test-topics')
+        topics.invalidate_on(ClassTopic, Topic)
+        self.addCleanup(self.disconnect, topics, ClassTopic, Topic)
+        version = topics.version
+        teacher = User.objects.create_user(username='teacher', password='pw')
+        teaching_class = TeachingClass.objects.create(title='Python', slug='python', teacher=teacher)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            topic = Topic.objects.create(name='Programming')
+            ClassTopic.objects.create(teaching_class=teaching_class, topic=topic)
+            self.assertEqual(topics.version, version)
+        self.assertEqual(topics.version, version + 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            topic.delete()
+        self.assertGreater(topics.version, version + 2)
+
+    @staticmethod
+    def disconnect(namespace, *models):
+        from django.db.models.signals import m2m_changed, post_delete, post_save
+        for model in models:
+            uid = f'ripple.cache:{namespace.name}:{model}'
+            post_save.disconnect(sender=model, dispatch_uid=f'{uid}:save')
+            post_delete.disconnect(sender=model, dispatch_uid=f'{uid}:delete')
+            m2m_changed.disconnect(sender=model, dispatch_uid=f'{uid}:m2m')
+
+    def test_namespace_registration(self):
+        self.assertIs(ripple_cache.namespace('trending_classes'), ripple_cache.registered_namespaces()['trending_classes'])
+        self.assertEqual(ripple_cache.namespace('trending_classes').alias, 'hot')
+        with self.assertRaises(ripple_cache.ImproperlyConfigured):
+            ripple_cache.namespace('trending_classes', alias='default')
+
+    def test_command_lists_and_flushes(self):
+        output = io.StringIO()
+        call_command('cache_namespaces', stdout=output)
+        self.assertIn('trending_classes', output.getvalue())
+
+        trending = ripple_cache.namespace('trending_classes')
+        version = trending.version
+        call_command('cache_namespaces', flush=['trending_classes'], stdout=io.StringIO())
+        self.assertEqual(trending.version, version + 1)
+        with self.assertRaises(CommandError):
+            call_command('cache_namespaces', flush=['missing'])
+
+        caches['hot'].set('key', 'value')
+        call_command('cache_namespaces', clear_alias='hot', stdout=io.StringIO())
+        self.assertIsNone(caches['hot'].get('key'))
+        with self.assertRaises(CommandError):
+            call_command('cache_namespaces', clear_alias='missing')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class KeysetPaginatorTests(TestCase):
+    """Cursor pages cover every row once, whatever the ties on the sort keys"""
+
+    def setUp(self):
+        teacher = User.objects.create_user(username='teacher', password='pw')
+        for position in range(7):
+            TeachingClass.objects.create(
+                title=f'Class {position}', slug=f'class-{position}', teacher=teacher, price_cents=100 * (position % 3)
+            )
+        # Every class shares one created_at, so only the id orders them
+        self.created = timezone.now().replace(microsecond=123456)
+        TeachingClass.objects.update(created_at=self.created)
+        self.classes = TeachingClass.objects.all()
+
+    def walk(self, keys, per_page=2):
+        paginator = KeysetPaginator(self.classes, keys, per_page=per_page)
+        seen, cursor = [], None
+        while True:
+            items, cursor = paginator.page(cursor)
+            self.assertLessEqual(len(items), per_page)
+            seen += [item.pk for item in items]
+            if cursor is None:
+                return seen
+
+    def test_pages_match_full_ordering(self):
+        for keys in ([('created_at', True)], [('price_cents', False)], [('price_cents', True), ('created_at', True)]):
+            with self.subTest(keys=keys):
+                paginator = KeysetPaginator(self.classes, keys, per_page=2)
+                expected = list(paginator.queryset.values_list('pk', flat=True))
+                self.assertEqual(len(set(expected)), 7)
+                self.assertEqual(self.walk(keys), expected)
+                self.assertEqual(self.walk(keys, per_page=7), expected)
+
+    def test_cursor_round_trip(self):
+        paginator = KeysetPaginator(self.classes, [('created_at', True), ('price_cents', False)], per_page=2)
+        item = self.classes.first()
+        values = paginator.decode(paginator.cursor_for(item))
+        # Microseconds survive, or ties on created_at would skip rows
+        self.assertEqual(values, [self.created.isoformat(), item.price_cents, item.pk])
+        self.assertEqual(paginator.keys[-1], ('id', False))
+
+    def test_bad_cursors(self):
+        paginator = KeysetPaginator(self.classes, [('created_at', True)], per_page=2)
+
+        def encode(value):
+            return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+        for cursor in ('not a cursor!', encode({'id': 1}), encode([self.created.isoformat()]), encode(['yesterday', 1]), encode([1, 'x'])):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                paginator.page(cursor)
+
+    def test_edited_cursor_is_just_a_position(self):
+        paginator = KeysetPaginator(self.classes, [('created_at', True)], per_page=10)
+        later = (self.created + datetime.timedelta(days=1)).isoformat()
+        items, cursor = paginator.page(base64.urlsafe_b64encode(json.dumps([later, 0]).encode()).decode())
+        self.assertEqual(len(items), 7)
+        self.assertIsNone(cursor)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SearchDocumentSyncTests(TestCase):
+    """Search documents follow the objects they describe"""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', password='pw')
+        self.teaching_class = TeachingClass.objects.create(
+            title='Python Basics', slug='python-basics', teacher=self.teacher, short_description='Learn to code'
+        )
+
+    def document(self, kind=SearchDocument.CLASS, object_id=None):
+        return SearchDocument.objects.filter(kind=kind, object_id=object_id or self.teaching_class.pk).first()
+
+    def test_class_save_and_delete(self):
+        self.assertEqual(self.document().title, 'Python Basics')
+        self.assertIn('Learn to code', self.document().body)
+
+        self.teaching_class.title = 'Advanced Python'
+        self.teaching_class.is_published = False
+        self.teaching_class.save()
+        self.assertEqual(self.document().title, 'Advanced Python')
+        self.assertFalse(self.document().is_public)
+
+        class_id = self.teaching_class.pk
+        self.teaching_class.delete()
+        self.assertIsNone(self.document(object_id=class_id))
+
+    def test_topic_changes_update_class_document(self):
+        link = ClassTopic.objects.create(teaching_class=self.teaching_class, name='Data Science')
+        self.assertIn('Data Science', self.document().body)
+        link.delete()
+        self.assertNotIn('Data Science', self.document().body)
+
+    def test_unindexed_save_leaves_document(self):
+        updated_at = self.document(SearchDocument.USER, self.teacher.pk).updated_at
+        self.teacher.save(update_fields=['last_login'])
+        self.assertEqual(self.document(SearchDocument.USER, self.teacher.pk).updated_at, updated_at)
+
+    def test_other_kinds(self):
+        skill = Skill.objects.create(name='Guitar')
+        community = Community.objects.create(name='Guitarists', skill=skill, description='Strumming together')
+        self.assertEqual(self.document(SearchDocument.SKILL, skill.pk).title, 'Guitar')
+        self.assertEqual(self.document(SearchDocument.COMMUNITY, community.pk).body, 'Strumming together')
+        self.teacher.is_active = False
+        self.teacher.save()
+        self.assertFalse(self.document(SearchDocument.USER, self.teacher.pk).is_public)
+
+    def test_rebuild_restores_documents(self):
+        SearchDocument.objects.all().delete()
+        output = io.StringIO()
+        call_command('rebuild_search_index', stdout=output)
+        self.assertEqual(self.document().title, 'Python Basics')
+        self.assertIn(f'Indexed {SearchDocument.objects.count()} search documents', output.getvalue())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SearchTests(TestCase):
+    """Prefix, typo-tolerant and fallback matching"""
+
+    def setUp(self):
+        teacher = User.objects.create_user(username='teacher', password='pw')
+        self.python = TeachingClass.objects.create(
+            title='Python Basics', slug='python-basics', teacher=teacher, short_description='Variables and loops'
+        )
+        self.pandas = TeachingClass.objects.create(
+            title='Data Analysis', slug='data-analysis', teacher=teacher, full_description='Using Python and pandas'
+        )
+        self.draft = TeachingClass.objects.create(
+            title='Python Drafts', slug='python-drafts', teacher=teacher, is_published=False
+        )
+        self.guitar = TeachingClass.objects.create(title='Guitar Chords', slug='guitar-chords', teacher=teacher)
+
+    def class_ids(self, query, **kwargs):
+        return search.search_ids(SearchDocument.CLASS, query, **kwargs)
+
+    def check_matching(self):
+        # Title matches rank above body matches
+        self.assertEqual(self.class_ids('python'), [self.python.pk, self.pandas.pk])
+        self.assertEqual(self.class_ids('pyth'), [self.python.pk, self.pandas.pk])
+        self.assertEqual(self.class_ids('python loop'), [self.python.pk])
+        self.assertEqual(set(self.class_ids('python', public_only=False)), {self.python.pk, self.pandas.pk, self.draft.pk})
+        self.assertEqual(self.class_ids('chemistry'), [])
+        self.assertEqual(self.class_ids('  '), [])
+        results = search.search('teach', kinds=[SearchDocument.USER, SearchDocument.CLASS])
+        self.assertEqual(results[SearchDocument.CLASS], [])
+        self.assertEqual(len(results[SearchDocument.USER]), 1)
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'FTS5 path')
+    def test_sqlite_prefix_matching(self):
+        self.assertTrue(search._sqlite_fts_available())
+        self.check_matching()
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'FTS5 path')
+    def test_sqlite_typo_tolerance(self):
+        self.assertEqual(self.class_ids('pyhton'), [self.python.pk, self.pandas.pk])
+        self.assertEqual(self.class_ids('gutiar chords'), [self.guitar.pk])
+        # Short terms are only matched as prefixes
+        self.assertEqual(self.class_ids('gui'), [self.guitar.pk])
+        self.assertEqual(self.class_ids('gux'), [])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'FTS5 path')
+    def test_sqlite_index_follows_documents(self):
+        self.python.title = 'Snake Charming'
+        self.python.save()
+        self.assertEqual(self.class_ids('snake'), [self.python.pk])
+        self.assertEqual(self.class_ids('basics'), [])
+        self.guitar.delete()
+        self.assertEqual(self.class_ids('guitar'), [])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite without FTS5 uses the fallback')
+    def test_icontains_fallback(self):
+        with mock.patch.object(search, '_sqlite_fts_available', return_value=False):
+            self.assertEqual(self.class_ids('python'), [self.pandas.pk, self.python.pk])  # By title
+            self.assertEqual(self.class_ids('ython bas'), [self.python.pk])  # Anywhere in a word
+            self.assertEqual(self.class_ids('pyhton'), [])
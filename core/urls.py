@@ -11,6 +11,7 @@ urlpatterns = [
     path('swipe/blacklist/', views.view_blacklist, name='blacklist'),
     path('swipe/remove/<int:class_id>/', views.remove_swipe_action, name='remove_swipe'),
     path('search/', views.search, name='search'),
+    path('search/autocomplete/', views.autocomplete, name='autocomplete'),
     path('skill/<int:skill_id>/', views.skill_detail, name='skill_detail'),
     path('', views.landing, name='landing'),
     path('about/', views.about, name='about'),     
@@ -3,7 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.db.models import Q, Count
 from skills.models import Skill, UserSkill, Match, TeachingClass, SwipeAction, ClassEnrollment, ClassBooking, ClassTimeSlot, TeacherApplication, ClassReview
 from communities.models import Community, CommunityRequest, Post, Comment
-from chat.models import Conversation, Message, MessageStatus
+from chat.models import Conversation, Message, MessageStatus, ConversationUserStatus
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 import json
@@ -118,12 +118,7 @@ def home(request):
                 status__in=[ClassBooking.CONFIRMED, ClassBooking.PENDING],
                 time_slot__start_time__gte=timezone.now()
             ).count(),
-            'unread_messages': MessageStatus.objects.filter(
-                user=user,
-                is_read=False
-            ).exclude(
-                message__sender=user
-            ).count(),
+            'unread_messages': ConversationUserStatus.total_unread_for(user),
         }
         
         # Pending applications count
@@ -234,16 +229,13 @@ def home(request):
             is_published=True
         ).select_related('teacher').prefetch_related('topics')
     
-    # Trending Classes (most enrollments in last 30 days)
-    thirty_days_ago = timezone.now() - timedelta(days=30)
+    # Trending Classes (pre-computed ranking, see ClassPopularity)
     trending_classes = TeachingClass.objects.filter(
         is_published=True,
-        enrollments__created_at__gte=thirty_days_ago
-    ).annotate(
-        recent_enrollments=Count('enrollments', filter=Q(enrollments__created_at__gte=thirty_days_ago))
+        popularity__recent_enrollments__gt=0
     ).select_related('teacher').prefetch_related('topics').order_by(
-        '-recent_enrollments', '-avg_rating'
-    ).distinct()[:6]
+        '-popularity__score', '-avg_rating'
+    )[:6]
 
     context = {
         'featured_skills': featured_skills,
@@ -272,46 +264,42 @@ def swipe(request):
 
 def search(request):
     from django.contrib.auth.models import User
+    from core import search as search_index
     
     q = request.GET.get('q', '').strip()
     
-    # Search users
     user_results = []
-    if q:
-        user_results = User.objects.filter(
-            Q(username__icontains=q) |
-            Q(first_name__icontains=q) |
-            Q(last_name__icontains=q) |
-            Q(email__icontains=q)
-        ).filter(
-            is_active=True  # Only show active users
-        ).select_related('profile').distinct().order_by('username')[:10]
-    
-    # Search skills with teacher counts
     skill_results = []
-    if q:
-        skill_results = Skill.objects.filter(name__icontains=q).annotate(
-            teachers_count=Count('userskill', filter=Q(userskill__can_teach=True))
-        )[:10]
-    
-    # Search classes (exclude soft-deleted)
     class_results = []
+    community_results = []
     if q:
-        classes = TeachingClass.objects.filter(
-            Q(title__icontains=q) |
-            Q(short_description__icontains=q) |
-            Q(full_description__icontains=q),
-            is_published=True  # Only show published classes
-        ).select_related('teacher').order_by('-created_at')[:10]
+        # One ranked full-text lookup for every kind of result
+        matches = search_index.search(q, limit=10)
+        
+        # Search users (only active users are indexed as public)
+        user_results = search_index.ordered_by_ids(
+            User.objects.select_related('profile'), matches['user']
+        )
+        
+        # Search skills with teacher counts
+        skill_results = search_index.ordered_by_ids(
+            Skill.objects.annotate(
+                teachers_count=Count('userskill', filter=Q(userskill__can_teach=True))
+            ),
+            matches['skill']
+        )
+        
+        # Search classes (only published classes are indexed as public)
+        class_results = search_index.ordered_by_ids(
+            TeachingClass.objects.select_related('teacher'), matches['class']
+        )
         
         # Add formatted price to each class
-        for cls in classes:
+        for cls in class_results:
             cls.price_formatted = f"${cls.price_cents / 100:.2f}" if cls.price_cents and cls.price_cents > 0 else "Free"
         
-        class_results = classes
-    
-    # Search communities
-    community_results = Community.objects.filter(name__icontains=q)[:10] if q else []
+        # Search communities
+        community_results = search_index.ordered_by_ids(Community.objects.all(), matches['community'])
     
     # Calculate total results count
     total_results = len(user_results) + len(skill_results) + len(class_results) + len(community_results)
@@ -326,6 +314,25 @@ def search(request):
     })
 
 
+AUTOCOMPLETE_MAX_RESULTS = 20
+
+
+def autocomplete(request):
+    """Typeahead suggestions for the search box, served from the in-memory prefix index"""
+    from core import autocomplete as autocomplete_index
+    
+    q = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), AUTOCOMPLETE_MAX_RESULTS)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid limit'}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'results': autocomplete_index.suggest(q, limit=limit) if q else [],
+    })
+
+
 def skill_detail(request, skill_id):
     """Show all users who teach a specific skill"""
     from django.contrib.auth.models import User
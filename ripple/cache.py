@@ -0,0 +1,147 @@
+"""
+Namespaced, versioned caching on top of the CACHES aliases in settings.
+
+A namespace groups related keys (for example everything the sidebar caches).
+Every key carries the namespace's current version, so invalidating a whole
+namespace is a single version bump; entries under the old version are never
+read again and simply expire. Versions are stored in the shared 'default'
+cache, so a bump made by one worker is seen by all of them, even for
+namespaces whose values live in the per-process 'hot' cache. Each worker
+keeps its copy of a version for VERSION_REFRESH seconds, so reads from 'hot'
+do not go to the shared cache first; bumps made elsewhere show up within
+that delay. Model changes bump the version once their transaction commits,
+so no worker can refill the new version with data from before the change.
+
+Usage:
+    topics = namespace('topics', timeout=600)
+    topics.invalidate_on(ClassTopic)
+    names = topics.get_or_set('all', lambda: list(ClassTopic.objects...))
+"""
+import time
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+# Alias holding namespace versions; must be shared by all workers
+VERSION_ALIAS = 'default'
+# Seconds a worker trusts its own copy of a namespace version
+VERSION_REFRESH = 2
+
+_namespaces = {}
+
+
+class CacheNamespace:
+    """A group of cache keys that can be invalidated together"""
+
+    def __init__(self, name, alias='default', timeout=300, version_refresh=VERSION_REFRESH):
+        self.name = name
+        self.alias = alias
+        self.timeout = timeout
+        self.version_refresh = version_refresh
+        self._local_version = None  # (version, monotonic time it was read)
+
+    def __repr__(self):
+        return f"<CacheNamespace {self.name} ({self.alias})>"
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def version_key(self):
+        return f'ns:{self.name}:version'
+
+    @property
+    def version(self):
+        """Current version, initialised from the clock so a lost version never reuses an old one"""
+        local = self._local_version
+        if local is not None and time.monotonic() - local[1] < self.version_refresh:
+            return local[0]
+        versions = caches[VERSION_ALIAS]
+        version = versions.get(self.version_key)
+        if version is None:
+            versions.add(self.version_key, int(time.time() * 1000), None)
+            version = versions.get(self.version_key)
+        self._local_version = (version, time.monotonic())
+        return version
+
+    def make_key(self, key):
+        return f'{self.name}:{key}'
+
+    def get(self, key, default=None):
+        return self.cache.get(self.make_key(key), default, version=self.version)
+
+    def set(self, key, value, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        self.cache.set(self.make_key(key), value, timeout, version=self.version)
+
+    def get_or_set(self, key, default, timeout=None):
+        """Return the cached value, computing and storing it (default may be a callable) on a miss"""
+        timeout = self.timeout if timeout is None else timeout
+        return self.cache.get_or_set(self.make_key(key), default, timeout, version=self.version)
+
+    def delete(self, *keys):
+        """Drop individual keys from the namespace"""
+        version = self.version
+        self.cache.delete_many([self.make_key(key) for key in keys], version=version)
+
+    def invalidate(self):
+        """Drop every key in the namespace by moving to a new version"""
+        versions = caches[VERSION_ALIAS]
+        try:
+            version = versions.incr(self.version_key)
+        except ValueError:
+            versions.add(self.version_key, int(time.time() * 1000), None)
+            version = versions.get(self.version_key)
+        # This worker sees its own bump at once
+        self._local_version = (version, time.monotonic())
+
+    def invalidate_on_commit(self, using=None):
+        """Invalidate once the current transaction commits (at once outside one)"""
+        transaction.on_commit(self.invalidate, using=using)
+
+    def invalidate_on(self, *models):
+        """
+        Invalidate the namespace whenever an instance of one of models is
+        saved or deleted. Many-to-many through models are hooked to
+        m2m_changed. Models may be classes or 'app_label.ModelName' strings.
+        """
+        for model in models:
+            uid = f'ripple.cache:{self.name}:{model}'
+            post_save.connect(self._invalidate_receiver, sender=model, weak=False, dispatch_uid=f'{uid}:save')
+            post_delete.connect(self._invalidate_receiver, sender=model, weak=False, dispatch_uid=f'{uid}:delete')
+            m2m_changed.connect(self._invalidate_receiver, sender=model, weak=False, dispatch_uid=f'{uid}:m2m')
+        return self
+
+    def _invalidate_receiver(self, sender, using=None, **kwargs):
+        if kwargs.get('action', 'post_').startswith('post_'):
+            self.invalidate_on_commit(using=using)
+
+
+def namespace(name, alias=None, timeout=None):
+    """Return the namespace called name, registering it on first use"""
+    if name not in _namespaces:
+        _namespaces[name] = CacheNamespace(
+            name,
+            alias=alias or 'default',
+            timeout=300 if timeout is None else timeout
+        )
+    existing = _namespaces[name]
+    if (alias and alias != existing.alias) or (timeout is not None and timeout != existing.timeout):
+        raise ImproperlyConfigured(f"Cache namespace '{name}' is already registered as {existing!r}")
+    return existing
+
+
+def registered_namespaces():
+    """All namespaces registered so far, by name"""
+    return dict(_namespaces)
+
+
+# Project namespaces, declared here so that settings do not depend on which
+# module happens to ask for a namespace first
+namespace('trending_classes', alias='hot', timeout=300)  # sidebar top classes
+namespace('user_sidebar', timeout=300)  # sidebar communities/stats, keyed by user id
+namespace('autocomplete')  # version only; bumped when the typeahead index changes
+namespace('list_counts', timeout=60)  # approximate totals of paginated lists
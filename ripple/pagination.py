@@ -0,0 +1,119 @@
+"""
+Keyset (cursor) pagination and cached counts for list views.
+
+Offset pagination makes the database count every matching row and skip over
+every earlier page on each request. KeysetPaginator instead orders by a
+fixed list of sort keys ending in the primary key and continues after the
+key values of the last row sent, so a deep page costs the same as the first.
+Totals come from cached_count, which keeps COUNT results in the
+'list_counts' cache namespace for a short time (shown as an approximate
+total).
+
+Usage:
+    paginator = KeysetPaginator(queryset, [('created_at', True)], per_page=24)
+    items, next_cursor = paginator.page(request.GET.get('cursor'))
+"""
+import base64
+import datetime
+import hashlib
+import json
+from decimal import Decimal
+
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Paginator
+from django.db.models import F, Q, QuerySet
+from django.utils.functional import cached_property
+
+from .cache import namespace
+
+list_counts_cache = namespace('list_counts')
+
+
+def cached_count(queryset):
+    """COUNT(*) of queryset, shared between requests for the namespace timeout"""
+    queryset = queryset.order_by()
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        return 0
+    key = f"{queryset.model._meta.label_lower}:{hashlib.md5(sql.encode()).hexdigest()}"
+    return list_counts_cache.get_or_set(key, queryset.count)
+
+
+def _encode_key(value):
+    # Full precision: DjangoJSONEncoder rounds datetimes to milliseconds, which would break ties
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot use {type(value).__name__} as a pagination key")
+
+
+class CachedCountPaginator(Paginator):
+    """Page-number paginator whose total comes from cached_count"""
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            return cached_count(self.object_list)
+        return super().count
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over queryset ordered by keys, a list of
+    (field or annotation name, descending) pairs. Key values must not be
+    NULL; the primary key is appended as the final tie-breaker.
+    """
+
+    def __init__(self, queryset, keys, per_page):
+        keys = list(keys)
+        if keys[-1][0] not in ('id', 'pk'):
+            keys.append(('id', keys[-1][1]))
+        self.keys = keys
+        self.per_page = per_page
+        self.queryset = queryset.order_by(*self.ordering())
+
+    def ordering(self):
+        return [F(name).desc() if descending else F(name).asc() for name, descending in self.keys]
+
+    def cursor_for(self, obj):
+        """Opaque cursor pointing just after obj"""
+        values = [getattr(obj, name) for name, _ in self.keys]
+        raw = json.dumps(values, default=_encode_key, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        """Key values stored in cursor; raises ValueError for a malformed cursor"""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except (ValueError, TypeError) as e:
+            raise ValueError('Invalid cursor') from e
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise ValueError('Invalid cursor')
+        return values
+
+    def after(self, values):
+        """Rows sorting strictly after the given key values"""
+        condition = Q()
+        for position, (name, descending) in enumerate(self.keys):
+            step = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[position]})
+            for (previous, _), value in zip(self.keys[:position], values):
+                step &= Q(**{previous: value})
+            condition |= step
+        return condition
+
+    def page(self, cursor=None):
+        """(items, next cursor or None) for the page following cursor"""
+        queryset = self.queryset
+        if cursor:
+            try:
+                queryset = queryset.filter(self.after(self.decode(cursor)))
+            except (ValidationError, TypeError) as e:
+                # Well-formed cursor holding values of the wrong type
+                raise ValueError('Invalid cursor') from e
+        items = list(queryset[:self.per_page + 1])
+        if len(items) > self.per_page:
+            items = items[:self.per_page]
+            return items, self.cursor_for(items[-1])
+        return items, None
@@ -196,6 +196,29 @@ else:
     }
 
 
+# Caching (see ripple/cache.py)
+# 'default' is shared by every gunicorn worker on the host and needs no outside
+# service; point CACHE_BACKEND/CACHE_LOCATION at Redis or memcached to share it
+# across hosts. 'hot' is a small per-process LRU for values read on most requests.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    'hot': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ripple-hot',
+        'TIMEOUT': 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -334,6 +357,18 @@ STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
 STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY')
 STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET', None)  # Webhook signing secret from Stripe Dashboard
 
+# Chat push delivery (Server-Sent Events)
+# The event stream needs an ASGI server (ripple.asgi:application); under WSGI
+# it answers 404 and the messages page falls back to polling.
+CHAT_PUSH_ENABLED = os.getenv('CHAT_PUSH_ENABLED', 'False').lower() == 'true'
+# Fan-out backend; LocalBroker only reaches streams served by the same process
+CHAT_EVENT_BROKER = os.getenv('CHAT_EVENT_BROKER', 'chat.events.LocalBroker')
+CHAT_STREAM_KEEPALIVE_SECONDS = 25
+
+# Chat read tracking: 'message_status' writes a MessageStatus row per message
+# and reader; 'watermark' keeps one read position per conversation and user
+CHAT_READ_TRACKING = os.getenv('CHAT_READ_TRACKING', 'message_status')
+
 # Site ID for allauth (required for social accounts)
 SITE_ID = 1
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Skill, SwipeAction, UserSkill, Offer, Match, ClassTimeSlot, ClassBooking, ClassFavorite, ClassReview, TeachingClass
+from .models import Skill, SwipeAction, UserSkill, Offer, Match, ClassTimeSlot, SlotRecurrence, ClassBooking, ClassFavorite, ClassReview, TeachingClass, Topic, ClassTopic
 
 
 @admin.register(Skill)
@@ -40,9 +40,20 @@ class ClassTimeSlotAdmin(admin.ModelAdmin):
     search_fields = ('teaching_class__title', 'teaching_class__teacher__username')
     date_hierarchy = 'start_time'
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_availability()
+    
     def get_available_spots(self, obj):
         return obj.get_available_spots()
     get_available_spots.short_description = 'Available Spots'
+    get_available_spots.admin_order_field = 'available_spots'
+
+
+@admin.register(SlotRecurrence)
+class SlotRecurrenceAdmin(admin.ModelAdmin):
+    list_display = ('teaching_class', 'first_start', 'frequency', 'weekdays', 'interval', 'until', 'count', 'is_active')
+    list_filter = ('frequency', 'is_active')
+    search_fields = ('teaching_class__title', 'teaching_class__teacher__username')
 
 
 @admin.register(ClassBooking)
@@ -64,6 +75,21 @@ class ClassReviewAdmin(admin.ModelAdmin):
     list_filter = ('rating', 'created_at')
     search_fields = ('reviewer__username', 'teaching_class__title')
 
+@admin.register(Topic)
+class TopicAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'usage_count', 'created_at')
+    search_fields = ('name', 'slug')
+    prepopulated_fields = {'slug': ('name',)}
+    readonly_fields = ('usage_count',)
+
+
+class ClassTopicInline(admin.TabularInline):
+    model = ClassTopic
+    fields = ('topic',)
+    autocomplete_fields = ('topic',)
+    extra = 1
+
+
 @admin.register(TeachingClass)
 class TeachingClassAdmin(admin.ModelAdmin):
     list_display = ('title', 'teacher', 'is_published', 'price_display', 'duration_minutes', 'avg_rating', 'enrollment_count', 'created_at')
@@ -72,17 +98,15 @@ class TeachingClassAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at', 'avg_rating', 'reviews_count')
     list_editable = ('is_published',)
     date_hierarchy = 'created_at'
+    inlines = [ClassTopicInline]
     
     fieldsets = (
         ('Basic Information', {
-            'fields': ('title', 'teacher', 'short_description', 'description', 'thumbnail')
+            'fields': ('title', 'teacher', 'short_description', 'full_description', 'thumbnail')
         }),
         ('Pricing & Details', {
             'fields': ('price_cents', 'duration_minutes', 'difficulty', 'is_tradeable', 'is_published')
         }),
-        ('Topics', {
-            'fields': ('topics',)
-        }),
         ('Statistics', {
             'fields': ('avg_rating', 'reviews_count'),
             'classes': ('collapse',)
@@ -0,0 +1,119 @@
+"""
+Catalog filters and facet counts for the class list.
+
+class_filters() turns the request's query parameters into one Q object per
+facet. ClassListView applies all of them; facet_counts() counts, for every
+value of a facet, the classes that would match if that value were chosen,
+keeping the other facets' filters (so picking a difficulty does not zero out
+the other difficulties). Difficulty, price, duration and tradeable counts
+come from one aggregate query; topic counts from one grouped query.
+Usage: facet_counts(TeachingClass.objects.filter(is_published=True), class_filters(request.GET))
+"""
+from django.db.models import Count, Q
+
+from .models import TeachingClass, ClassTopic
+
+# Upper bounds offered for the max_price (dollars) and max_duration (minutes) filters
+PRICE_BUCKETS = [
+    (0, 'Free'),
+    (25, 'Up to $25'),
+    (50, 'Up to $50'),
+    (100, 'Up to $100'),
+]
+DURATION_BUCKETS = [
+    (30, '30 min or less'),
+    (60, '1 hour or less'),
+    (120, '2 hours or less'),
+]
+
+
+def class_filters(params):
+    """Q object per active facet, from a QueryDict of filter parameters"""
+    filters = {}
+
+    difficulty = params.get('difficulty')
+    if difficulty:
+        filters['difficulty'] = Q(difficulty=difficulty)
+
+    max_price = params.get('max_price')
+    if max_price:
+        try:
+            filters['price'] = Q(price_cents__lte=int(float(max_price) * 100))
+        except (ValueError, TypeError):
+            pass
+
+    max_duration = params.get('max_duration')
+    if max_duration:
+        try:
+            filters['duration'] = Q(duration_minutes__lte=int(max_duration))
+        except (ValueError, TypeError):
+            pass
+
+    if params.get('tradeable') == 'true':
+        filters['tradeable'] = Q(is_tradeable=True)
+
+    # Exact topic slug; a class links to a topic at most once, so the join adds no duplicates
+    topic = params.get('topic')
+    if topic:
+        filters['topic'] = Q(topic_tags__slug=topic)
+
+    return filters
+
+
+def apply_filters(queryset, filters, exclude=None):
+    """queryset narrowed by every filter except the facet named exclude"""
+    for name, condition in filters.items():
+        if name != exclude:
+            queryset = queryset.filter(condition)
+    return queryset
+
+
+def _others(filters, facet):
+    """Conjunction of the filters of every facet but one"""
+    combined = Q()
+    for name, condition in filters.items():
+        if name != facet:
+            combined &= condition
+    return combined
+
+
+def facet_counts(queryset, filters):
+    """
+    Counts per facet value for the classes in queryset under filters.
+    Returns {'difficulty': [...], 'price': [...], 'duration': [...],
+    'topic': [...], 'tradeable': n} where each list holds
+    {'value', 'label', 'count'} dicts.
+    """
+    aggregates = {}
+    for value, _ in TeachingClass.DIFFICULTY_CHOICES:
+        aggregates[f'difficulty_{value}'] = Count('id', distinct=True, filter=_others(filters, 'difficulty') & Q(difficulty=value))
+    for dollars, _ in PRICE_BUCKETS:
+        aggregates[f'price_{dollars}'] = Count('id', distinct=True, filter=_others(filters, 'price') & Q(price_cents__lte=dollars * 100))
+    for minutes, _ in DURATION_BUCKETS:
+        aggregates[f'duration_{minutes}'] = Count('id', distinct=True, filter=_others(filters, 'duration') & Q(duration_minutes__lte=minutes))
+    aggregates['tradeable'] = Count('id', distinct=True, filter=_others(filters, 'tradeable') & Q(is_tradeable=True))
+    totals = queryset.order_by().aggregate(**aggregates)
+
+    topic_rows = ClassTopic.objects.filter(
+        teaching_class__in=apply_filters(queryset, filters, exclude='topic').order_by().values('id')
+    ).values('topic__slug', 'topic__name').annotate(count=Count('id')).order_by('topic__name')
+
+    return {
+        'difficulty': [
+            {'value': value, 'label': label, 'count': totals[f'difficulty_{value}']}
+            for value, label in TeachingClass.DIFFICULTY_CHOICES
+        ],
+        'price': [
+            {'value': dollars, 'label': label, 'count': totals[f'price_{dollars}']}
+            for dollars, label in PRICE_BUCKETS
+        ],
+        'duration': [
+            {'value': minutes, 'label': label, 'count': totals[f'duration_{minutes}']}
+            for minutes, label in DURATION_BUCKETS
+        ],
+        'topic': [
+            {'value': row['topic__slug'], 'label': row['topic__name'], 'count': row['count']}
+            for row in topic_rows
+        ],
+        'tradeable': totals['tradeable'],
+    }
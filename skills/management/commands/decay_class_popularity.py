@@ -0,0 +1,34 @@
+"""
+Management command to age the trending ranking (ClassPopularity).
+Counters are decayed for the time elapsed since each row was last decayed,
+so running it late, early or twice gives the same result. The site also
+decays lazily (at most hourly) as activity is recorded and the sidebar
+ranking is reloaded; this command forces a full pass.
+Usage: python manage.py decay_class_popularity [--half-life DAYS]
+"""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from skills.models import ClassPopularity
+
+
+class Command(BaseCommand):
+    help = 'Decay recent activity counters of the trending classes ranking'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--half-life',
+            type=float,
+            default=ClassPopularity.HALF_LIFE.days,
+            help=f'Days after which an enrollment/favorite/swipe counts half (default: {ClassPopularity.HALF_LIFE.days})',
+        )
+
+    def handle(self, *args, **options):
+        if options['half_life'] <= 0:
+            raise CommandError('--half-life must be positive')
+
+        rows = ClassPopularity.decay(half_life=datetime.timedelta(days=options['half_life']))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Decayed {rows} class rankings"
+        ))
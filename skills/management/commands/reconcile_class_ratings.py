@@ -0,0 +1,34 @@
+"""
+Management command to repair drift in the stored class rating aggregates
+(rating_sum, reviews_count, avg_rating), which reviews keep up to date
+incrementally. Safe to run at any time, e.g. from a nightly cron.
+Usage: python manage.py reconcile_class_ratings [--class SLUG ...]
+"""
+from django.core.management.base import BaseCommand
+from skills.models import TeachingClass
+
+
+class Command(BaseCommand):
+    help = 'Recompute class rating aggregates from their reviews where they drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--class',
+            dest='slugs',
+            nargs='+',
+            metavar='SLUG',
+            help='Only check these classes',
+        )
+
+    def handle(self, *args, **options):
+        classes = TeachingClass.objects.all()
+        if options['slugs']:
+            classes = classes.filter(slug__in=options['slugs'])
+        
+        repaired = TeachingClass.reconcile_ratings(classes)
+        for class_id in repaired:
+            self.stdout.write(f"  repaired class #{class_id}")
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Checked {classes.count()} classes, repaired {len(repaired)}"
+        ))
@@ -0,0 +1,34 @@
+"""
+Management command to repair drift in ClassTimeSlot.booked_count, which
+bookings keep up to date as they are made, cancelled and completed. Safe to
+run at any time, e.g. from a nightly cron.
+Usage: python manage.py reconcile_slot_bookings [--class SLUG ...]
+"""
+from django.core.management.base import BaseCommand
+from skills.models import ClassTimeSlot
+
+
+class Command(BaseCommand):
+    help = 'Recompute time slot booking counts from their bookings where they drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--class',
+            dest='slugs',
+            nargs='+',
+            metavar='SLUG',
+            help='Only check slots of these classes',
+        )
+
+    def handle(self, *args, **options):
+        slots = ClassTimeSlot.objects.all()
+        if options['slugs']:
+            slots = slots.filter(teaching_class__slug__in=options['slugs'])
+        
+        repaired = ClassTimeSlot.reconcile_booked_counts(slots)
+        for slot_id in repaired:
+            self.stdout.write(f"  repaired slot #{slot_id}")
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Checked {slots.count()} slots, repaired {len(repaired)}"
+        ))
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:55
+
+import django.db.models.deletion
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.utils import timezone
+
+
+# Same weights as ClassPopularity.WEIGHTS at the time of this migration
+WEIGHTS = {
+    'recent_enrollments': 3.0,
+    'recent_favorites': 2.0,
+    'recent_right_swipes': 1.0,
+    'rating': 1.0,
+}
+
+
+def populate_class_popularity(apps, schema_editor):
+    """Seed the ranking from the last 30 days of activity"""
+    TeachingClass = apps.get_model('skills', 'TeachingClass')
+    ClassPopularity = apps.get_model('skills', 'ClassPopularity')
+    since = timezone.now() - timedelta(days=30)
+    
+    classes = TeachingClass.objects.annotate(
+        enrollments_30d=Count('enrollments', filter=Q(enrollments__created_at__gte=since), distinct=True),
+        favorites_30d=Count('favorited_by', filter=Q(favorited_by__created_at__gte=since), distinct=True),
+        right_swipes_30d=Count('swipe_actions', filter=Q(
+            swipe_actions__created_at__gte=since,
+            swipe_actions__action='right'
+        ), distinct=True),
+    )
+    
+    rows = []
+    for teaching_class in classes.iterator():
+        values = {
+            'recent_enrollments': float(teaching_class.enrollments_30d),
+            'recent_favorites': float(teaching_class.favorites_30d),
+            'recent_right_swipes': float(teaching_class.right_swipes_30d),
+            'rating': float(teaching_class.avg_rating or 0),
+        }
+        rows.append(ClassPopularity(
+            teaching_class_id=teaching_class.id,
+            score=sum(values[field] * weight for field, weight in WEIGHTS.items()),
+            **values
+        ))
+    ClassPopularity.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0009_classfavorite'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='teachingclass',
+            name='is_published',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.CreateModel(
+            name='ClassPopularity',
+            fields=[
+                ('teaching_class', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='skills.teachingclass')),
+                ('recent_enrollments', models.FloatField(default=0)),
+                ('recent_favorites', models.FloatField(default=0)),
+                ('recent_right_swipes', models.FloatField(default=0)),
+                ('rating', models.FloatField(default=0)),
+                ('score', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Class popularity',
+                'indexes': [models.Index(fields=['-score'], name='skills_popularity_score_idx')],
+            },
+        ),
+        migrations.RunPython(populate_class_popularity, migrations.RunPython.noop),
+    ]
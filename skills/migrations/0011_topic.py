@@ -0,0 +1,82 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:02
+
+import django.db.models.deletion
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+from django.utils.text import slugify
+
+
+def merge_class_topics(apps, schema_editor):
+    """
+    Build the topic vocabulary from the free-text ClassTopic names. Names that
+    differ only in case or spacing become one Topic (spelled the way most
+    classes spell it), and duplicate links of a class to a topic are dropped.
+    """
+    Topic = apps.get_model('skills', 'Topic')
+    ClassTopic = apps.get_model('skills', 'ClassTopic')
+    
+    groups = {}
+    for row_id, name in ClassTopic.objects.order_by('id').values_list('id', 'name'):
+        name = ' '.join(name.split())[:80]
+        if not name:
+            continue
+        group = groups.setdefault(name.lower(), {'ids': [], 'spellings': Counter()})
+        group['ids'].append(row_id)
+        group['spellings'][name] += 1
+    
+    used_slugs = set()
+    for group in groups.values():
+        name = group['spellings'].most_common(1)[0][0]
+        base_slug = slugify(name)[:80] or 'topic'
+        slug = base_slug
+        counter = 2
+        while slug in used_slugs:
+            slug = f"{base_slug}-{counter}"
+            counter += 1
+        used_slugs.add(slug)
+        topic = Topic.objects.create(name=name, slug=slug)
+        ClassTopic.objects.filter(id__in=group['ids']).update(topic=topic, name=name)
+    
+    # Rows that could not be named, and repeated links to the same topic
+    ClassTopic.objects.filter(topic__isnull=True).delete()
+    keep = ClassTopic.objects.values('teaching_class', 'topic').annotate(first_id=Min('id'), links=Count('id')).filter(links__gt=1)
+    for row in keep:
+        ClassTopic.objects.filter(
+            teaching_class=row['teaching_class'],
+            topic=row['topic']
+        ).exclude(id=row['first_id']).delete()
+    
+    for topic in Topic.objects.annotate(links=Count('class_links')):
+        Topic.objects.filter(id=topic.id).update(usage_count=topic.links)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0010_classpopularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Topic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=80)),
+                ('slug', models.SlugField(max_length=90, unique=True)),
+                ('usage_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('classes', models.ManyToManyField(blank=True, related_name='topic_tags', through='skills.ClassTopic', to='skills.teachingclass')),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='classtopic',
+            name='topic',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='class_links', to='skills.topic'),
+        ),
+        migrations.RunPython(merge_class_topics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:02
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Separate from 0011 so the data merge is committed before the table is altered"""
+
+    dependencies = [
+        ('skills', '0011_topic'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='classtopic',
+            name='topic',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='class_links', to='skills.topic'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='classtopic',
+            unique_together={('teaching_class', 'topic')},
+        ),
+        migrations.AddIndex(
+            model_name='classtopic',
+            index=models.Index(fields=['topic', 'teaching_class'], name='skills_clas_topic_i_ecb14c_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='topic',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='skills_topic_name_ci_unique'),
+        ),
+    ]
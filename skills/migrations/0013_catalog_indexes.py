@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0012_classtopic_topic_required'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='classenrollment',
+            index=models.Index(fields=['teaching_class', 'status', 'created_at'], name='skills_enroll_class_stat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classfavorite',
+            index=models.Index(fields=['user', '-created_at'], name='skills_favorite_user_new_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classreview',
+            index=models.Index(fields=['teaching_class', '-created_at'], name='skills_review_class_new_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='swipeaction',
+            index=models.Index(fields=['user', 'action', '-created_at'], name='skills_swipe_user_action_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teachingclass',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-created_at', '-id'], name='skills_class_pub_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teachingclass',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-avg_rating', '-reviews_count', '-id'], name='skills_class_pub_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teachingclass',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['price_cents'], name='skills_class_pub_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teachingclass',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['teacher', '-created_at'], name='skills_class_teacher_pub_idx'),
+        ),
+    ]
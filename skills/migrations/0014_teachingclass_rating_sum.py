@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_rating_sums(apps, schema_editor):
+    """Seed rating_sum and re-count reviews_count from the reviews"""
+    TeachingClass = apps.get_model('skills', 'TeachingClass')
+    ClassReview = apps.get_model('skills', 'ClassReview')
+    reviews = ClassReview.objects.filter(teaching_class=OuterRef('pk')).order_by().values('teaching_class')
+    TeachingClass.objects.update(
+        rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0),
+        reviews_count=Coalesce(Subquery(reviews.annotate(total=Count('id')).values('total')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0013_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teachingclass',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_rating_sums, migrations.RunPython.noop),
+    ]
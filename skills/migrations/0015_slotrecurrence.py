@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0014_teachingclass_rating_sum'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotRecurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_start', models.DateTimeField(help_text='Start of the first occurrence; later ones keep its local time of day')),
+                ('duration_minutes', models.PositiveIntegerField(help_text='Length of each occurrence')),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly')], default='weekly', max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Repeat every N days (daily) or weeks (weekly)')),
+                ('weekdays', models.CharField(blank=True, help_text='Weekly rules: comma-separated weekdays, 0 = Monday (blank: weekday of the first occurrence)', max_length=20)),
+                ('until', models.DateTimeField(blank=True, help_text='No occurrence starts after this', null=True)),
+                ('count', models.PositiveIntegerField(blank=True, help_text='Total number of occurrences', null=True)),
+                ('max_students', models.PositiveIntegerField(default=1, help_text='Maximum number of students per occurrence')),
+                ('notes', models.TextField(blank=True, help_text='Additional notes shown on every occurrence')),
+                ('is_active', models.BooleanField(default=True, help_text='Inactive rules produce no new occurrences')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('teaching_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_recurrences', to='skills.teachingclass')),
+            ],
+            options={
+                'ordering': ['first_start'],
+            },
+        ),
+        migrations.AddField(
+            model_name='classtimeslot',
+            name='recurrence',
+            field=models.ForeignKey(blank=True, help_text='Recurrence this slot is a stored occurrence of', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='slots', to='skills.slotrecurrence'),
+        ),
+        migrations.AddConstraint(
+            model_name='classtimeslot',
+            constraint=models.UniqueConstraint(fields=('recurrence', 'start_time'), name='skills_slot_occurrence_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='slotrecurrence',
+            index=models.Index(fields=['teaching_class', 'is_active'], name='skills_slot_teachin_4d46d7_idx'),
+        ),
+    ]
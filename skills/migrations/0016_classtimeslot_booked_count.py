@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_booked_counts(apps, schema_editor):
+    """Count each slot's pending and confirmed bookings"""
+    ClassTimeSlot = apps.get_model('skills', 'ClassTimeSlot')
+    ClassBooking = apps.get_model('skills', 'ClassBooking')
+    active = ClassBooking.objects.filter(
+        time_slot=OuterRef('pk'),
+        status__in=['confirmed', 'pending']
+    ).order_by().values('time_slot').annotate(total=Count('id')).values('total')
+    ClassTimeSlot.objects.update(booked_count=Coalesce(Subquery(active), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0015_slotrecurrence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classtimeslot',
+            name='booked_count',
+            field=models.PositiveIntegerField(default=0, help_text='Pending and confirmed bookings (maintained by ClassBooking)'),
+        ),
+        migrations.RunPython(populate_booked_counts, migrations.RunPython.noop),
+    ]
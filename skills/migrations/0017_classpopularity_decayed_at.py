@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0016_classtimeslot_booked_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classpopularity',
+            name='decayed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
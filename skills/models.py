@@ -1,6 +1,15 @@
-from django.db import models
+import datetime
+import re
+
+from django.db import models, transaction, IntegrityError
 from django.conf import settings
+from django.db.models.functions import Coalesce, Greatest, Lower, Round
+from django.db.models.lookups import GreaterThan, LessThan
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils import timezone
+from django.utils.text import slugify
+from ripple.cache import namespace
 
 
 class Skill(models.Model):
@@ -137,6 +146,10 @@ class SwipeAction(models.Model):
     class Meta:
         unique_together = ['user', 'teaching_class']
         ordering = ['-created_at']
+        indexes = [
+            # Whitelist / blacklist pages and the swipe deck's exclusion list
+            models.Index(fields=['user', 'action', '-created_at'], name='skills_swipe_user_action_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.teaching_class.title} - {self.action}"
@@ -214,12 +227,21 @@ class TeachingClass(models.Model):
     is_published = models.BooleanField(default=True)
     avg_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
     reviews_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)  # Sum of review ratings; avg_rating = rating_sum / reviews_count
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     teacher = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='teaching_classes')
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Catalog sorts, ending in the cursor tie-breaker; partial, since the catalog only ever lists published classes
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_published=True), name='skills_class_pub_newest_idx'),
+            models.Index(fields=['-avg_rating', '-reviews_count', '-id'], condition=models.Q(is_published=True), name='skills_class_pub_rating_idx'),
+            models.Index(fields=['price_cents'], condition=models.Q(is_published=True), name='skills_class_pub_price_idx'),
+            # A teacher's published classes on profile pages (drafts use the teacher foreign key index)
+            models.Index(fields=['teacher', '-created_at'], condition=models.Q(is_published=True), name='skills_class_teacher_pub_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -230,14 +252,155 @@ class TeachingClass(models.Model):
         if self.price_cents == 0:
             return "Free"
         return f"${self.price_cents / 100:.2f}"
+    
+    @staticmethod
+    def average_expression(rating_sum, reviews_count):
+        """avg_rating computed in the database from a rating sum and count (0 without reviews)"""
+        return models.Case(
+            models.When(
+                GreaterThan(reviews_count, 0),
+                then=Round(models.ExpressionWrapper(
+                    rating_sum * 1.0 / reviews_count,
+                    output_field=models.FloatField()
+                ), 2),
+            ),
+            default=models.Value(0.0),
+            output_field=models.DecimalField(max_digits=3, decimal_places=2),
+        )
+    
+    @classmethod
+    def adjust_rating(cls, teaching_class_id, rating_delta, count_delta):
+        """
+        Apply a review change to the stored rating aggregates in one UPDATE,
+        so the cost does not depend on how many reviews the class has.
+        Right-hand F() expressions see the row's values before the update.
+        """
+        rating_sum = models.F('rating_sum') + rating_delta
+        reviews_count = models.F('reviews_count') + count_delta
+        cls.objects.filter(id=teaching_class_id).update(
+            rating_sum=rating_sum,
+            reviews_count=reviews_count,
+            avg_rating=cls.average_expression(rating_sum, reviews_count),
+        )
+        
+        def sync_ranking():
+            # After commit, and only if the class survived (reviews are also removed by class deletion)
+            avg_rating = cls.objects.filter(id=teaching_class_id).values_list('avg_rating', flat=True).first()
+            if avg_rating is not None:
+                ClassPopularity.set_rating(teaching_class_id, avg_rating)
+        transaction.on_commit(sync_ranking)
+    
+    @classmethod
+    def reconcile_ratings(cls, queryset=None):
+        """
+        Recompute rating_sum, reviews_count and avg_rating from the reviews
+        for classes whose stored values drifted. Returns the repaired ids.
+        """
+        queryset = cls.objects.all() if queryset is None else queryset
+        reviews = ClassReview.objects.filter(teaching_class=models.OuterRef('pk')).order_by().values('teaching_class')
+        actual = queryset.annotate(
+            actual_sum=Coalesce(models.Subquery(reviews.annotate(total=models.Sum('rating')).values('total')), 0),
+            actual_count=Coalesce(models.Subquery(reviews.annotate(total=models.Count('id')).values('total')), 0),
+        ).annotate(
+            actual_avg=cls.average_expression(models.F('actual_sum'), models.F('actual_count')),
+        )
+        drifted = actual.exclude(
+            rating_sum=models.F('actual_sum'),
+            reviews_count=models.F('actual_count'),
+            avg_rating=models.F('actual_avg'),
+        ).values_list('id', 'actual_sum', 'actual_count', 'actual_avg')
+        
+        repaired = []
+        for class_id, rating_sum, reviews_count, avg_rating in drifted:
+            cls.objects.filter(id=class_id).update(
+                rating_sum=rating_sum,
+                reviews_count=reviews_count,
+                avg_rating=avg_rating,
+            )
+            ClassPopularity.set_rating(class_id, avg_rating)
+            repaired.append(class_id)
+        return repaired
+
+
+class Topic(models.Model):
+    """One entry of the shared topic vocabulary, linked to classes through ClassTopic"""
+    name = models.CharField(max_length=80)
+    slug = models.SlugField(max_length=90, unique=True)
+    usage_count = models.PositiveIntegerField(default=0)  # Classes tagged with the topic
+    classes = models.ManyToManyField(TeachingClass, through='ClassTopic', related_name='topic_tags', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(Lower('name'), name='skills_topic_name_ci_unique'),
+        ]
+    
+    def __str__(self):
+        return self.name
+    
+    @staticmethod
+    def clean_name(name):
+        return ' '.join(name.split())[:80]
+    
+    @classmethod
+    def for_name(cls, name):
+        """The topic called name (case-insensitive), created on first use"""
+        name = cls.clean_name(name)
+        topic = cls.objects.filter(name__iexact=name).first()
+        if topic:
+            return topic
+        base_slug = slugify(name)[:80] or 'topic'
+        slug = base_slug
+        counter = 2
+        while cls.objects.filter(slug=slug).exists():
+            slug = f"{base_slug}-{counter}"
+            counter += 1
+        try:
+            with transaction.atomic():
+                return cls.objects.create(name=name, slug=slug)
+        except IntegrityError:
+            # Created concurrently under the same name
+            return cls.objects.get(name__iexact=name)
+    
+    @classmethod
+    def refresh_usage_counts(cls, topic_ids=None):
+        """Recount usage_count from the class links (all topics, or the given ids)"""
+        topics = cls.objects.all() if topic_ids is None else cls.objects.filter(id__in=topic_ids)
+        topics.update(usage_count=Coalesce(models.Subquery(
+            ClassTopic.objects.filter(topic=models.OuterRef('pk')).order_by().values('topic').annotate(
+                total=models.Count('id')
+            ).values('total')
+        ), 0))
 
 
 class ClassTopic(models.Model):
+    """Link between a class and a Topic; name mirrors topic.name for display"""
     name = models.CharField(max_length=80)
     teaching_class = models.ForeignKey(TeachingClass, on_delete=models.CASCADE, related_name='topics')
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='class_links')
+    
+    class Meta:
+        unique_together = ('teaching_class', 'topic')
+        indexes = [
+            models.Index(fields=['topic', 'teaching_class']),
+        ]
     
     def __str__(self):
         return f"{self.teaching_class.title} - {self.name}"
+    
+    def save(self, *args, **kwargs):
+        # Rows created from a free-text name are linked to the shared vocabulary
+        if self.topic_id is None:
+            self.topic = Topic.for_name(self.name)
+        self.name = self.topic.name
+        previous_topic_id = None
+        if self.pk:
+            previous_topic_id = ClassTopic.objects.filter(pk=self.pk).values_list('topic_id', flat=True).first()
+        super().save(*args, **kwargs)
+        # Moved to another topic: the old one lost a class
+        if previous_topic_id and previous_topic_id != self.topic_id:
+            Topic.refresh_usage_counts([previous_topic_id])
 
 
 class ClassReview(models.Model):
@@ -250,36 +413,32 @@ class ClassReview(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ('teaching_class', 'reviewer')
+        indexes = [
+            # A class's reviews, newest first
+            models.Index(fields=['teaching_class', '-created_at'], name='skills_review_class_new_idx'),
+        ]
     
     def __str__(self):
         return f"{self.reviewer.username} - {self.teaching_class.title} ({self.rating})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        review = super().from_db(db, field_names, values)
+        # Rating as stored, so a later save knows how much the class aggregates change
+        review._stored_rating = review.__dict__.get('rating')
+        return review
+    
     def save(self, *args, **kwargs):
+        adding = self._state.adding
         super().save(*args, **kwargs)
-        # Update class average rating and review count
-        reviews = ClassReview.objects.filter(teaching_class=self.teaching_class)
-        self.teaching_class.reviews_count = reviews.count()
-        if reviews.exists():
-            self.teaching_class.avg_rating = reviews.aggregate(
-                avg=models.Avg('rating')
-            )['avg'] or 0
+        # Keep the class's rating sum, review count and average up to date incrementally
+        if adding:
+            TeachingClass.adjust_rating(self.teaching_class_id, self.rating, 1)
         else:
-            self.teaching_class.avg_rating = 0
-        self.teaching_class.save(update_fields=['avg_rating', 'reviews_count'])
-    
-    def delete(self, *args, **kwargs):
-        teaching_class = self.teaching_class
-        super().delete(*args, **kwargs)
-        # Update class average rating and review count after deletion
-        reviews = ClassReview.objects.filter(teaching_class=teaching_class)
-        teaching_class.reviews_count = reviews.count()
-        if reviews.exists():
-            teaching_class.avg_rating = reviews.aggregate(
-                avg=models.Avg('rating')
-            )['avg'] or 0
-        else:
-            teaching_class.avg_rating = 0
-        teaching_class.save(update_fields=['avg_rating', 'reviews_count'])
+            stored_rating = getattr(self, '_stored_rating', None)
+            if stored_rating is not None and stored_rating != self.rating:
+                TeachingClass.adjust_rating(self.teaching_class_id, self.rating - stored_rating, 0)
+        self._stored_rating = self.rating
 
 
 class ClassFavorite(models.Model):
@@ -291,6 +450,10 @@ class ClassFavorite(models.Model):
     class Meta:
         unique_together = ('user', 'teaching_class')
         ordering = ['-created_at']
+        indexes = [
+            # A user's favorites, newest first
+            models.Index(fields=['user', '-created_at'], name='skills_favorite_user_new_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} favorited {self.teaching_class.title}"
@@ -324,6 +487,10 @@ class ClassEnrollment(models.Model):
     
     class Meta:
         unique_together = ('user', 'teaching_class')
+        indexes = [
+            # Active enrollments of a class, and recent ones for the popularity seed
+            models.Index(fields=['teaching_class', 'status', 'created_at'], name='skills_enroll_class_stat_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.teaching_class.title} ({self.status})"
@@ -372,6 +539,139 @@ class ClassEnrollment(models.Model):
         return self.bookings.filter(status=ClassBooking.COMPLETED)
 
 
+class ClassPopularity(models.Model):
+    """
+    Materialized trending ranking for a class. Activity counters are bumped
+    as enrollments, favorites and right-swipes happen and halve every
+    HALF_LIFE, so recent activity counts the most. Decay is applied for the
+    time elapsed since decayed_at, lazily (decay_if_due) or by the
+    decay_class_popularity command, so missed or repeated runs do not skew it.
+    """
+    # Weight of each signal in the trending score
+    WEIGHTS = {
+        'recent_enrollments': 3.0,
+        'recent_favorites': 2.0,
+        'recent_right_swipes': 1.0,
+        'rating': 1.0,
+    }
+    ACTIVITY_FIELDS = ['recent_enrollments', 'recent_favorites', 'recent_right_swipes']
+    HALF_LIFE = datetime.timedelta(days=7)
+    # Lazy decay runs at most this often per process
+    DECAY_STEP = datetime.timedelta(hours=1)
+    # Decayed counters below this are dropped to 0 (one event, 7-day half-life: ~30 days)
+    ACTIVITY_FLOOR = 0.05
+    _next_decay_check = None
+    
+    teaching_class = models.OneToOneField(TeachingClass, on_delete=models.CASCADE, primary_key=True, related_name='popularity')
+    recent_enrollments = models.FloatField(default=0)
+    recent_favorites = models.FloatField(default=0)
+    recent_right_swipes = models.FloatField(default=0)
+    rating = models.FloatField(default=0)  # Copy of TeachingClass.avg_rating, does not decay
+    score = models.FloatField(default=0)
+    decayed_at = models.DateTimeField(default=timezone.now)  # Counters are decayed up to this time
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = 'Class popularity'
+        indexes = [
+            models.Index(fields=['-score'], name='skills_popularity_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.teaching_class.title} ({self.score:.1f})"
+    
+    @classmethod
+    def score_expression(cls, **values):
+        """SQL expression for the score; values replace individual field terms"""
+        score = models.Value(0.0)
+        for field, weight in cls.WEIGHTS.items():
+            score = score + values.get(field, models.F(field)) * weight
+        return score
+    
+    @classmethod
+    def record(cls, teaching_class_id, field, amount=1):
+        """Add amount to one activity counter and rescore, in a single UPDATE"""
+        cls.decay_if_due()
+        now = timezone.now()
+        value = Greatest(models.F(field) + amount, models.Value(0.0))
+        changes = {
+            field: value,
+            'score': cls.score_expression(**{field: value}),
+            # A row without activity has nothing left to decay: its first new event starts now
+            'decayed_at': models.Case(
+                models.When(cls._inactive(), then=models.Value(now)),
+                default=models.F('decayed_at'),
+            ),
+            'updated_at': now,
+        }
+        updated = cls.objects.filter(teaching_class_id=teaching_class_id).update(**changes)
+        # Removals never create a row (the class itself may be being deleted)
+        if not updated and amount > 0:
+            cls.objects.get_or_create(teaching_class_id=teaching_class_id)
+            cls.objects.filter(teaching_class_id=teaching_class_id).update(**changes)
+    
+    @classmethod
+    def set_rating(cls, teaching_class_id, rating):
+        """Copy a class's new average rating into the ranking"""
+        rating = float(rating or 0)
+        changes = {
+            'rating': rating,
+            'score': cls.score_expression(rating=models.Value(rating)),
+            'updated_at': timezone.now(),
+        }
+        if not cls.objects.filter(teaching_class_id=teaching_class_id).update(**changes):
+            cls.objects.get_or_create(teaching_class_id=teaching_class_id)
+            cls.objects.filter(teaching_class_id=teaching_class_id).update(**changes)
+    
+    @classmethod
+    def _inactive(cls):
+        return models.Q(**{field: 0 for field in cls.ACTIVITY_FIELDS})
+    
+    @classmethod
+    def decay(cls, half_life=None, now=None, decayed_before=None):
+        """
+        Decay the activity counters of every active row (last decayed before
+        decayed_before, default now) for the time since its decayed_at, and
+        rescore. Rows are updated in groups sharing a decayed_at, each only
+        if still unchanged, so concurrent runs never decay twice. Returns the
+        number of rows decayed.
+        """
+        half_life = half_life or cls.HALF_LIFE
+        now = now or timezone.now()
+        active = cls.objects.exclude(cls._inactive())
+        groups = active.filter(
+            decayed_at__lt=decayed_before or now
+        ).order_by().values_list('decayed_at', flat=True).distinct()
+        rows = 0
+        for decayed_at in list(groups):
+            factor = 0.5 ** ((now - decayed_at) / half_life)
+            decayed = {
+                field: models.Case(
+                    models.When(LessThan(models.F(field) * factor, cls.ACTIVITY_FLOOR), then=models.Value(0.0)),
+                    default=models.F(field) * factor,
+                )
+                for field in cls.ACTIVITY_FIELDS
+            }
+            rows += active.filter(decayed_at=decayed_at).update(
+                **decayed,
+                score=cls.score_expression(**decayed),
+                decayed_at=now,
+                updated_at=now
+            )
+        if rows:
+            namespace('trending_classes').invalidate()
+        return rows
+    
+    @classmethod
+    def decay_if_due(cls):
+        """Decay rows not decayed for DECAY_STEP; checks the database at most once per step"""
+        now = timezone.now()
+        if cls._next_decay_check is not None and now < cls._next_decay_check:
+            return 0
+        cls._next_decay_check = now + cls.DECAY_STEP
+        return cls.decay(now=now, decayed_before=now - cls.DECAY_STEP)
+
+
 class ClassTradeOffer(models.Model):
     PENDING = 'pending'
     ACCEPTED = 'accepted'
@@ -398,18 +698,186 @@ class ClassTradeOffer(models.Model):
         return f"{self.proposer.username} → {self.receiver.username}: {self.offered_class.title} ↔ {self.requested_class.title} ({self.status})"
 
 
+class SlotRecurrence(models.Model):
+    """
+    Repeating time slots for a class, RRULE-style: daily or weekly on chosen
+    weekdays, every `interval` days/weeks, ending at `until` and/or after
+    `count` occurrences. Occurrences are expanded on demand for the date
+    window being shown (ClassTimeSlot.in_window) and stored as ClassTimeSlot
+    rows only once they are booked or edited, so a long-running class does
+    not fill the slots table with empty sessions.
+    """
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    FREQUENCY_CHOICES = [
+        (DAILY, 'Daily'),
+        (WEEKLY, 'Weekly'),
+    ]
+    WEEKDAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+    # Named weekday sets for weekly rules (0 = Monday)
+    WEEKDAY_PRESETS = {
+        'MWF': '0,2,4',
+        'TTh': '1,3',
+        'weekdays': '0,1,2,3,4',
+    }
+    
+    teaching_class = models.ForeignKey(TeachingClass, on_delete=models.CASCADE, related_name='slot_recurrences')
+    first_start = models.DateTimeField(help_text='Start of the first occurrence; later ones keep its local time of day')
+    duration_minutes = models.PositiveIntegerField(help_text='Length of each occurrence')
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default=WEEKLY)
+    interval = models.PositiveSmallIntegerField(default=1, help_text='Repeat every N days (daily) or weeks (weekly)')
+    weekdays = models.CharField(
+        max_length=20,
+        blank=True,
+        help_text='Weekly rules: comma-separated weekdays, 0 = Monday (blank: weekday of the first occurrence)'
+    )
+    until = models.DateTimeField(null=True, blank=True, help_text='No occurrence starts after this')
+    count = models.PositiveIntegerField(null=True, blank=True, help_text='Total number of occurrences')
+    max_students = models.PositiveIntegerField(default=1, help_text='Maximum number of students per occurrence')
+    notes = models.TextField(blank=True, help_text='Additional notes shown on every occurrence')
+    is_active = models.BooleanField(default=True, help_text='Inactive rules produce no new occurrences')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['first_start']
+        indexes = [
+            models.Index(fields=['teaching_class', 'is_active']),
+        ]
+    
+    def __str__(self):
+        return f"{self.teaching_class.title} - {self.describe()}"
+    
+    def save(self, *args, **kwargs):
+        # Occurrence keys carry whole seconds
+        self.first_start = self.first_start.replace(microsecond=0)
+        super().save(*args, **kwargs)
+    
+    def get_weekdays(self):
+        """Weekdays of a weekly rule (0 = Monday), in order"""
+        days = sorted({int(day) for day in self.weekdays.split(',') if day.strip().isdigit() and int(day) < 7})
+        if not days:
+            days = [timezone.localtime(self.first_start, timezone.get_default_timezone()).weekday()]
+        return days
+    
+    def describe(self):
+        """Short human-readable form, e.g. Every week on Mon, Wed, Fri"""
+        if self.frequency == self.DAILY:
+            text = 'Daily' if self.interval == 1 else f'Every {self.interval} days'
+        else:
+            unit = 'week' if self.interval == 1 else f'{self.interval} weeks'
+            text = f"Every {unit} on {', '.join(self.WEEKDAY_NAMES[day] for day in self.get_weekdays())}"
+        if self.count:
+            text += f', {self.count} times'
+        if self.until:
+            text += f" until {timezone.localtime(self.until).strftime('%b %d, %Y')}"
+        return text
+    
+    def _dates(self, first, from_date):
+        """Candidate local dates from the period containing from_date onwards (endless)"""
+        if self.frequency == self.DAILY:
+            periods = max(0, (from_date - first).days) // self.interval
+            day = first + datetime.timedelta(days=periods * self.interval)
+            while True:
+                yield day
+                day += datetime.timedelta(days=self.interval)
+        weekdays = self.get_weekdays()
+        week = first - datetime.timedelta(days=first.weekday())
+        periods = max(0, (from_date - week).days // 7) // self.interval
+        week += datetime.timedelta(weeks=periods * self.interval)
+        while True:
+            for weekday in weekdays:
+                yield week + datetime.timedelta(days=weekday)
+            week += datetime.timedelta(weeks=self.interval)
+    
+    def occurrences(self, start, end):
+        """Start times of the occurrences starting in [start, end), in order"""
+        tz = timezone.get_default_timezone()
+        first_local = timezone.localtime(self.first_start, tz)
+        # A count limit is counted from the first occurrence; otherwise jump straight to the window
+        from_date = first_local.date() if self.count else timezone.localtime(start, tz).date()
+        seen = 0
+        for day in self._dates(first_local.date(), from_date):
+            start_time = timezone.make_aware(datetime.datetime.combine(day, first_local.time()), tz)
+            if start_time < self.first_start:
+                continue
+            if start_time >= end or (self.until and start_time > self.until):
+                return
+            seen += 1
+            if self.count and seen > self.count:
+                return
+            if start_time >= start:
+                yield start_time
+    
+    def is_occurrence(self, start_time):
+        """Check if an occurrence of this rule starts exactly at start_time"""
+        return next(self.occurrences(start_time, start_time + datetime.timedelta(seconds=1)), None) == start_time
+    
+    def build_slot(self, start_time):
+        """Unsaved ClassTimeSlot for one occurrence, annotated like with_availability()"""
+        slot = ClassTimeSlot(
+            teaching_class=self.teaching_class,
+            recurrence=self,
+            start_time=start_time,
+            end_time=start_time + datetime.timedelta(minutes=self.duration_minutes),
+            max_students=self.max_students,
+            is_recurring=True,
+            recurrence_pattern=self.describe()[:50],
+            notes=self.notes,
+        )
+        slot.available_spots = self.max_students
+        return slot
+    
+    def materialize(self, start_time):
+        """Stored ClassTimeSlot for the occurrence starting at start_time (created if needed)"""
+        slot = self.build_slot(start_time)
+        slot, _ = ClassTimeSlot.objects.get_or_create(
+            recurrence=self,
+            start_time=start_time,
+            defaults={
+                field: getattr(slot, field)
+                for field in ('teaching_class', 'end_time', 'max_students', 'is_recurring', 'recurrence_pattern', 'notes')
+            }
+        )
+        return slot
+
+
+class ClassTimeSlotQuerySet(models.QuerySet):
+    def with_availability(self):
+        """Annotate available_spots from the stored booked_count, so it can be filtered and sorted on"""
+        return self.annotate(
+            available_spots=Greatest(models.F('max_students') - models.F('booked_count'), 0),
+        )
+    
+    def bookable(self):
+        """Active upcoming slots with at least one spot left, annotated as with_availability()"""
+        return self.with_availability().filter(
+            is_active=True,
+            start_time__gte=timezone.now(),
+            available_spots__gt=0
+        )
+
+
 class ClassTimeSlot(models.Model):
     """Available time slots that teachers can create for their classes"""
     teaching_class = models.ForeignKey(TeachingClass, on_delete=models.CASCADE, related_name='time_slots')
     start_time = models.DateTimeField(help_text='When this time slot starts')
     end_time = models.DateTimeField(help_text='When this time slot ends')
     max_students = models.PositiveIntegerField(default=1, help_text='Maximum number of students for this slot')
+    booked_count = models.PositiveIntegerField(default=0, help_text='Pending and confirmed bookings (maintained by ClassBooking)')
     is_recurring = models.BooleanField(default=False, help_text='Is this a recurring slot?')
     recurrence_pattern = models.CharField(
         max_length=50, 
         blank=True, 
         help_text='e.g., "weekly", "daily", "MWF" for recurring slots'
     )
+    recurrence = models.ForeignKey(
+        SlotRecurrence,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='slots',
+        help_text='Recurrence this slot is a stored occurrence of'
+    )
     notes = models.TextField(blank=True, help_text='Additional notes about this time slot')
     is_active = models.BooleanField(default=True, help_text='Is this slot currently available?')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -421,16 +889,124 @@ class ClassTimeSlot(models.Model):
             models.Index(fields=['teaching_class', 'start_time']),
             models.Index(fields=['start_time', 'is_active']),
         ]
+        constraints = [
+            # An occurrence is stored at most once
+            models.UniqueConstraint(fields=['recurrence', 'start_time'], name='skills_slot_occurrence_unique'),
+        ]
+    
+    objects = ClassTimeSlotQuerySet.as_manager()
+    
+    # slot_key of an occurrence that is not stored yet: r<recurrence id>-<unix start time>
+    OCCURRENCE_KEY_RE = re.compile(r'r(\d+)-(\d+)')
     
     def __str__(self):
         return f"{self.teaching_class.title} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
     
+    @property
+    def slot_key(self):
+        """Identifies the slot in URLs and forms, whether stored or not"""
+        if self.pk:
+            return str(self.pk)
+        return f"r{self.recurrence_id}-{int(self.start_time.timestamp())}"
+    
+    @classmethod
+    def from_key(cls, key, teaching_class=None):
+        """
+        Slot for a slot_key, annotated as with_availability(): a stored slot,
+        or an unsaved occurrence of an active recurrence. None if the key
+        matches no slot (of teaching_class, when given).
+        """
+        slots = cls.objects.with_availability()
+        if teaching_class is not None:
+            slots = slots.filter(teaching_class=teaching_class)
+        key = str(key)
+        if key.isdigit():
+            return slots.filter(id=key).first()
+        match = cls.OCCURRENCE_KEY_RE.fullmatch(key)
+        if not match:
+            return None
+        recurrence = SlotRecurrence.objects.filter(id=match[1], is_active=True).select_related('teaching_class').first()
+        if recurrence is None or (teaching_class is not None and recurrence.teaching_class_id != teaching_class.id):
+            return None
+        start_time = datetime.datetime.fromtimestamp(int(match[2]), tz=datetime.timezone.utc)
+        if not recurrence.is_occurrence(start_time):
+            return None
+        return slots.filter(recurrence=recurrence, start_time=start_time).first() or recurrence.build_slot(start_time)
+    
+    @classmethod
+    def in_window(cls, teaching_class, start, end, queryset=None):
+        """
+        Slots of teaching_class starting in [start, end), by start time:
+        stored slots from queryset (default: all, with availability) plus
+        the not yet stored occurrences of the class's active recurrences.
+        """
+        if queryset is None:
+            queryset = cls.objects.with_availability()
+        window = {'teaching_class': teaching_class, 'start_time__gte': start, 'start_time__lt': end}
+        slots = list(queryset.filter(**window))
+        recurrences = list(
+            teaching_class.slot_recurrences.filter(is_active=True, first_start__lt=end).filter(
+                models.Q(until__isnull=True) | models.Q(until__gte=start)
+            )
+        )
+        if recurrences:
+            # Stored occurrences replace the generated ones, even when queryset filtered them out
+            stored = set(cls.objects.filter(recurrence__in=recurrences, **window).values_list('recurrence_id', 'start_time'))
+            for recurrence in recurrences:
+                for start_time in recurrence.occurrences(start, end):
+                    if (recurrence.id, start_time) not in stored:
+                        slots.append(recurrence.build_slot(start_time))
+            slots.sort(key=lambda slot: slot.start_time)
+        return slots
+    
+    def materialize(self):
+        """This slot as a stored row (occurrences of a recurrence are created on first use)"""
+        if self.pk:
+            return self
+        return self.recurrence.materialize(self.start_time)
+    
+    def get_booked_count(self):
+        """Pending and confirmed bookings"""
+        return self.booked_count
+    
+    @classmethod
+    def reserve_spot(cls, slot_id):
+        """
+        Take one spot in a slot; False if it is full. A single conditional
+        UPDATE, so concurrent bookings of the last spot cannot both succeed
+        (the loser's UPDATE re-reads the row and matches nothing).
+        """
+        return cls.objects.filter(
+            id=slot_id,
+            booked_count__lt=models.F('max_students')
+        ).update(booked_count=models.F('booked_count') + 1) == 1
+    
+    @classmethod
+    def release_spot(cls, slot_id):
+        """Give back one spot in a slot"""
+        cls.objects.filter(id=slot_id, booked_count__gt=0).update(booked_count=models.F('booked_count') - 1)
+    
+    @classmethod
+    def reconcile_booked_counts(cls, queryset=None):
+        """Recompute booked_count from the bookings for slots where it drifted. Returns the repaired ids."""
+        queryset = cls.objects.all() if queryset is None else queryset
+        active = ClassBooking.objects.filter(
+            time_slot=models.OuterRef('pk'),
+            status__in=ClassBooking.ACTIVE_STATUSES
+        ).order_by().values('time_slot').annotate(total=models.Count('id')).values('total')
+        drifted = queryset.annotate(
+            actual_count=Coalesce(models.Subquery(active), 0)
+        ).exclude(booked_count=models.F('actual_count')).values_list('id', 'actual_count')
+        
+        repaired = []
+        for slot_id, booked_count in drifted:
+            cls.objects.filter(id=slot_id).update(booked_count=booked_count)
+            repaired.append(slot_id)
+        return repaired
+    
     def get_available_spots(self):
         """Get number of available spots remaining"""
-        booked_count = self.bookings.filter(
-            status__in=[ClassBooking.CONFIRMED, ClassBooking.PENDING]
-        ).count()
-        return max(0, self.max_students - booked_count)
+        return max(0, self.max_students - self.get_booked_count())
     
     def is_fully_booked(self):
         """Check if this slot is fully booked"""
@@ -452,8 +1028,8 @@ class ClassTimeSlot(models.Model):
         if self.is_fully_booked():
             return False, "This time slot is fully booked."
         
-        # User must not already have a booking for this slot
-        if self.bookings.filter(student=user).exclude(status=ClassBooking.CANCELLED).exists():
+        # User must not already have a booking for this slot (an unstored occurrence has none)
+        if self.pk and self.bookings.filter(student=user).exclude(status=ClassBooking.CANCELLED).exists():
             return False, "You already have a booking for this time slot."
         
         return True, None
@@ -469,6 +1045,10 @@ class ClassTimeSlot(models.Model):
         return self.start_time >= timezone.now()
 
 
+class SlotFullError(Exception):
+    """A booking would take a spot in a time slot that has none left"""
+
+
 class ClassBooking(models.Model):
     """Bookings made by students for class time slots"""
     CONFIRMED = 'confirmed'
@@ -483,6 +1063,8 @@ class ClassBooking(models.Model):
         (COMPLETED, 'Completed'),
         (NO_SHOW, 'No Show'),
     ]
+    # Bookings that take up a spot in their slot
+    ACTIVE_STATUSES = [CONFIRMED, PENDING]
     
     time_slot = models.ForeignKey(ClassTimeSlot, on_delete=models.CASCADE, related_name='bookings')
     student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='class_bookings')
@@ -510,6 +1092,35 @@ class ClassBooking(models.Model):
     def __str__(self):
         return f"{self.student.username} - {self.time_slot.teaching_class.title} - {self.time_slot.start_time.strftime('%Y-%m-%d %H:%M')}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        booking = super().from_db(db, field_names, values)
+        # Slot and status as stored, so a later save knows whether it holds a spot
+        booking._stored_time_slot_id = booking.__dict__.get('time_slot_id')
+        booking._stored_status = booking.__dict__.get('status')
+        return booking
+    
+    def save(self, *args, **kwargs):
+        """
+        Keeps the slot's booked_count in step: a booking becoming pending or
+        confirmed takes a spot (raising SlotFullError if none is left) in
+        the same transaction as the row is written, and gives it back when
+        it stops being active.
+        """
+        held_slot_id = None
+        if not self._state.adding and getattr(self, '_stored_status', None) in self.ACTIVE_STATUSES:
+            held_slot_id = getattr(self, '_stored_time_slot_id', None)
+        wanted_slot_id = self.time_slot_id if self.status in self.ACTIVE_STATUSES else None
+        with transaction.atomic():
+            if wanted_slot_id is not None and wanted_slot_id != held_slot_id:
+                if not ClassTimeSlot.reserve_spot(wanted_slot_id):
+                    raise SlotFullError('This time slot is fully booked.')
+            super().save(*args, **kwargs)
+            if held_slot_id is not None and held_slot_id != wanted_slot_id:
+                ClassTimeSlot.release_spot(held_slot_id)
+        self._stored_time_slot_id = self.time_slot_id
+        self._stored_status = self.status
+    
     def is_active(self):
         """Check if booking is active (not cancelled or completed)"""
         return self.status in [self.CONFIRMED, self.PENDING]
@@ -562,4 +1173,65 @@ class ClassBooking(models.Model):
     def is_upcoming(self):
         """Check if this booking is for an upcoming time slot"""
         from django.utils import timezone
-        return self.time_slot.start_time >= timezone.now()
\ No newline at end of file
+        return self.time_slot.start_time >= timezone.now()
+
+
+# Trending classes in the sidebar depend on classes, their ratings and activity
+namespace('trending_classes').invalidate_on(TeachingClass, ClassReview, ClassEnrollment, ClassFavorite, SwipeAction)
+
+# Cached catalog totals change with classes and their topics
+namespace('list_counts').invalidate_on(TeachingClass, ClassTopic)
+
+
+@receiver(post_save, sender=ClassEnrollment)
+@receiver(post_delete, sender=ClassEnrollment)
+def record_enrollment_popularity(sender, instance, created=False, **kwargs):
+    if created or kwargs.get('signal') is post_delete:
+        ClassPopularity.record(instance.teaching_class_id, 'recent_enrollments', 1 if created else -1)
+
+
+@receiver(post_save, sender=ClassFavorite)
+@receiver(post_delete, sender=ClassFavorite)
+def record_favorite_popularity(sender, instance, created=False, **kwargs):
+    if created or kwargs.get('signal') is post_delete:
+        ClassPopularity.record(instance.teaching_class_id, 'recent_favorites', 1 if created else -1)
+
+
+@receiver(post_save, sender=SwipeAction)
+@receiver(post_delete, sender=SwipeAction)
+def record_swipe_popularity(sender, instance, created=False, **kwargs):
+    """Right swipes count as interest; a changed swipe is not re-counted"""
+    if instance.action != SwipeAction.SWIPE_RIGHT:
+        return
+    if created or kwargs.get('signal') is post_delete:
+        ClassPopularity.record(instance.teaching_class_id, 'recent_right_swipes', 1 if created else -1)
+
+
+@receiver(post_delete, sender=ClassBooking)
+def release_booking_spot(sender, instance, **kwargs):
+    """Also runs for bookings removed by cascades and queryset deletes"""
+    if instance.status in ClassBooking.ACTIVE_STATUSES:
+        ClassTimeSlot.release_spot(instance.time_slot_id)
+
+
+@receiver(post_delete, sender=ClassReview)
+def remove_review_rating(sender, instance, **kwargs):
+    """Also runs for reviews removed by cascades and queryset deletes"""
+    TeachingClass.adjust_rating(instance.teaching_class_id, -instance.rating, -1)
+
+
+@receiver(post_save, sender=ClassTopic)
+@receiver(post_delete, sender=ClassTopic)
+def update_topic_usage_count(sender, instance, **kwargs):
+    Topic.refresh_usage_counts([instance.topic_id])
+
+
+@receiver([post_save, post_delete], sender=ClassEnrollment)
+def clear_enrollment_sidebar_cache(sender, instance, **kwargs):
+    """Enrollments count towards the student's sidebar stats"""
+    namespace('user_sidebar').delete(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=UserSkill)
+def clear_user_skill_sidebar_cache(sender, instance, **kwargs):
+    namespace('user_sidebar').delete(instance.user_id)
@@ -0,0 +1,199 @@
+"""
+Overlap checks, bulk creation and the teacher's view of class time slots.
+
+A teacher cannot run two sessions at once, so new slots are checked against
+every session of all the teacher's classes - stored slots and the not yet
+stored occurrences of recurring slots - and against each other. Existing
+sessions come from one range query per table; the check itself is a few
+linear sweeps over one sorted list of existing and candidate intervals.
+Intervals are half-open, so back-to-back sessions do not conflict.
+Usage: created, conflicts = create_slots(teaching_class, [{'start_time': ..., 'end_time': ...}])
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import TeachingClass, ClassTimeSlot, ClassBooking, SlotRecurrence
+
+# Upper bound on slots created by one request
+MAX_BULK_SLOTS = 500
+
+
+def _describe(title, start):
+    return f"{title} ({timezone.localtime(start).strftime('%b %d, %Y %I:%M %p')})"
+
+
+def teacher_sessions(class_ids, start, end):
+    """(start, end, description) of the active sessions of these classes overlapping [start, end)"""
+    sessions = []
+    stored = set()
+    rows = ClassTimeSlot.objects.filter(
+        teaching_class_id__in=class_ids,
+        start_time__lt=end,
+        end_time__gt=start
+    ).values_list('start_time', 'end_time', 'teaching_class__title', 'recurrence_id', 'is_active')
+    for slot_start, slot_end, title, recurrence_id, is_active in rows:
+        if recurrence_id:
+            # Stored occurrences (skipped ones included) replace the generated ones
+            stored.add((recurrence_id, slot_start))
+        if is_active:
+            sessions.append((slot_start, slot_end, _describe(title, slot_start)))
+
+    recurrences = SlotRecurrence.objects.filter(
+        teaching_class_id__in=class_ids,
+        is_active=True,
+        first_start__lt=end
+    ).select_related('teaching_class')
+    for recurrence in recurrences:
+        duration = datetime.timedelta(minutes=recurrence.duration_minutes)
+        for occurrence_start in recurrence.occurrences(start - duration, end):
+            if occurrence_start + duration > start and (recurrence.id, occurrence_start) not in stored:
+                sessions.append((
+                    occurrence_start,
+                    occurrence_start + duration,
+                    _describe(recurrence.teaching_class.title, occurrence_start)
+                ))
+    return sessions
+
+
+def sweep(candidates, sessions):
+    """
+    Split candidate slots (dicts with start_time and end_time) into
+    (accepted, conflicts). All intervals are sorted once; a forward and a
+    backward pass find candidates overlapping an existing session, and a
+    last pass keeps the earliest of any candidates overlapping each other.
+    Conflicts are {'slot': candidate, 'conflicts_with': description} dicts.
+    """
+    # Existing sessions sort before candidates starting at the same moment
+    intervals = sorted(
+        [(start, 0, end, description) for start, end, description in sessions] +
+        [(candidate['start_time'], 1, candidate['end_time'], position) for position, candidate in enumerate(candidates)],
+        key=lambda interval: interval[:3]
+    )
+    blocked = {}
+
+    # Sessions starting no later than the candidate: the latest-ending one
+    busy_until = busy_with = None
+    for start, is_candidate, end, item in intervals:
+        if not is_candidate:
+            if busy_until is None or end > busy_until:
+                busy_until, busy_with = end, item
+        elif busy_until is not None and start < busy_until:
+            blocked[item] = busy_with
+
+    # Sessions starting after the candidate: the next one starts first
+    next_start = next_with = None
+    for start, is_candidate, end, item in reversed(intervals):
+        if not is_candidate:
+            next_start, next_with = start, item
+        elif item not in blocked and next_start is not None and next_start < end:
+            blocked[item] = next_with
+
+    accepted = []
+    conflicts = []
+    accepted_until = None
+    for start, is_candidate, end, item in intervals:
+        if not is_candidate:
+            continue
+        if item in blocked:
+            conflicts.append({'slot': candidates[item], 'conflicts_with': blocked[item]})
+        elif accepted_until is not None and start < accepted_until:
+            conflicts.append({'slot': candidates[item], 'conflicts_with': 'another slot in this request'})
+        else:
+            accepted.append(candidates[item])
+            accepted_until = end
+    return accepted, conflicts
+
+
+def create_slots(teaching_class, candidates):
+    """
+    Store the candidate slots (dicts of ClassTimeSlot fields) of
+    teaching_class that overlap none of its teacher's sessions, with one
+    bulk insert. Returns (created slots, conflicts) as in sweep().
+    """
+    if not candidates:
+        return [], []
+    start = min(candidate['start_time'] for candidate in candidates)
+    end = max(candidate['end_time'] for candidate in candidates)
+    with transaction.atomic():
+        # Lock the teacher's classes so concurrent requests cannot both claim the same time
+        class_ids = list(
+            TeachingClass.objects.select_for_update().filter(
+                teacher_id=teaching_class.teacher_id
+            ).values_list('id', flat=True)
+        )
+        accepted, conflicts = sweep(candidates, teacher_sessions(class_ids, start, end))
+        created = ClassTimeSlot.objects.bulk_create(
+            [ClassTimeSlot(teaching_class=teaching_class, **candidate) for candidate in accepted]
+        )
+    return created, conflicts
+
+
+def expand_template(recurrence, limit=MAX_BULK_SLOTS):
+    """
+    Candidate slots for the occurrences of an unsaved SlotRecurrence
+    (bounded by its until or count), at most limit of them.
+    """
+    if not recurrence.until and not recurrence.count:
+        raise ValueError('A template needs an end date or a number of sessions')
+    if recurrence.until:
+        end = recurrence.until + datetime.timedelta(seconds=1)
+    else:
+        end = datetime.datetime.max.replace(tzinfo=datetime.timezone.utc)
+    candidates = []
+    for start_time in recurrence.occurrences(recurrence.first_start, end):
+        if len(candidates) == limit:
+            raise ValueError(f'A template can create at most {limit} slots')
+        candidates.append({
+            'start_time': start_time,
+            'end_time': start_time + datetime.timedelta(minutes=recurrence.duration_minutes),
+            'max_students': recurrence.max_students,
+            'notes': recurrence.notes,
+        })
+    return candidates
+
+
+def _count_statuses(slot):
+    slot.status_counts = {status: 0 for status, _ in ClassBooking.STATUS_CHOICES}
+    for booking in slot.booking_list:
+        slot.status_counts[booking.status] += 1
+
+
+def class_schedule(teaching_class, start, end, recurrences=()):
+    """
+    Slots of teaching_class starting in [start, end) for the teacher's
+    schedule, by start time, annotated as with_availability(). Each slot
+    gets booking_list (its bookings with students and profiles, prefetched:
+    two queries whatever the number of slots) and status_counts
+    ({status: bookings}). Upcoming occurrences of the given recurrences
+    that are not stored yet are added without bookings.
+    """
+    schedule = list(ClassTimeSlot.objects.filter(
+        teaching_class=teaching_class,
+        start_time__gte=start,
+        start_time__lt=end
+    ).with_availability().order_by('start_time', 'id').prefetch_related(
+        Prefetch(
+            'bookings',
+            queryset=ClassBooking.objects.select_related('student__profile').order_by('created_at'),
+            to_attr='booking_list'
+        )
+    ))
+    for slot in schedule:
+        slot.teaching_class = teaching_class
+        _count_statuses(slot)
+
+    # Stored occurrences (skipped ones included) replace the generated ones
+    stored = {(slot.recurrence_id, slot.start_time) for slot in schedule if slot.recurrence_id}
+    upcoming_start = max(start, timezone.now())
+    for recurrence in recurrences:
+        for start_time in recurrence.occurrences(upcoming_start, end):
+            if (recurrence.id, start_time) not in stored:
+                slot = recurrence.build_slot(start_time)
+                slot.booking_list = []
+                _count_statuses(slot)
+                schedule.append(slot)
+    schedule.sort(key=lambda slot: slot.start_time)
+    return schedule
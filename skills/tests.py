@@ -1,3 +1,724 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import random
+import threading
+import time
+import unittest
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ripple.cache import namespace
+from . import scheduling
+from .models import (
+    TeachingClass, ClassFavorite, ClassPopularity, ClassReview, ClassEnrollment,
+    SwipeAction, ClassTimeSlot, ClassBooking, SlotRecurrence, SlotFullError,
+)
+
+
+def at(day, hour=10):
+    """Aware UTC datetime on a day of January 2030 (Jan 7 is a Monday)"""
+    return datetime.datetime(2030, 1, day, hour, tzinfo=datetime.timezone.utc)
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'skills-tests'},
+    'hot': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'skills-tests-hot'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ClassPopularityTests(TestCase):
+    """Trending counters decay for the time elapsed since their last decay"""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', password='pw')
+        self.student = User.objects.create_user(username='student', password='pw')
+        self.teaching_class = TeachingClass.objects.create(title='Python', slug='python', teacher=self.teacher)
+        ClassFavorite.objects.create(user=self.student, teaching_class=self.teaching_class)
+
+    def popularity(self):
+        return ClassPopularity.objects.get(teaching_class=self.teaching_class)
+
+    def test_decay_uses_elapsed_time(self):
+        start = self.popularity().decayed_at
+        self.assertEqual(self.popularity().recent_favorites, 1)
+
+        ClassPopularity.decay(now=start + ClassPopularity.HALF_LIFE)
+        self.assertAlmostEqual(self.popularity().recent_favorites, 0.5)
+        # A repeated run in the same instant changes nothing
+        self.assertEqual(ClassPopularity.decay(now=start + ClassPopularity.HALF_LIFE), 0)
+        self.assertAlmostEqual(self.popularity().recent_favorites, 0.5)
+
+        # A missed run is caught up by the next one
+        ClassPopularity.decay(now=start + 3 * ClassPopularity.HALF_LIFE)
+        popularity = self.popularity()
+        self.assertAlmostEqual(popularity.recent_favorites, 0.125)
+        self.assertAlmostEqual(popularity.score, 0.125 * ClassPopularity.WEIGHTS['recent_favorites'])
+
+    def test_counters_below_floor_drop_to_zero(self):
+        ClassPopularity.decay(now=timezone.now() + 10 * ClassPopularity.HALF_LIFE)
+        self.assertEqual(self.popularity().recent_favorites, 0)
+        self.assertEqual(self.popularity().score, 0)
+
+    def test_new_activity_on_idle_row_starts_now(self):
+        ClassPopularity.objects.update(recent_favorites=0, decayed_at=timezone.now() - datetime.timedelta(days=60))
+        ClassFavorite.objects.all().delete()
+        ClassFavorite.objects.create(user=self.student, teaching_class=self.teaching_class)
+        self.assertLess(timezone.now() - self.popularity().decayed_at, datetime.timedelta(minutes=1))
+
+    def test_favorites_invalidate_sidebar_ranking(self):
+        trending = namespace('trending_classes')
+        version = trending.version
+        with self.captureOnCommitCallbacks(execute=True):
+            ClassFavorite.objects.filter(user=self.student).delete()
+            # Not before the deletion commits
+            self.assertEqual(trending.version, version)
+        self.assertNotEqual(trending.version, version)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Plans are checked against SQLite')
+class QueryPlanTests(TestCase):
+    """The catalog, activity and slot queries keep using their indexes"""
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index_name}', plan)
+        # Sorting through the index, not a temporary B-tree
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_catalog_sorts(self):
+        published = TeachingClass.objects.filter(is_published=True)
+        self.assertUsesIndex(published.order_by('-created_at', '-id')[:24], 'skills_class_pub_newest_idx')
+        self.assertUsesIndex(published.order_by('-avg_rating', '-reviews_count', '-id')[:24], 'skills_class_pub_rating_idx')
+        self.assertUsesIndex(published.order_by('price_cents')[:24], 'skills_class_pub_price_idx')
+        self.assertUsesIndex(published.filter(teacher_id=1).order_by('-created_at'), 'skills_class_teacher_pub_idx')
+        self.assertUsesIndex(ClassPopularity.objects.order_by('-score')[:3], 'skills_popularity_score_idx')
+
+    def test_activity_lookups(self):
+        self.assertUsesIndex(ClassFavorite.objects.filter(user_id=1).order_by('-created_at'), 'skills_favorite_user_new_idx')
+        self.assertUsesIndex(
+            SwipeAction.objects.filter(user_id=1, action=SwipeAction.SWIPE_RIGHT).order_by('-created_at'),
+            'skills_swipe_user_action_idx'
+        )
+        self.assertUsesIndex(ClassReview.objects.filter(teaching_class_id=1).order_by('-created_at'), 'skills_review_class_new_idx')
+        self.assertUsesIndex(
+            ClassEnrollment.objects.filter(teaching_class_id=1, status=ClassEnrollment.ACTIVE),
+            'skills_enroll_class_stat_idx'
+        )
+
+    def test_class_slots_by_start_time(self):
+        index = next(
+            index for index in ClassTimeSlot._meta.indexes
+            if index.fields == ['teaching_class', 'start_time']
+        )
+        self.assertUsesIndex(
+            ClassTimeSlot.objects.filter(teaching_class_id=1, start_time__gte=timezone.now()).order_by('start_time'),
+            index.name
+        )
+
+
+class SlotRecurrenceTests(TestCase):
+    """Occurrence rules and the keys of occurrences that are not stored yet"""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', password='pw')
+        self.teaching_class = TeachingClass.objects.create(title='Python', slug='python', teacher=self.teacher)
+
+    def recurrence(self, **fields):
+        fields.setdefault('first_start', at(7))
+        fields.setdefault('duration_minutes', 60)
+        return SlotRecurrence.objects.create(teaching_class=self.teaching_class, **fields)
+
+    def days(self, recurrence, start=None, end=None):
+        return [
+            occurrence.day
+            for occurrence in recurrence.occurrences(start or at(1), end or at(31))
+        ]
+
+    def test_weekly_weekday_set(self):
+        recurrence = self.recurrence(weekdays=SlotRecurrence.WEEKDAY_PRESETS['MWF'])
+        self.assertEqual(self.days(recurrence, end=at(21)), [7, 9, 11, 14, 16, 18])
+        self.assertEqual(recurrence.describe(), 'Every week on Mon, Wed, Fri')
+
+    def test_weekly_defaults_to_first_weekday(self):
+        recurrence = self.recurrence(first_start=at(9))
+        self.assertEqual(self.days(recurrence), [9, 16, 23, 30])
+
+    def test_interval(self):
+        self.assertEqual(self.days(self.recurrence(interval=2, weekdays='1,3')), [8, 10, 22, 24])
+        daily = self.recurrence(frequency=SlotRecurrence.DAILY, interval=3)
+        self.assertEqual(self.days(daily, end=at(20)), [7, 10, 13, 16, 19])
+        # A window starting mid-rule keeps the rule's phase
+        self.assertEqual(self.days(daily, start=at(14), end=at(20)), [16, 19])
+
+    def test_until_is_inclusive(self):
+        recurrence = self.recurrence(frequency=SlotRecurrence.DAILY, until=at(10))
+        self.assertEqual(self.days(recurrence), [7, 8, 9, 10])
+
+    def test_count_is_counted_from_first_occurrence(self):
+        recurrence = self.recurrence(frequency=SlotRecurrence.DAILY, count=4)
+        self.assertEqual(self.days(recurrence), [7, 8, 9, 10])
+        self.assertEqual(self.days(recurrence, start=at(9)), [9, 10])
+
+    def test_until_and_count_whichever_first(self):
+        recurrence = self.recurrence(frequency=SlotRecurrence.DAILY, count=10, until=at(9))
+        self.assertEqual(self.days(recurrence), [7, 8, 9])
+
+    def test_slot_key_round_trip(self):
+        recurrence = self.recurrence(weekdays='0,2')
+        slot = ClassTimeSlot.in_window(self.teaching_class, at(8), at(10))[0]
+        self.assertIsNone(slot.pk)
+        self.assertEqual(slot.slot_key, f'r{recurrence.id}-{int(at(9).timestamp())}')
+
+        found = ClassTimeSlot.from_key(slot.slot_key, self.teaching_class)
+        self.assertEqual((found.recurrence_id, found.start_time), (recurrence.id, at(9)))
+        self.assertEqual(found.available_spots, recurrence.max_students)
+
+        # Not an occurrence, another class, or a stopped rule
+        self.assertIsNone(ClassTimeSlot.from_key(f'r{recurrence.id}-{int(at(10).timestamp())}'))
+        other = TeachingClass.objects.create(title='Go', slug='go', teacher=self.teacher)
+        self.assertIsNone(ClassTimeSlot.from_key(slot.slot_key, other))
+        SlotRecurrence.objects.filter(id=recurrence.id).update(is_active=False)
+        self.assertIsNone(ClassTimeSlot.from_key(slot.slot_key))
+
+    def test_booking_materializes_occurrence(self):
+        recurrence = self.recurrence(max_students=2)
+        student = User.objects.create_user(username='student', password='pw')
+        ClassEnrollment.objects.create(user=student, teaching_class=self.teaching_class, status=ClassEnrollment.ACTIVE)
+        self.client.force_login(student)
+        key = ClassTimeSlot.in_window(self.teaching_class, at(14), at(15))[0].slot_key
+
+        self.client.post(f'/classes/schedule/slot/{key}/book/')
+        slot = ClassTimeSlot.objects.get(recurrence=recurrence)
+        self.assertEqual(slot.start_time, at(14))
+        self.assertEqual(slot.booked_count, 1)
+        self.assertTrue(ClassBooking.objects.filter(time_slot=slot, student=student).exists())
+
+        # The stored row now stands in for the occurrence
+        self.assertEqual(ClassTimeSlot.from_key(key).pk, slot.pk)
+        window = ClassTimeSlot.in_window(self.teaching_class, at(14), at(15))
+        self.assertEqual([found.pk for found in window], [slot.pk])
+        self.assertEqual(recurrence.materialize(at(14)).pk, slot.pk)
+
+
+class OverlapSweepTests(TestCase):
+    """scheduling.sweep and create_slots keep a teacher's sessions apart"""
+
+    @staticmethod
+    def slot(start, end):
+        return {'start_time': at(7, start), 'end_time': at(7, end)}
+
+    def test_conflicts_with_existing_sessions(self):
+        sessions = [(at(7, 10), at(7, 12), 'Python')]
+        candidates = [
+            self.slot(8, 10),   # ends as the session starts
+            self.slot(9, 11),   # runs into it
+            self.slot(11, 13),  # starts inside it
+            self.slot(9, 13),   # contains it
+            self.slot(12, 13),  # starts as it ends
+        ]
+        accepted, conflicts = scheduling.sweep(candidates, sessions)
+        self.assertEqual(accepted, [candidates[0], candidates[4]])
+        self.assertEqual(
+            [(conflict['slot'], conflict['conflicts_with']) for conflict in conflicts],
+            [(candidates[1], 'Python'), (candidates[3], 'Python'), (candidates[2], 'Python')]
+        )
+
+    def test_conflicts_within_one_request(self):
+        candidates = [self.slot(10, 12), self.slot(9, 11), self.slot(11, 13), self.slot(12, 14)]
+        accepted, conflicts = scheduling.sweep(candidates, [])
+        # The earliest of overlapping candidates wins
+        self.assertEqual(accepted, [candidates[1], candidates[2]])
+        self.assertEqual(
+            [conflict['slot'] for conflict in conflicts],
+            [candidates[0], candidates[3]]
+        )
+        self.assertEqual({conflict['conflicts_with'] for conflict in conflicts}, {'another slot in this request'})
+
+    def test_matches_pairwise_check(self):
+        generator = random.Random(23)
+        for _ in range(300):
+            sessions = []
+            for position in range(generator.randint(0, 4)):
+                start = generator.randint(0, 20)
+                sessions.append((at(7, start), at(7, start + generator.randint(1, 3)), f'session {position}'))
+            candidates = []
+            for _ in range(generator.randint(1, 6)):
+                start = generator.randint(0, 20)
+                candidates.append(self.slot(start, start + generator.randint(1, 3)))
+
+            expected = []
+            for position, candidate in sorted(
+                enumerate(candidates),
+                key=lambda item: (item[1]['start_time'], item[1]['end_time'], item[0])
+            ):
+                overlaps = lambda start, end: start < candidate['end_time'] and candidate['start_time'] < end
+                if not any(overlaps(start, end) for start, end, _ in sessions) and not any(
+                    overlaps(other['start_time'], other['end_time']) for other in expected
+                ):
+                    expected.append(candidate)
+            accepted, conflicts = scheduling.sweep(candidates, sessions)
+            self.assertEqual(accepted, expected)
+            self.assertEqual(len(accepted) + len(conflicts), len(candidates))
+
+    def test_create_slots_checks_all_teacher_sessions(self):
+        teacher = User.objects.create_user(username='teacher', password='pw')
+        python = TeachingClass.objects.create(title='Python', slug='python', teacher=teacher)
+        go = TeachingClass.objects.create(title='Go', slug='go', teacher=teacher)
+        ClassTimeSlot.objects.create(teaching_class=go, start_time=at(7, 10), end_time=at(7, 11))
+        SlotRecurrence.objects.create(
+            teaching_class=go, first_start=at(8, 14), duration_minutes=60, frequency=SlotRecurrence.DAILY
+        )
+        other_teacher = User.objects.create_user(username='other', password='pw')
+        rust = TeachingClass.objects.create(title='Rust', slug='rust', teacher=other_teacher)
+        ClassTimeSlot.objects.create(teaching_class=rust, start_time=at(7, 12), end_time=at(7, 13))
+
+        created, conflicts = scheduling.create_slots(python, [
+            self.slot(10, 11),
+            self.slot(12, 13),
+            {'start_time': at(9, 14), 'end_time': at(9, 15)},
+        ])
+        self.assertEqual([slot.start_time for slot in created], [at(7, 12)])
+        self.assertEqual(len(conflicts), 2)
+        self.assertTrue(all(conflict['conflicts_with'].startswith('Go') for conflict in conflicts))
+
+
+class BulkCreateTimeSlotsTests(TestCase):
+    """The JSON bulk-create endpoint"""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', password='pw')
+        TeachingClass.objects.create(title='Python', slug='python', teacher=self.teacher)
+        self.client.force_login(self.teacher)
+
+    def post(self, payload):
+        body = payload if isinstance(payload, str) else json.dumps(payload)
+        return self.client.post('/classes/python/schedule/bulk-create/', body, content_type='application/json')
+
+    def test_malformed_payloads_get_fixed_messages(self):
+        shape_error = 'Expected an object with a "slots" list and/or a "template" object.'
+        for payload in ([], {'slots': {'start_time': '2030-01-07T10:00'}}, {'slots': [1]}, {'template': 'weekly'}):
+            with self.subTest(payload=payload):
+                response = self.post(payload)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['error'], shape_error)
+        self.assertEqual(self.post('{').json()['error'], 'Invalid JSON.')
+
+        slot = {'start_time': '2030-01-07T10:00', 'end_time': '2030-01-07T11:00'}
+        for fields, error in (
+            ({'start_time': 5}, 'Invalid date/time format.'),
+            ({'start_time': '2030-13-01T10:00'}, 'Invalid date/time format.'),
+            ({'max_students': [2]}, 'Invalid number of students.'),
+        ):
+            with self.subTest(fields=fields):
+                response = self.post({'slots': [{**slot, **fields}]})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['error'], error)
+
+        response = self.post({'template': {**slot, 'repeat': 'daily', 'repeat_interval': 10 ** 9, 'repeat_count': 2}})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Repeat every', response.json()['error'])
+
+    def test_creates_slots_and_reports_conflicts(self):
+        response = self.post({
+            'slots': [{'start_time': '2030-01-07T10:00', 'end_time': '2030-01-07T11:00'}],
+            'template': {
+                'start_time': '2030-01-07T10:30', 'end_time': '2030-01-07T11:30',
+                'repeat': 'daily', 'repeat_count': 3,
+            },
+        })
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(len(data['created']), 3)
+        self.assertEqual([conflict['conflicts_with'] for conflict in data['conflicts']], ['another slot in this request'])
+        self.assertEqual(ClassTimeSlot.objects.count(), 3)
+
+
+class SlotCapacityMixin:
+    """A class with one upcoming two-seat slot and three enrolled students"""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', password='pw')
+        self.teaching_class = TeachingClass.objects.create(title='Python', slug='python', teacher=self.teacher)
+        self.slot = ClassTimeSlot.objects.create(
+            teaching_class=self.teaching_class, start_time=at(7), end_time=at(7, 11), max_students=2
+        )
+        self.students = []
+        self.enrollments = []
+        for position in range(3):
+            student = User.objects.create_user(username=f'student{position}', password='pw')
+            self.students.append(student)
+            self.enrollments.append(ClassEnrollment.objects.create(
+                user=student, teaching_class=self.teaching_class, status=ClassEnrollment.ACTIVE
+            ))
+
+    def book(self, position, status=ClassBooking.CONFIRMED, slot=None):
+        return ClassBooking.objects.create(
+            time_slot=slot or self.slot,
+            student=self.students[position],
+            enrollment=self.enrollments[position],
+            status=status
+        )
+
+    def booked_count(self):
+        return ClassTimeSlot.objects.get(pk=self.slot.pk).booked_count
+
+
+class SlotCapacityTests(SlotCapacityMixin, TestCase):
+    """booked_count follows every booking change and caps the slot"""
+
+    def test_reserve_spot_stops_at_capacity(self):
+        self.assertTrue(ClassTimeSlot.reserve_spot(self.slot.pk))
+        self.assertTrue(ClassTimeSlot.reserve_spot(self.slot.pk))
+        self.assertFalse(ClassTimeSlot.reserve_spot(self.slot.pk))
+        self.assertEqual(self.booked_count(), 2)
+
+    def test_full_slot_rejects_booking(self):
+        self.book(0)
+        self.book(1, status=ClassBooking.PENDING)
+        with self.assertRaises(SlotFullError):
+            self.book(2)
+        self.assertEqual(ClassBooking.objects.count(), 2)
+        self.assertEqual(self.booked_count(), 2)
+
+    def test_status_changes_and_deletes_keep_count(self):
+        booking = self.book(0)
+        self.book(1)
+        booking.status = ClassBooking.CANCELLED
+        booking.save()
+        self.assertEqual(self.booked_count(), 1)
+        booking.status = ClassBooking.CONFIRMED
+        booking.save()
+        self.assertEqual(self.booked_count(), 2)
+        # Completed sessions give their seat back; saving twice changes nothing
+        booking.status = ClassBooking.COMPLETED
+        booking.save()
+        booking.save()
+        self.assertEqual(self.booked_count(), 1)
+
+        # Moving a booking takes a seat in the new slot and frees the old one
+        other = ClassTimeSlot.objects.create(
+            teaching_class=self.teaching_class, start_time=at(8), end_time=at(8, 11), max_students=1
+        )
+        moved = ClassBooking.objects.get(student=self.students[1])
+        moved.time_slot = other
+        moved.save()
+        self.assertEqual(self.booked_count(), 0)
+        self.assertEqual(ClassTimeSlot.objects.get(pk=other.pk).booked_count, 1)
+
+        ClassBooking.objects.filter(pk=moved.pk).delete()
+        self.assertEqual(ClassTimeSlot.objects.get(pk=other.pk).booked_count, 0)
+
+    def test_cancel_view_frees_seat(self):
+        booking = self.book(0)
+        self.book(1)
+        self.client.force_login(self.students[0])
+        self.client.post(f'/classes/schedule/booking/{booking.pk}/cancel/')
+        self.assertEqual(ClassBooking.objects.get(pk=booking.pk).status, ClassBooking.CANCELLED)
+        self.assertEqual(self.booked_count(), 1)
+
+        self.client.force_login(self.students[2])
+        self.client.post(f'/classes/schedule/slot/{self.slot.pk}/book/')
+        self.assertEqual(self.booked_count(), 2)
+        self.assertTrue(ClassBooking.objects.filter(student=self.students[2], time_slot=self.slot).exists())
+
+    def test_stale_availability_check_cannot_overbook(self):
+        self.book(0)
+        # Both students saw one seat left before either booked
+        stale = ClassTimeSlot.objects.get(pk=self.slot.pk)
+        self.assertTrue(stale.can_be_booked_by(self.students[1])[0])
+        self.assertTrue(stale.can_be_booked_by(self.students[2])[0])
+        self.book(1, slot=stale)
+        with self.assertRaises(SlotFullError):
+            self.book(2, slot=stale)
+        self.assertEqual(ClassBooking.objects.filter(time_slot=self.slot).count(), 2)
+
+    def test_reconcile_repairs_drift(self):
+        self.book(0)
+        self.book(1, status=ClassBooking.CANCELLED)
+        ClassTimeSlot.objects.filter(pk=self.slot.pk).update(booked_count=2)
+        self.assertEqual(list(ClassTimeSlot.reconcile_booked_counts()), [self.slot.pk])
+        self.assertEqual(self.booked_count(), 1)
+        self.assertEqual(list(ClassTimeSlot.reconcile_booked_counts()), [])
+
+        ClassTimeSlot.objects.filter(pk=self.slot.pk).update(booked_count=0)
+        output = io.StringIO()
+        call_command('reconcile_slot_bookings', stdout=output)
+        self.assertEqual(self.booked_count(), 1)
+
+
+class SlotCapacityRaceTests(SlotCapacityMixin, TransactionTestCase):
+    """Bookings racing for the last seat from separate connections"""
+
+    def test_last_seat_goes_to_one_booking(self):
+        self.book(0)
+        barrier = threading.Barrier(2)
+        outcomes = []
+
+        def book(position):
+            barrier.wait()
+            try:
+                # SQLite answers a concurrent writer with "table is locked"; retry like a resubmit
+                for _ in range(50):
+                    try:
+                        self.book(position)
+                        outcomes.append('booked')
+                        return
+                    except SlotFullError:
+                        outcomes.append('full')
+                        return
+                    except OperationalError:
+                        time.sleep(0.01)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=book, args=(position,)) for position in (1, 2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(outcomes), ['booked', 'full'])
+        self.assertEqual(ClassBooking.objects.filter(time_slot=self.slot).count(), 2)
+        self.assertEqual(self.booked_count(), 2)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ClassScheduleTests(TestCase):
+    """The teacher's schedule: stored and recurring slots with their bookings"""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', password='pw')
+        self.teaching_class = TeachingClass.objects.create(title='Python', slug='python', teacher=self.teacher)
+        self.students = 0
+
+    def slot(self, day, hour=10, bookings=()):
+        slot = ClassTimeSlot.objects.create(
+            teaching_class=self.teaching_class, start_time=at(day, hour), end_time=at(day, hour + 1), max_students=10
+        )
+        for status in bookings:
+            self.students += 1
+            student = User.objects.create_user(username=f'student{self.students}', password='pw')
+            enrollment = ClassEnrollment.objects.create(
+                user=student, teaching_class=self.teaching_class, status=ClassEnrollment.ACTIVE
+            )
+            ClassBooking.objects.create(time_slot=slot, student=student, enrollment=enrollment, status=status)
+        return slot
+
+    def test_schedule_is_two_queries(self):
+        self.slot(7, bookings=[ClassBooking.CONFIRMED, ClassBooking.PENDING])
+        self.slot(8, bookings=[ClassBooking.CANCELLED])
+        self.slot(9)
+        with self.assertNumQueries(2):
+            schedule = scheduling.class_schedule(self.teaching_class, at(7, 0), at(14, 0))
+            # Bookings, students and profiles are already loaded
+            for slot in schedule:
+                for booking in slot.booking_list:
+                    booking.student.get_full_name()
+                    hasattr(booking.student, 'profile')
+                    booking.time_slot.get_available_spots()
+        self.assertEqual([len(slot.booking_list) for slot in schedule], [2, 1, 0])
+        self.assertEqual([slot.available_spots for slot in schedule], [8, 10, 10])
+
+    def test_mixed_stored_and_recurring_slots(self):
+        recurrence = SlotRecurrence.objects.create(
+            teaching_class=self.teaching_class, first_start=at(7, 14), duration_minutes=60,
+            frequency=SlotRecurrence.DAILY, count=3
+        )
+        stored = self.slot(8, bookings=[ClassBooking.CONFIRMED, ClassBooking.CANCELLED])
+        # A booked occurrence is stored and replaces the generated one
+        booked_occurrence = recurrence.materialize(at(9, 14))
+        self.slot(20)  # Outside the window
+
+        schedule = scheduling.class_schedule(self.teaching_class, at(7, 0), at(14, 0), [recurrence])
+        self.assertEqual(
+            [slot.start_time for slot in schedule],
+            [at(7, 14), at(8, 10), at(8, 14), at(9, 14)]
+        )
+        self.assertEqual([slot.pk for slot in schedule], [None, stored.pk, None, booked_occurrence.pk])
+        self.assertEqual(schedule[0].slot_key, f'r{recurrence.pk}-{int(at(7, 14).timestamp())}')
+
+        self.assertEqual(
+            [booking.status for booking in schedule[1].booking_list],
+            [ClassBooking.CONFIRMED, ClassBooking.CANCELLED]
+        )
+        self.assertEqual(schedule[1].status_counts[ClassBooking.CONFIRMED], 1)
+        self.assertEqual(schedule[1].status_counts[ClassBooking.CANCELLED], 1)
+        self.assertEqual(schedule[1].status_counts[ClassBooking.COMPLETED], 0)
+        for slot in (schedule[0], schedule[2], schedule[3]):
+            self.assertEqual(slot.booking_list, [])
+            self.assertEqual(sum(slot.status_counts.values()), 0)
+
+    def manage_page_queries(self, **params):
+        self.client.force_login(self.teacher)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/classes/python/schedule/manage/', params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_manage_page_queries_do_not_grow(self):
+        SlotRecurrence.objects.create(
+            teaching_class=self.teaching_class, first_start=at(7, 14), duration_minutes=60, weekdays='0,2'
+        )
+        self.slot(7, bookings=[ClassBooking.CONFIRMED])
+        expected = self.manage_page_queries(start='2030-01-07')
+
+        for day in (8, 9, 10):
+            self.slot(day, bookings=[ClassBooking.CONFIRMED, ClassBooking.PENDING, ClassBooking.CANCELLED])
+        self.client.force_login(self.teacher)
+        with self.assertNumQueries(expected):
+            response = self.client.get('/classes/python/schedule/manage/', {'start': '2030-01-09'})
+        self.assertEqual(len(response.context['upcoming_slots']), 6)
+
+    def test_manage_page_windows(self):
+        self.slot(7)
+        self.slot(20)
+        self.client.force_login(self.teacher)
+
+        response = self.client.get('/classes/python/schedule/manage/', {'start': '2030-01-09'})
+        self.assertEqual(response.context['period'], 'week')
+        self.assertEqual(response.context['window_start'], at(7, 0))
+        self.assertEqual([slot.start_time for slot in response.context['upcoming_slots']], [at(7)])
+
+        response = self.client.get('/classes/python/schedule/manage/', {'period': 'month', 'start': '2030-01-15'})
+        self.assertEqual(response.context['period'], 'month')
+        self.assertEqual(response.context['next_window'], '2030-02-01')
+        self.assertEqual([slot.start_time for slot in response.context['upcoming_slots']], [at(7), at(20)])
+
+    def test_invalid_start_falls_back_to_today(self):
+        self.client.force_login(self.teacher)
+        for start in ('bogus', '2030-02-30', '2030-13-01'):
+            with self.subTest(start=start):
+                response = self.client.get('/classes/python/schedule/manage/', {'start': start})
+                self.assertEqual(response.status_code, 200)
+                today = timezone.localdate()
+                self.assertEqual(response.context['window_start'].date(), today - datetime.timedelta(days=today.weekday()))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ClassFeedTests(TestCase):
+    """The class catalog's cursor feed continues the numbered page"""
+
+    def setUp(self):
+        teacher = User.objects.create_user(username='teacher', password='pw')
+        for position in range(15):
+            TeachingClass.objects.create(
+                title=f'Class {position}', slug=f'class-{position}', teacher=teacher, price_cents=100 * (position % 4)
+            )
+        TeachingClass.objects.create(title='Draft', slug='draft', teacher=teacher, is_published=False)
+        TeachingClass.objects.filter(price_cents=0).update(created_at=timezone.now())
+
+    def ids(self, sort):
+        ordering = {'newest': ['-created_at', '-id'], 'price_low': ['price_cents', 'id']}[sort]
+        return list(TeachingClass.objects.filter(is_published=True).order_by(*ordering).values_list('slug', flat=True))
+
+    def test_feed_continues_list_page(self):
+        for sort in ('newest', 'price_low'):
+            with self.subTest(sort=sort):
+                response = self.client.get('/classes/', {'sort': sort})
+                first_page = [teaching_class.slug for teaching_class in response.context['classes']]
+                data = self.client.get('/classes/feed/', {'sort': sort, 'cursor': response.context['next_cursor']}).json()
+                self.assertEqual(first_page + [c['slug'] for c in data['classes']], self.ids(sort))
+                self.assertIsNone(data['next_cursor'])
+                self.assertEqual(data['total'], 15)
+
+    def test_feed_from_start(self):
+        data = self.client.get('/classes/feed/', {'sort': 'price_low'}).json()
+        self.assertEqual([c['slug'] for c in data['classes']], self.ids('price_low')[:12])
+        self.assertIsNotNone(data['next_cursor'])
+
+    def test_bad_cursor(self):
+        response = self.client.get('/classes/feed/', {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'success': False, 'error': 'Invalid cursor'})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ClassRatingTests(TestCase):
+    """Reviews keep the stored rating sum, count and average in step"""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', password='pw')
+        self.teaching_class = TeachingClass.objects.create(title='Python', slug='python', teacher=self.teacher)
+        self.reviewers = [User.objects.create_user(username=f'reviewer{position}', password='pw') for position in range(3)]
+
+    def review(self, position, rating):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ClassReview.objects.create(teaching_class=self.teaching_class, reviewer=self.reviewers[position], rating=rating)
+
+    def assertRating(self, rating_sum, reviews_count, avg_rating):
+        teaching_class = TeachingClass.objects.get(pk=self.teaching_class.pk)
+        self.assertEqual(
+            (teaching_class.rating_sum, teaching_class.reviews_count, teaching_class.avg_rating),
+            (rating_sum, reviews_count, Decimal(avg_rating))
+        )
+        # The trending ranking follows the average
+        popularity = ClassPopularity.objects.get(teaching_class=self.teaching_class)
+        self.assertAlmostEqual(popularity.rating, float(avg_rating))
+
+    def test_create_edit_delete(self):
+        first = self.review(0, 5)
+        self.review(1, 4)
+        self.assertRating(9, 2, '4.50')
+        self.review(2, 4)
+        self.assertRating(13, 3, '4.33')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.rating = 2
+            first.save()
+            # Saving an unchanged rating does nothing more
+            first.save()
+        self.assertRating(10, 3, '3.33')
+
+        # A review loaded from the database knows its stored rating
+        with self.captureOnCommitCallbacks(execute=True):
+            loaded = ClassReview.objects.get(pk=first.pk)
+            loaded.rating = 3
+            loaded.save(update_fields=['rating'])
+        self.assertRating(11, 3, '3.67')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            loaded.delete()
+        self.assertRating(8, 2, '4.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ClassReview.objects.all().delete()
+        self.assertRating(0, 0, '0.00')
+
+    def test_reviewer_deletion_cascades(self):
+        self.review(0, 5)
+        self.review(1, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reviewers[0].delete()
+        self.assertRating(2, 1, '2.00')
+
+    def test_class_deletion_cascades(self):
+        self.review(0, 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teaching_class.delete()
+        self.assertFalse(ClassReview.objects.exists())
+
+    def test_reconcile_repairs_drift(self):
+        self.review(0, 5)
+        self.review(1, 3)
+        other = TeachingClass.objects.create(title='Rust', slug='rust', teacher=self.teacher)
+        TeachingClass.objects.filter(pk=self.teaching_class.pk).update(rating_sum=1, reviews_count=7, avg_rating=Decimal('0.14'))
+
+        self.assertEqual(TeachingClass.reconcile_ratings(), [self.teaching_class.pk])
+        self.assertRating(8, 2, '4.00')
+        self.assertEqual(TeachingClass.reconcile_ratings(), [])
+
+        # A class whose reviews were removed without the signals
+        ClassReview.objects.filter(teaching_class=self.teaching_class).update(teaching_class=other)
+        output = io.StringIO()
+        call_command('reconcile_class_ratings', stdout=output)
+        self.assertRating(0, 0, '0.00')
+        other.refresh_from_db()
+        self.assertEqual((other.rating_sum, other.reviews_count, other.avg_rating), (8, 2, Decimal('4.00')))
+        self.assertIn('repaired 2', output.getvalue())
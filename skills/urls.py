@@ -7,6 +7,7 @@ app_name = "skills"
 
 urlpatterns = [
     path("", views.ClassListView.as_view(), name="class_list"),
+    path("feed/", views.ClassFeedView.as_view(), name="class_feed"),
     path("apply/", views.TeacherApplicationCreateView.as_view(), name="teacher_apply"),
     path("trades/", views.TradeOffersListView.as_view(), name="trade_offers"),
     path("trades/<int:offer_id>/accept/", views.AcceptTradeOfferView.as_view(), name="accept_trade"),
@@ -15,8 +16,9 @@ urlpatterns = [
     # Static paths that must come before slug patterns
     path("my-bookings/", views.my_bookings, name="my_bookings"),
     path("favorites/", views.my_favorites, name="my_favorites"),
-    path("schedule/slot/<int:slot_id>/delete/", views.delete_time_slot, name="delete_time_slot"),
-    path("schedule/slot/<int:slot_id>/book/", views.book_time_slot, name="book_time_slot"),
+    path("schedule/slot/<str:slot_key>/delete/", views.delete_time_slot, name="delete_time_slot"),
+    path("schedule/slot/<str:slot_key>/book/", views.book_time_slot, name="book_time_slot"),
+    path("schedule/recurrence/<int:recurrence_id>/stop/", views.stop_slot_recurrence, name="stop_slot_recurrence"),
     path("schedule/booking/<int:booking_id>/cancel/", views.cancel_booking, name="cancel_booking"),
     path("schedule/booking/<int:booking_id>/complete/", views.complete_booking, name="complete_booking"),
     path("schedule/booking/<int:booking_id>/confirm-completion/", views.confirm_booking_completion, name="confirm_booking_completion"),
@@ -32,6 +34,7 @@ urlpatterns = [
     path("<slug:slug>/schedule/", views.view_class_schedule, name="view_schedule"),
     path("<slug:slug>/schedule/manage/", views.manage_class_schedule, name="manage_schedule"),
     path("<slug:slug>/schedule/create-slot/", views.create_time_slot, name="create_time_slot"),
+    path("<slug:slug>/schedule/bulk-create/", views.bulk_create_time_slots, name="bulk_create_time_slots"),
     # Favorites
     path("<slug:slug>/favorite/", views.toggle_favorite, name="toggle_favorite"),
 ]
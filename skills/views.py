@@ -1,7 +1,8 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
-from django.db.models import Prefetch, Count, Q, Avg
+from django.db.models import Prefetch, Count, Q
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse
@@ -9,113 +10,270 @@ from django.views.generic import ListView, DetailView, CreateView, UpdateView, V
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.conf import settings
 from django.utils import timezone
 from django.contrib import messages
 
-from .models import TeachingClass, ClassTopic, ClassReview, ClassEnrollment, ClassTradeOffer, TeacherApplication, ClassTimeSlot, ClassBooking, ClassFavorite
-from django.db.models import Avg
-from chat.views import get_or_create_conversation
-from chat.models import Message
+from .models import TeachingClass, Topic, ClassReview, ClassEnrollment, ClassTradeOffer, TeacherApplication, ClassTimeSlot, ClassBooking, ClassFavorite, SlotRecurrence, SlotFullError
+from chat.services import send_direct_message
+from core import search
+from ripple.pagination import CachedCountPaginator, KeysetPaginator, cached_count
+from . import facets, scheduling
+from core.models import SearchDocument
 from decimal import Decimal, InvalidOperation
+import datetime
 import json
 import traceback
 
 
+# Most relevant matches considered when a class search is filtered further
+SEARCH_RESULTS_LIMIT = 500
+# Days of slots shown per schedule page, and offered by the booking modal;
+# recurring slots are only expanded for the window being shown
+SCHEDULE_WINDOW_DAYS = 28
+BOOKING_WINDOW_DAYS = 90
+# Largest repeat_interval accepted (days for daily rules, weeks for weekly ones)
+MAX_REPEAT_INTERVAL = 52
+
+
+def schedule_window(request, days=SCHEDULE_WINDOW_DAYS):
+    """(start, end) of the slot window picked with ?start=YYYY-MM-DD, never starting in the past"""
+    from django.utils.dateparse import parse_date
+    now = timezone.now()
+    try:
+        start_date = parse_date(request.GET.get('start') or '')
+    except ValueError:
+        start_date = None
+    start = now
+    if start_date:
+        start = max(now, timezone.make_aware(datetime.datetime.combine(start_date, datetime.time.min)))
+    return start, start + datetime.timedelta(days=days)
+
+
+def calendar_window(request):
+    """
+    Context for the calendar week (default) or month picked with
+    ?period=week|month and ?start=YYYY-MM-DD (any day in it, default today),
+    including the aware [window_start, window_end) range to query.
+    """
+    from django.utils.dateparse import parse_date
+    period = 'month' if request.GET.get('period') == 'month' else 'week'
+    try:
+        day = parse_date(request.GET.get('start') or '')
+    except ValueError:
+        day = None
+    day = day or timezone.localdate()
+    if period == 'month':
+        first = day.replace(day=1)
+        following = (first + datetime.timedelta(days=31)).replace(day=1)
+    else:
+        first = day - datetime.timedelta(days=day.weekday())
+        following = first + datetime.timedelta(days=7)
+    return {
+        'period': period,
+        'window_start': timezone.make_aware(datetime.datetime.combine(first, datetime.time.min)),
+        'window_end': timezone.make_aware(datetime.datetime.combine(following, datetime.time.min)),
+        'window_last_day': following - datetime.timedelta(days=1),
+        'previous_window': (first - datetime.timedelta(days=1)).isoformat(),
+        'next_window': following.isoformat(),
+    }
+
+
+def parse_slot_time(value):
+    """Aware datetime from an ISO or datetime-local string; ValueError if invalid"""
+    from django.utils.dateparse import parse_datetime
+    try:
+        parsed = parse_datetime(value or '')
+    except (ValueError, TypeError):
+        parsed = None
+    if parsed is None:
+        raise ValueError('Invalid date/time format.')
+    # datetime-local inputs carry no offset
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def slot_fields(params):
+    """ClassTimeSlot field values from request parameters; ValueError if invalid"""
+    start_time = parse_slot_time(params.get('start_time'))
+    end_time = parse_slot_time(params.get('end_time'))
+    if end_time <= start_time:
+        raise ValueError('End time must be after start time.')
+    try:
+        max_students = int(params.get('max_students') or 1)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid number of students.')
+    if max_students < 1:
+        raise ValueError('A slot needs room for at least one student.')
+    return {
+        'start_time': start_time,
+        'end_time': end_time,
+        'max_students': max_students,
+        'notes': str(params.get('notes') or ''),
+    }
+
+
+def slot_recurrence(teaching_class, fields, params):
+    """Unsaved SlotRecurrence for the repeat* parameters, starting with the slot in fields; ValueError if invalid"""
+    from django.utils.dateparse import parse_date
+    repeat = params.get('repeat')
+    if repeat not in (SlotRecurrence.DAILY, SlotRecurrence.WEEKLY, *SlotRecurrence.WEEKDAY_PRESETS):
+        raise ValueError('Invalid repeat option.')
+    try:
+        until_date = parse_date(params.get('repeat_until') or '')
+    except (ValueError, TypeError):
+        raise ValueError('Invalid repeat end date.')
+    try:
+        interval = int(params.get('repeat_interval') or 1)
+        repeat_count = params.get('repeat_count')
+        repeat_count = int(repeat_count) if repeat_count else None
+    except (ValueError, TypeError):
+        raise ValueError('Invalid repeat interval or number of sessions.')
+    if not 1 <= interval <= MAX_REPEAT_INTERVAL:
+        raise ValueError(f'Repeat every 1 to {MAX_REPEAT_INTERVAL} days or weeks.')
+    return SlotRecurrence(
+        teaching_class=teaching_class,
+        first_start=fields['start_time'],
+        duration_minutes=int((fields['end_time'] - fields['start_time']).total_seconds() // 60),
+        frequency=SlotRecurrence.DAILY if repeat == SlotRecurrence.DAILY else SlotRecurrence.WEEKLY,
+        weekdays=SlotRecurrence.WEEKDAY_PRESETS.get(repeat, ''),
+        interval=interval,
+        until=timezone.make_aware(datetime.datetime.combine(until_date, datetime.time.max)) if until_date else None,
+        count=max(1, repeat_count) if repeat_count else None,
+        max_students=fields['max_students'],
+        notes=fields['notes'],
+    )
+
+
+def schedule_window_context(start, end):
+    """Template context for paging through schedule windows"""
+    length = end - start
+    return {
+        'window_start': start,
+        'window_end': end,
+        'previous_window': (start - length).date().isoformat() if start > timezone.now() else None,
+        'next_window': end.date().isoformat(),
+    }
+
+
 class ClassListView(ListView):
     template_name = 'skills/classes_list.html'
     context_object_name = 'classes'
     paginate_by = 12
+    paginator_class = CachedCountPaginator
+    
+    # Sort option -> (field or annotation, descending) keys, primary key appended
+    SORT_KEYS = {
+        'newest': [('created_at', True)],
+        'rating': [('avg_rating', True), ('reviews_count', True)],
+        'price_low': [('price_cents', False)],
+        'price_high': [('price_cents', True)],
+        'trending': [('trending_score', True), ('avg_rating', True), ('created_at', True)],
+        'relevance': [('relevance', False)],
+    }
 
     def get_queryset(self):
         qs = TeachingClass.objects.filter(is_published=True).select_related('teacher').prefetch_related('topics')
         
-        # Search query
+        # Search query (full-text index over title, descriptions and topics)
         q = self.request.GET.get('q')
+        search_ids = None
         if q:
-            qs = qs.filter(title__icontains=q)
-        
-        # Difficulty filter
-        difficulty = self.request.GET.get('difficulty')
-        if difficulty:
-            qs = qs.filter(difficulty=difficulty)
-        
-        # Price filter
-        max_price = self.request.GET.get('max_price')
-        if max_price:
-            try:
-                max_price_cents = int(float(max_price) * 100)
-                qs = qs.filter(price_cents__lte=max_price_cents)
-            except (ValueError, TypeError):
-                pass
-        
-        # Duration filter
-        max_duration = self.request.GET.get('max_duration')
-        if max_duration:
-            try:
-                qs = qs.filter(duration_minutes__lte=int(max_duration))
-            except (ValueError, TypeError):
-                pass
-        
-        # Tradeable filter
-        tradeable_only = self.request.GET.get('tradeable')
-        if tradeable_only == 'true':
-            qs = qs.filter(is_tradeable=True)
-        
-        # Topic filter
-        topic = self.request.GET.get('topic')
-        if topic:
-            qs = qs.filter(topics__name__icontains=topic).distinct()
-        
-        # Sort options
-        sort_by = self.request.GET.get('sort', 'newest')
-        if sort_by == 'rating':
-            qs = qs.order_by('-avg_rating', '-reviews_count')
-        elif sort_by == 'price_low':
-            qs = qs.order_by('price_cents')
-        elif sort_by == 'price_high':
-            qs = qs.order_by('-price_cents')
+            search_ids = search.search_ids(SearchDocument.CLASS, q, limit=SEARCH_RESULTS_LIMIT)
+            qs = qs.filter(id__in=search_ids)
+        
+        # Difficulty, price, duration, tradeable and topic filters (shared with the facet counts)
+        self.search_base = qs
+        self.filters = facets.class_filters(self.request.GET)
+        qs = facets.apply_filters(qs, self.filters)
+        
+        # Sort options (searches default to relevance); every sort ends in a unique key for cursor pages
+        sort_by = self.request.GET.get('sort', 'relevance' if search_ids else 'newest')
+        if sort_by == 'relevance' and search_ids:
+            qs = qs.annotate(relevance=models.Case(
+                *[models.When(id=class_id, then=position) for position, class_id in enumerate(search_ids)],
+                output_field=models.IntegerField()
+            ))
         elif sort_by == 'trending':
-            # Trending: classes with most enrollments in last 30 days
-            from datetime import timedelta
-            thirty_days_ago = timezone.now() - timedelta(days=30)
-            qs = qs.annotate(
-                recent_enrollments=models.Count(
-                    'enrollments',
-                    filter=models.Q(enrollments__created_at__gte=thirty_days_ago)
-                )
-            ).order_by('-recent_enrollments', '-avg_rating')
-        else:  # newest (default)
-            qs = qs.order_by('-created_at')
+            # Trending: pre-computed ranking (recent enrollments, favorites, swipes, rating); unranked last
+            qs = qs.annotate(trending_score=Coalesce('popularity__score', models.Value(-1.0)))
+        elif sort_by not in self.SORT_KEYS or sort_by == 'relevance':
+            sort_by = 'newest'
+        self.sort_keys = self.SORT_KEYS[sort_by]
         
-        return qs
+        return qs.order_by(*KeysetPaginator(qs, self.sort_keys, self.paginate_by).ordering())
+    
+    def get_user_class_ids(self):
+        """(favorited class ids, actively enrolled class ids) of the current user"""
+        if not self.request.user.is_authenticated:
+            return set(), set()
+        favorited_ids = ClassFavorite.objects.filter(
+            user=self.request.user
+        ).values_list('teaching_class_id', flat=True)
+        enrolled_ids = ClassEnrollment.objects.filter(
+            user=self.request.user,
+            status=ClassEnrollment.ACTIVE
+        ).values_list('teaching_class_id', flat=True)
+        return set(favorited_ids), set(enrolled_ids)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Get all unique topics for filter
-        context['all_topics'] = ClassTopic.objects.values_list('name', flat=True).distinct().order_by('name')
-        
-        # Check which classes are favorited by user
-        if self.request.user.is_authenticated:
-            favorited_ids = ClassFavorite.objects.filter(
-                user=self.request.user
-            ).values_list('teaching_class_id', flat=True)
-            context['favorited_class_ids'] = set(favorited_ids)
-            
-            # Get enrolled class IDs (active enrollments only)
-            enrolled_ids = ClassEnrollment.objects.filter(
-                user=self.request.user,
-                status=ClassEnrollment.ACTIVE
-            ).values_list('teaching_class_id', flat=True)
-            context['enrolled_class_ids'] = set(enrolled_ids)
-        else:
-            context['favorited_class_ids'] = set()
-            context['enrolled_class_ids'] = set()
+        # Counts per filter value for the current filter set
+        context['facets'] = facets.facet_counts(self.search_base, self.filters)
+        # Keep the selected topic selectable even when nothing else matches it
+        selected_topic = self.request.GET.get('topic')
+        if selected_topic and selected_topic not in [topic['value'] for topic in context['facets']['topic']]:
+            topic = Topic.objects.filter(slug=selected_topic).first()
+            if topic:
+                context['facets']['topic'].insert(0, {'value': topic.slug, 'label': topic.name, 'count': 0})
+        
+        # Check which classes are favorited by / enrolled in (active only) for the user
+        context['favorited_class_ids'], context['enrolled_class_ids'] = self.get_user_class_ids()
+        
+        # Where infinite scroll continues after this page
+        page_obj = context['page_obj']
+        if page_obj.has_next():
+            paginator = KeysetPaginator(self.object_list, self.sort_keys, self.paginate_by)
+            # list() fills the page's result cache, which the template then reuses
+            context['next_cursor'] = paginator.cursor_for(list(page_obj.object_list)[-1])
         
         return context
 
 
+class ClassFeedView(ClassListView):
+    """Infinite-scroll JSON variant of the class list, paginated by cursor"""
+    
+    def get(self, request, *args, **kwargs):
+        paginator = KeysetPaginator(self.get_queryset(), self.sort_keys, self.paginate_by)
+        try:
+            classes, next_cursor = paginator.page(request.GET.get('cursor'))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+        
+        favorited_ids, enrolled_ids = self.get_user_class_ids()
+        return JsonResponse({
+            'success': True,
+            'classes': [
+                {
+                    'slug': c.slug,
+                    'title': c.title,
+                    'thumb': c.thumbnail.url if c.thumbnail else '',
+                    'teacher': c.teacher.username,
+                    'difficulty': c.get_difficulty_display(),
+                    'duration': c.duration_minutes or 0,
+                    'rating': float(c.avg_rating or 0),
+                    'reviews': c.reviews_count or 0,
+                    'topics': [t.name for t in c.topics.all()[:3]],
+                    'isEnrolled': c.id in enrolled_ids,
+                    'isFavorited': c.id in favorited_ids,
+                }
+                for c in classes
+            ],
+            'next_cursor': next_cursor,
+            'total': cached_count(paginator.queryset),
+        })
+
+
 class ClassDetailView(DetailView):
     template_name = 'skills/class_detail.html'
     context_object_name = 'cls'
@@ -315,11 +473,11 @@ class ClassDetailView(DetailView):
             booking_notes = metadata.get('booking_notes', '')
             
             if time_slot_id and enrollment:
-                try:
-                    time_slot = ClassTimeSlot.objects.get(id=time_slot_id, teaching_class=cls)
-                    if not time_slot.is_fully_booked() and time_slot.start_time > timezone.now():
+                time_slot = ClassTimeSlot.from_key(time_slot_id, cls)
+                if time_slot and not time_slot.is_fully_booked() and time_slot.start_time > timezone.now():
+                    try:
                         ClassBooking.objects.get_or_create(
-                            time_slot=time_slot,
+                            time_slot=time_slot.materialize(),
                             student=user,
                             enrollment=enrollment,
                             defaults={
@@ -327,8 +485,8 @@ class ClassDetailView(DetailView):
                                 'notes': booking_notes,
                             }
                         )
-                except ClassTimeSlot.DoesNotExist:
-                    pass
+                    except SlotFullError:
+                        pass  # Taken by a concurrent booking; the student picks another slot
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
@@ -341,17 +499,12 @@ class ClassReviewCreateView(LoginRequiredMixin, View):
         rating = int(request.POST.get('rating', 0))
         comment = request.POST.get('comment', '').strip()
         if 1 <= rating <= 5:
+            # ClassReview.save() updates the class rating aggregates incrementally
             review, created = ClassReview.objects.update_or_create(
                 teaching_class=teaching_class,
                 reviewer=request.user,
                 defaults={"rating": rating, "comment": comment},
             )
-            # Update aggregates (simple recalculation)
-            agg = ClassReview.objects.filter(teaching_class=teaching_class).aggregate_avg = None
-            reviews = ClassReview.objects.filter(teaching_class=teaching_class)
-            count = reviews.count()
-            avg = round(sum(r.rating for r in reviews) / count, 2) if count else 0
-            TeachingClass.objects.filter(pk=teaching_class.pk).update(avg_rating=avg, reviews_count=count)
         return HttpResponseRedirect(reverse('skills:class_detail', args=[teaching_class.slug]))
 
 
@@ -387,17 +540,12 @@ class ClassTradeProposeView(LoginRequiredMixin, View):
             messages.success(request, 'Trade offer sent successfully!')
             
             # Create a message in the chat system
-            conversation = get_or_create_conversation(request.user, requested_class.teacher)
             message_content = f"Hi! I'd like to propose a trade: I'll offer my class '{offered_class.title}' in exchange for your class '{requested_class.title}'."
             if message:
                 message_content += f"\n\nNote: {message}"
             message_content += f"\n\nView the trade offer: {request.build_absolute_uri(reverse('skills:trade_offers'))}"
             
-            Message.objects.create(
-                conversation=conversation,
-                sender=request.user,
-                content=message_content
-            )
+            send_direct_message(request.user, [requested_class.teacher], message_content)
         return HttpResponseRedirect(reverse('skills:class_detail', args=[requested_class.slug]))
 
 
@@ -512,14 +660,9 @@ class AcceptTradeOfferView(LoginRequiredMixin, View):
         trade_offer.save()
         
         # Create a message in the chat system
-        conversation = get_or_create_conversation(request.user, trade_offer.proposer)
         message_content = f"Great news! I've accepted your trade offer. 🎉\n\nYou are now enrolled in '{trade_offer.requested_class.title}' and I'm enrolled in '{trade_offer.offered_class.title}'.\n\nLet's learn together!"
         
-        Message.objects.create(
-            conversation=conversation,
-            sender=request.user,
-            content=message_content
-        )
+        send_direct_message(request.user, [trade_offer.proposer], message_content)
         
         messages.success(request, f'Trade accepted! You are now enrolled in "{trade_offer.offered_class.title}" and {trade_offer.proposer.username} is enrolled in "{trade_offer.requested_class.title}".')
         return HttpResponseRedirect(reverse('skills:trade_offers'))
@@ -540,14 +683,9 @@ class DeclineTradeOfferView(LoginRequiredMixin, View):
         trade_offer.save()
         
         # Create a message in the chat system
-        conversation = get_or_create_conversation(request.user, trade_offer.proposer)
         message_content = f"I've declined your trade offer for '{trade_offer.requested_class.title}'.\n\nThanks for your interest! Feel free to reach out if you have other trade proposals."
         
-        Message.objects.create(
-            conversation=conversation,
-            sender=request.user,
-            content=message_content
-        )
+        send_direct_message(request.user, [trade_offer.proposer], message_content)
         
         messages.info(request, 'Trade offer declined.')
         return HttpResponseRedirect(reverse('skills:trade_offers'))
@@ -568,14 +706,9 @@ class CancelTradeOfferView(LoginRequiredMixin, View):
         trade_offer.save()
         
         # Create a message in the chat system
-        conversation = get_or_create_conversation(request.user, trade_offer.receiver)
         message_content = f"I've cancelled my trade offer for '{trade_offer.requested_class.title}'.\n\nSorry for any inconvenience. Feel free to reach out if you'd like to discuss other trade opportunities!"
         
-        Message.objects.create(
-            conversation=conversation,
-            sender=request.user,
-            content=message_content
-        )
+        send_direct_message(request.user, [trade_offer.receiver], message_content)
         
         messages.info(request, 'Trade offer cancelled.')
         return HttpResponseRedirect(reverse('skills:trade_offers'))
@@ -809,18 +942,18 @@ class ClassCheckoutView(LoginRequiredMixin, View):
         booking_notes = request.POST.get('booking_notes', '').strip()
         
         # Validate time slot if provided
+        # (a recurring occurrence is only stored once the booking is made)
         if time_slot_id:
-            try:
-                time_slot = ClassTimeSlot.objects.get(id=time_slot_id, teaching_class=cls, is_active=True)
-                if time_slot.start_time <= timezone.now():
-                    messages.error(request, 'Selected time slot has passed. Please select another time.')
-                    return HttpResponseRedirect(reverse('skills:class_detail', args=[slug]))
-                if time_slot.is_fully_booked():
-                    messages.error(request, 'Selected time slot is fully booked. Please select another time.')
-                    return HttpResponseRedirect(reverse('skills:class_detail', args=[slug]))
-            except ClassTimeSlot.DoesNotExist:
+            time_slot = ClassTimeSlot.from_key(time_slot_id, cls)
+            if time_slot is None or not time_slot.is_active:
                 messages.error(request, 'Invalid time slot selected.')
                 return HttpResponseRedirect(reverse('skills:class_detail', args=[slug]))
+            if time_slot.start_time <= timezone.now():
+                messages.error(request, 'Selected time slot has passed. Please select another time.')
+                return HttpResponseRedirect(reverse('skills:class_detail', args=[slug]))
+            if time_slot.is_fully_booked():
+                messages.error(request, 'Selected time slot is fully booked. Please select another time.')
+                return HttpResponseRedirect(reverse('skills:class_detail', args=[slug]))
 
         secret = getattr(settings, 'STRIPE_SECRET_KEY', None)
         if not secret:
@@ -1086,16 +1219,17 @@ class StripeWebhookView(View):
             # Get user object
             user = User.objects.get(pk=user_id)
             
-            time_slot = ClassTimeSlot.objects.get(
-                id=time_slot_id, 
-                teaching_class=enrollment.teaching_class
-            )
+            time_slot = ClassTimeSlot.from_key(time_slot_id, enrollment.teaching_class)
+            if time_slot is None:
+                logger.warning(f"Time slot {time_slot_id} not found")
+                return
             
             # Validate slot can be booked using model method
             can_book, error_msg = time_slot.can_be_booked_by(user)
             if not can_book:
                 logger.warning(f"Cannot create booking for slot {time_slot_id}: {error_msg}")
                 return
+            time_slot = time_slot.materialize()
             
             # Check if there's an existing cancelled booking for this slot
             existing_booking = ClassBooking.objects.filter(
@@ -1131,8 +1265,8 @@ class StripeWebhookView(View):
                 else:
                     logger.info(f"Booking already exists for slot {time_slot_id} and user {user_id}")
                 
-        except ClassTimeSlot.DoesNotExist:
-            logger.warning(f"Time slot {time_slot_id} not found")
+        except SlotFullError:
+            logger.warning(f"Cannot create booking for slot {time_slot_id}: fully booked")
         except User.DoesNotExist:
             logger.error(f"User {user_id} not found")
         except Exception as e:
@@ -1234,29 +1368,21 @@ class StripeWebhookView(View):
 
 @login_required
 def manage_class_schedule(request, slug):
-    """Teacher view to manage time slots for their class"""
+    """Teacher view to manage time slots for their class, one week or month at a time"""
     teaching_class = get_object_or_404(TeachingClass, slug=slug, teacher=request.user)
+    window = calendar_window(request)
+    recurrences = list(teaching_class.slot_recurrences.filter(is_active=True))
     
-    # Get all time slots for this class
-    time_slots = ClassTimeSlot.objects.filter(
-        teaching_class=teaching_class
-    ).prefetch_related('bookings').order_by('start_time')
-    
-    # Get upcoming and past slots
+    # Slots in the window with their bookings and students (prefetched), plus unstored recurring occurrences
+    slots = scheduling.class_schedule(teaching_class, window['window_start'], window['window_end'], recurrences)
     now = timezone.now()
-    upcoming_slots = time_slots.filter(start_time__gte=now)
-    past_slots = time_slots.filter(start_time__lt=now)
-    
-    # Annotate slots with booking info
-    for slot in upcoming_slots:
-        slot.has_active_bookings = slot.bookings.filter(
-            status__in=[ClassBooking.CONFIRMED, ClassBooking.PENDING]
-        ).exists()
     
     context = {
         'teaching_class': teaching_class,
-        'upcoming_slots': upcoming_slots,
-        'past_slots': past_slots,
+        'upcoming_slots': [slot for slot in slots if slot.start_time >= now],
+        'past_slots': [slot for slot in slots if slot.start_time < now],
+        'recurrences': recurrences,
+        **window,
     }
     return render(request, 'skills/manage_schedule.html', context)
 
@@ -1264,35 +1390,25 @@ def manage_class_schedule(request, slug):
 @login_required
 @require_http_methods(["POST"])
 def create_time_slot(request, slug):
-    """Create a new time slot for a class"""
+    """Create a new time slot (or a recurring one) for a class"""
     teaching_class = get_object_or_404(TeachingClass, slug=slug, teacher=request.user)
     
     try:
-        start_time_str = request.POST.get('start_time')
-        end_time_str = request.POST.get('end_time')
-        max_students = int(request.POST.get('max_students', 1))
-        notes = request.POST.get('notes', '')
-        
-        from django.utils.dateparse import parse_datetime
-        start_time = parse_datetime(start_time_str)
-        end_time = parse_datetime(end_time_str)
-        
-        if not start_time or not end_time:
-            messages.error(request, 'Invalid date/time format.')
-            return redirect('skills:manage_schedule', slug=slug)
+        fields = slot_fields(request.POST)
         
-        if end_time <= start_time:
-            messages.error(request, 'End time must be after start time.')
+        # Repeating slots are stored as one rule; occurrences are generated when shown
+        if request.POST.get('repeat'):
+            slot_recurrence(teaching_class, fields, request.POST).save()
+            messages.success(request, 'Recurring time slots created successfully!')
             return redirect('skills:manage_schedule', slug=slug)
         
-        ClassTimeSlot.objects.create(
-            teaching_class=teaching_class,
-            start_time=start_time,
-            end_time=end_time,
-            max_students=max_students,
-            notes=notes,
-        )
-        messages.success(request, 'Time slot created successfully!')
+        created, conflicts = scheduling.create_slots(teaching_class, [fields])
+        if conflicts:
+            messages.error(request, f"This time overlaps another of your sessions: {conflicts[0]['conflicts_with']}.")
+        else:
+            messages.success(request, 'Time slot created successfully!')
+    except ValueError as e:
+        messages.error(request, str(e))
     except Exception as e:
         messages.error(request, f'Error creating time slot: {str(e)}')
     
@@ -1301,21 +1417,102 @@ def create_time_slot(request, slug):
 
 @login_required
 @require_http_methods(["POST"])
-def delete_time_slot(request, slot_id):
-    """Delete a time slot"""
-    time_slot = get_object_or_404(ClassTimeSlot, id=slot_id, teaching_class__teacher=request.user)
+def bulk_create_time_slots(request, slug):
+    """
+    Create many time slots from one JSON request:
+    {"slots": [{"start_time", "end_time", "max_students", "notes"}, ...]}
+    and/or a "template" slot with repeat, repeat_interval, repeat_until and
+    repeat_count (as in the schedule form), expanded into single slots.
+    Slots overlapping any session of the teacher's classes, or each other,
+    are not created and are returned as conflicts.
+    """
+    teaching_class = get_object_or_404(TeachingClass, slug=slug, teacher=request.user)
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON.'}, status=400)
+    if isinstance(data, dict):
+        slots = data.get('slots') or []
+        template = data.get('template')
+    else:
+        slots = template = None
+    if (
+        not isinstance(slots, list)
+        or not all(isinstance(slot, dict) for slot in slots)
+        or not isinstance(template, (dict, type(None)))
+    ):
+        return JsonResponse({
+            'success': False,
+            'error': 'Expected an object with a "slots" list and/or a "template" object.'
+        }, status=400)
+    
+    # The helpers raise ValueError with messages meant for the user
+    try:
+        candidates = [slot_fields(slot) for slot in slots]
+        if template:
+            candidates += scheduling.expand_template(slot_recurrence(teaching_class, slot_fields(template), template))
+        if not candidates:
+            raise ValueError('No slots given.')
+        if len(candidates) > scheduling.MAX_BULK_SLOTS:
+            raise ValueError(f'At most {scheduling.MAX_BULK_SLOTS} slots can be created at once.')
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except OverflowError:
+        return JsonResponse({'success': False, 'error': 'Slot times are out of range.'}, status=400)
+    
+    created, conflicts = scheduling.create_slots(teaching_class, candidates)
+    return JsonResponse({
+        'success': True,
+        'created': [
+            {'id': slot.id, 'start_time': slot.start_time.isoformat(), 'end_time': slot.end_time.isoformat()}
+            for slot in created
+        ],
+        'conflicts': [
+            {
+                'start_time': conflict['slot']['start_time'].isoformat(),
+                'end_time': conflict['slot']['end_time'].isoformat(),
+                'conflicts_with': conflict['conflicts_with'],
+            }
+            for conflict in conflicts
+        ],
+    })
+
+
+@login_required
+@require_http_methods(["POST"])
+def delete_time_slot(request, slot_key):
+    """Delete a time slot (an occurrence of a recurrence is kept as an inactive row so it stays skipped)"""
+    time_slot = ClassTimeSlot.from_key(slot_key)
+    if time_slot is None or time_slot.teaching_class.teacher_id != request.user.id:
+        raise Http404('Time slot not found')
     
     # Check if there are any confirmed bookings
-    if time_slot.bookings.filter(status__in=[ClassBooking.CONFIRMED, ClassBooking.PENDING]).exists():
+    if time_slot.get_booked_count():
         messages.error(request, 'Cannot delete time slot with existing bookings.')
         return redirect('skills:manage_schedule', slug=time_slot.teaching_class.slug)
     
     teaching_class_slug = time_slot.teaching_class.slug
-    time_slot.delete()
+    if time_slot.recurrence_id:
+        time_slot = time_slot.materialize()
+        time_slot.is_active = False
+        time_slot.save(update_fields=['is_active', 'updated_at'])
+    else:
+        time_slot.delete()
     messages.success(request, 'Time slot deleted successfully!')
     return redirect('skills:manage_schedule', slug=teaching_class_slug)
 
 
+@login_required
+@require_http_methods(["POST"])
+def stop_slot_recurrence(request, recurrence_id):
+    """Stop generating occurrences of a recurring slot (booked occurrences are kept)"""
+    recurrence = get_object_or_404(SlotRecurrence, id=recurrence_id, teaching_class__teacher=request.user)
+    recurrence.is_active = False
+    recurrence.save(update_fields=['is_active'])
+    messages.success(request, 'Recurring time slots stopped.')
+    return redirect('skills:manage_schedule', slug=recurrence.teaching_class.slug)
+
+
 @login_required
 def get_available_slots(request, slug):
     """API endpoint to get available time slots for booking modal"""
@@ -1324,16 +1521,11 @@ def get_available_slots(request, slug):
     
     teaching_class = get_object_or_404(TeachingClass, slug=slug, is_published=True)
     
-    # Get available time slots (upcoming, active, not fully booked)
-    now = timezone.now()
-    available_slots = ClassTimeSlot.objects.filter(
-        teaching_class=teaching_class,
-        is_active=True,
-        start_time__gte=now
-    ).prefetch_related('bookings').order_by('start_time')
-    
-    # Filter out fully booked slots
-    available_slots = [slot for slot in available_slots if not slot.is_fully_booked()]
+    # Available time slots (upcoming, active, not fully booked) in the booking window
+    window_start, window_end = schedule_window(request, days=BOOKING_WINDOW_DAYS)
+    available_slots = ClassTimeSlot.in_window(
+        teaching_class, window_start, window_end, queryset=ClassTimeSlot.objects.bookable()
+    )
     
     # Group slots by date
     slots_by_date = {}
@@ -1342,7 +1534,7 @@ def get_available_slots(request, slug):
         if date_key not in slots_by_date:
             slots_by_date[date_key] = []
         slots_by_date[date_key].append({
-            'id': slot.id,
+            'id': slot.slot_key,
             'start_time': slot.start_time.isoformat(),
             'end_time': slot.end_time.isoformat(),
             'start_time_display': slot.start_time.strftime('%I:%M %p'),
@@ -1448,16 +1640,12 @@ def view_class_schedule(request, slug):
             messages.error(request, 'You must be enrolled in this class to book sessions.')
         return redirect('skills:class_detail', slug=slug)
     
-    # Get available time slots (upcoming, active, not fully booked)
+    # Available time slots (upcoming, active, not fully booked) in the requested window
     now = timezone.now()
-    available_slots = ClassTimeSlot.objects.filter(
-        teaching_class=teaching_class,
-        is_active=True,
-        start_time__gte=now
-    ).prefetch_related('bookings').order_by('start_time')
-    
-    # Filter out fully booked slots
-    available_slots = [slot for slot in available_slots if not slot.is_fully_booked()]
+    window_start, window_end = schedule_window(request)
+    available_slots = ClassTimeSlot.in_window(
+        teaching_class, window_start, window_end, queryset=ClassTimeSlot.objects.bookable()
+    )
     
     # Get user's existing bookings for this class - separate active and completed
     all_user_bookings = ClassBooking.objects.filter(
@@ -1487,15 +1675,18 @@ def view_class_schedule(request, slug):
         'user_bookings': user_bookings,
         'completed_bookings': completed_bookings,
         'now': now,  # Pass current time to template
+        **schedule_window_context(window_start, window_end),
     }
     return render(request, 'skills/view_schedule.html', context)
 
 
 @login_required
 @require_http_methods(["POST"])
-def book_time_slot(request, slot_id):
+def book_time_slot(request, slot_key):
     """Book a time slot with proper validation"""
-    time_slot = get_object_or_404(ClassTimeSlot, id=slot_id, is_active=True)
+    time_slot = ClassTimeSlot.from_key(slot_key)
+    if time_slot is None or not time_slot.is_active:
+        raise Http404('Time slot not found')
     
     # Get active enrollment
     enrollment = ClassEnrollment.objects.filter(
@@ -1530,6 +1721,9 @@ def book_time_slot(request, slot_id):
         messages.error(request, error_msg or 'This time slot cannot be booked.')
         return redirect('skills:view_schedule', slug=time_slot.teaching_class.slug)
     
+    # Recurring occurrences are stored on their first booking
+    time_slot = time_slot.materialize()
+    
     # Check if there's an existing cancelled booking for this slot
     existing_booking = ClassBooking.objects.filter(
         time_slot=time_slot,
@@ -1539,25 +1733,29 @@ def book_time_slot(request, slot_id):
     
     notes = request.POST.get('notes', '').strip()[:1000]  # Limit length
     
-    if existing_booking:
-        # Reactivate the cancelled booking
-        existing_booking.status = ClassBooking.CONFIRMED
-        existing_booking.notes = notes
-        existing_booking.cancelled_at = None
-        existing_booking.enrollment = enrollment  # Update enrollment in case it changed
-        existing_booking.save()
-        booking = existing_booking
-        messages.success(request, f'Successfully re-booked session for {time_slot.start_time.strftime("%B %d, %Y at %I:%M %p")}!')
-    else:
-        # Create new booking
-        booking = ClassBooking.objects.create(
-            time_slot=time_slot,
-            student=request.user,
-            enrollment=enrollment,
-            notes=notes,
-            status=ClassBooking.CONFIRMED,
-        )
-        messages.success(request, f'Successfully booked session for {time_slot.start_time.strftime("%B %d, %Y at %I:%M %p")}!')
+    # Saving takes the spot atomically; the check above can be overtaken by a concurrent booking
+    try:
+        if existing_booking:
+            # Reactivate the cancelled booking
+            existing_booking.status = ClassBooking.CONFIRMED
+            existing_booking.notes = notes
+            existing_booking.cancelled_at = None
+            existing_booking.enrollment = enrollment  # Update enrollment in case it changed
+            existing_booking.save()
+            booking = existing_booking
+            messages.success(request, f'Successfully re-booked session for {time_slot.start_time.strftime("%B %d, %Y at %I:%M %p")}!')
+        else:
+            # Create new booking
+            booking = ClassBooking.objects.create(
+                time_slot=time_slot,
+                student=request.user,
+                enrollment=enrollment,
+                notes=notes,
+                status=ClassBooking.CONFIRMED,
+            )
+            messages.success(request, f'Successfully booked session for {time_slot.start_time.strftime("%B %d, %Y at %I:%M %p")}!')
+    except SlotFullError:
+        messages.error(request, 'This time slot is fully booked.')
     
     return redirect('skills:view_schedule', slug=time_slot.teaching_class.slug)
 
@@ -1,6 +1,8 @@
 # users/context_processors.py
 from django.conf import settings
-from django.db.models import Count, Q, Avg
+from django.db.models import Count, F, Q
+from django.utils.functional import SimpleLazyObject
+from ripple.cache import namespace
 
 def recaptcha_site_key(request):
     """
@@ -18,111 +20,105 @@ def unread_messages_count(request):
     """
     unread_count = 0
     if request.user.is_authenticated:
-        from chat.models import MessageStatus
-        unread_count = MessageStatus.objects.filter(
-            user=request.user,
-            is_read=False
-        ).exclude(
-            message__sender=request.user
-        ).count()
+        from chat.models import ConversationUserStatus
+        unread_count = ConversationUserStatus.total_unread_for(request.user)
     
     return {
         'unread_messages_count': unread_count
     }
 
+# Sidebar data is cached: trending classes are shared by everyone, stats per user.
+# Invalidation hooks live next to the models (skills/models.py, communities/models.py).
+trending_classes_cache = namespace('trending_classes')
+user_sidebar_cache = namespace('user_sidebar')
+
+
+def get_trending_classes():
+    """Top 3 published classes from the trending ranking"""
+    from skills.models import ClassPopularity
+    # Ages the ranking even when no new activity is recorded
+    ClassPopularity.decay_if_due()
+    return trending_classes_cache.get_or_set('top', _load_trending_classes)
+
+
+def _load_trending_classes():
+    from skills.models import TeachingClass
+    try:
+        trending = list(TeachingClass.objects.filter(
+            is_published=True
+        ).order_by(
+            F('popularity__score').desc(nulls_last=True),
+            '-avg_rating',
+            '-created_at'
+        )[:3])
+    except Exception:
+        # Fallback: just get recent published classes
+        trending = list(TeachingClass.objects.filter(
+            is_published=True
+        ).order_by('-created_at')[:3])
+    return trending
+
+
+def get_user_sidebar(user):
+    """Recently joined communities and quick stats for a user"""
+    return user_sidebar_cache.get_or_set(user.id, lambda: _load_user_sidebar(user))
+
+
+def _load_user_sidebar(user):
+    from communities.models import Community
+    from skills.models import ClassEnrollment, UserSkill
+    
+    user_sidebar = {
+        'recent_communities': [],
+        'sidebar_stats': {},
+    }
+    
+    # Recently joined communities (user's communities, ordered by most recently created, limit 3)
+    try:
+        user_sidebar['recent_communities'] = list(Community.objects.filter(
+            members=user
+        ).order_by('-created_at')[:3])
+    except Exception:
+        user_sidebar['recent_communities'] = []
+    
+    # Quick stats
+    try:
+        skills = UserSkill.objects.filter(user=user).aggregate(
+            teaching_skills=Count('id', filter=Q(can_teach=True)),
+            learning_skills=Count('id', filter=Q(wants_to_learn=True)),
+        )
+        user_sidebar['sidebar_stats'] = {
+            'enrolled_classes': ClassEnrollment.objects.filter(
+                user=user,
+                status='active'
+            ).count(),
+            'teaching_skills': skills['teaching_skills'],
+            'learning_skills': skills['learning_skills'],
+            'communities_count': Community.objects.filter(members=user).count(),
+        }
+    except Exception:
+        user_sidebar['sidebar_stats'] = {}
+    
+    return user_sidebar
+
+
 def sidebar_data(request):
     """
     Add dynamic sidebar data to all template contexts.
     Includes recent communities, trending classes, and quick stats.
+    Values are lazy: nothing is loaded unless a template reads them, and then
+    they come from the cache when possible.
     """
-    try:
-        from django.utils import timezone
-        from datetime import timedelta
-        from collections import Counter
-        from communities.models import Community
-        from skills.models import TeachingClass, ClassEnrollment
-        from users.models import UserSkill
-        
-        sidebar_info = {
-            'recent_communities': [],
-            'trending_classes': [],
-            'sidebar_stats': {},
-        }
-        
-        if request.user.is_authenticated:
-            user = request.user
-            
-            # Recently joined communities (user's communities, ordered by most recently created, limit 3)
-            try:
-                sidebar_info['recent_communities'] = list(Community.objects.filter(
-                    members=user
-                ).order_by('-created_at')[:3])
-            except Exception:
-                sidebar_info['recent_communities'] = []
-            
-            # Top 3 classes (by rating and enrollment count)
-            try:
-                top_classes = TeachingClass.objects.filter(
-                    is_published=True
-                ).annotate(
-                    avg_rating=Avg('reviews__rating'),
-                    enrollment_count=Count('enrollments', filter=Q(enrollments__status='active'))
-                ).order_by(
-                    '-avg_rating',
-                    '-enrollment_count',
-                    '-created_at'
-                )[:3]
-                sidebar_info['trending_classes'] = list(top_classes)
-            except Exception:
-                # Fallback: just get recent published classes
-                sidebar_info['trending_classes'] = list(TeachingClass.objects.filter(
-                    is_published=True
-                ).order_by('-created_at')[:3])
-            
-            # Quick stats
-            try:
-                sidebar_info['sidebar_stats'] = {
-                    'enrolled_classes': ClassEnrollment.objects.filter(
-                        user=user,
-                        status='active'
-                    ).count(),
-                    'teaching_skills': UserSkill.objects.filter(
-                        user=user,
-                        can_teach=True
-                    ).count(),
-                    'learning_skills': UserSkill.objects.filter(
-                        user=user,
-                        wants_to_learn=True
-                    ).count(),
-                    'communities_count': Community.objects.filter(members=user).count(),
-                }
-            except Exception:
-                sidebar_info['sidebar_stats'] = {}
-        else:
-            # For non-authenticated users, show top 3 classes
-            try:
-                top_classes = TeachingClass.objects.filter(
-                    is_published=True
-                ).annotate(
-                    avg_rating=Avg('reviews__rating'),
-                    enrollment_count=Count('enrollments', filter=Q(enrollments__status='active'))
-                ).order_by(
-                    '-avg_rating',
-                    '-enrollment_count',
-                    '-created_at'
-                )[:3]
-                sidebar_info['trending_classes'] = list(top_classes)
-            except Exception:
-                # Fallback: just get recent published classes
-                sidebar_info['trending_classes'] = list(TeachingClass.objects.filter(
-                    is_published=True
-                ).order_by('-created_at')[:3])
-        
-        return sidebar_info
-    except Exception as e:
-        # Return empty data if anything fails to prevent 500 errors
-        return {
-            'recent_communities': [],
-            'trending_classes': [],
-            'sidebar_stats': {},
-        }
\ No newline at end of file
+    sidebar_info = {
+        'recent_communities': [],
+        'trending_classes': SimpleLazyObject(get_trending_classes),
+        'sidebar_stats': {},
+    }
+    
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        user_sidebar = SimpleLazyObject(lambda: get_user_sidebar(user))
+        sidebar_info['recent_communities'] = SimpleLazyObject(lambda: user_sidebar['recent_communities'])
+        sidebar_info['sidebar_stats'] = SimpleLazyObject(lambda: user_sidebar['sidebar_stats'])
+    
+    return sidebar_info
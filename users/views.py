@@ -606,7 +606,7 @@ def profile_view(request):
 def view_user_profile(request, username):
     """View another user's public profile"""
     from django.contrib.auth.models import User
-    from django.db.models import Avg, Count, Q
+    from django.db.models import Count, Q, Sum
     from skills.models import ClassReview, ClassEnrollment
     
     user = get_object_or_404(User, username=username)
@@ -635,10 +635,11 @@ def view_user_profile(request, username):
         status=ClassEnrollment.ACTIVE
     ).count()
     
-    # Get reviews for all classes
+    # Review totals from the per-class rating aggregates
     reviews = ClassReview.objects.filter(teaching_class__teacher=user, teaching_class__is_published=True)
-    total_reviews = reviews.count()
-    avg_rating = reviews.aggregate(avg=Avg('rating'))['avg'] or 0
+    rating_totals = public_classes.aggregate(rating_sum=Sum('rating_sum'), reviews_count=Sum('reviews_count'))
+    total_reviews = rating_totals['reviews_count'] or 0
+    avg_rating = rating_totals['rating_sum'] / total_reviews if total_reviews else 0
     
     # Get recent reviews (last 3)
     recent_reviews = reviews.select_related('reviewer', 'teaching_class').order_by('-created_at')[:3]